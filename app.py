@@ -9,11 +9,19 @@ import tty
 import termios
 import traceback
 import os
+import gc
 
 from ui.home import HomeScreen
 from ui.player_status_box import PlayerStatusBox
 from core.player import MPVPlayer
-from core.queue import QueueManager
+from core.queue import QueueManager, REPEAT_MODES
+from core.history import PlaybackHistory
+from core.track import Track
+from core.config import load_config, get_scan_target, get_prune_rules
+from core.watcher import LibraryWatcher
+from core.refresh import BackgroundRefresh
+from core.library import LibraryService
+from core.diagnostics import MemoryBudget, start_tracing
 from core.terminal_utils import hide_cursor, show_cursor
 
 
@@ -65,28 +73,118 @@ class App:
     """Main application class. Manages screens and player."""
     
     def __init__(self):
+        config = load_config()
+        if config.get('trace_memory'):
+            start_tracing()  # Before anything big is loaded, so the memory report sees it
+        
         self.player = MPVPlayer()
         self.queue = QueueManager()
+        self.history = PlaybackHistory()
+        self.now_playing = None  # Track last started (kept after the player clears its own at track end)
         self.player_box = PlayerStatusBox()
         self.current_screen = HomeScreen(self)
         self.running = True
+        self.watcher = None
+        self.refresher = None
+        self.library = LibraryService()  # Shared library snapshot for all screens
+        self.set_memory_budget(config.get('memory_budget_mb', 0))
         
         # Set up track-end callback to auto-advance queue
         self.player.on_track_end = self._on_track_end
+        self.queue.shuffle_source = self._shuffle_songs
+        self._update_play_mode()
+        
+        # Keep the library cache live if enabled
+        if config.get('watch_library'):
+            self.start_watcher()
+        
+        # Rescan a stale library at low priority without delaying startup
+        if config.get('auto_refresh'):
+            self.refresher = BackgroundRefresh(on_complete=lambda files: self.library_changed())
+            self.refresher.start()
+    
+    def library_changed(self):
+        """Called after a scan or a background thread updates the library cache."""
+        self.library.invalidate()
+    
+    def set_memory_budget(self, budget_mb):
+        """Set the RSS budget above which optional caches are dropped (0 = none)."""
+        self.memory_budget = MemoryBudget(budget_mb, self.drop_caches)
+        self.library.low_memory = bool(budget_mb)
+    
+    def drop_caches(self):
+        """Free optional in-memory structures (they are rebuilt when needed)."""
+        self.library.drop_optional()
+        gc.collect()
+    
+    def start_watcher(self):
+        """Start watching the configured scan roots for new/removed files."""
+        self.stop_watcher()
+        paths, cache_file, exclude_phone_storage = get_scan_target()
+        self.watcher = LibraryWatcher(paths, cache_file, exclude_phone_storage=exclude_phone_storage,
+                                      prune_rules=get_prune_rules(), on_change=self.library_changed)
+        self.watcher.start()
+    
+    def stop_watcher(self):
+        """Stop the library watcher if running."""
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def _shuffle_songs(self):
+        """The library in name order - what shuffle-all draws from."""
+        return self.library.songs("name", load_config().get('hide_duplicates', False))
+    
+    def _update_play_mode(self):
+        """Show shuffle and repeat in the status box."""
+        modes = []
+        if self.queue.shuffle:
+            modes.append("Shuffle")
+        if self.queue.repeat != "off":
+            modes.append(f"Repeat {self.queue.repeat}")
+        self.player_box.set_play_mode(" | ".join(modes))
     
     def _on_track_end(self):
         """Called when current track ends - auto-play next from queue."""
-        next_item = self.queue.next()
-        if next_item:
-            # Play next item from queue
-            target = next_item.get('path') or next_item.get('url')
-            self.player.play(target)
-            self.player_box.set_playing(track=target, state=self.player.state, queue_count=self.queue.get_count())
+        if self.queue.repeat == "one" and self.now_playing:
+            # The monitor thread clears player.current before calling this
+            self._play_track(self.now_playing, record=False)
+            return
+        self._advance()
+    
+    def _advance(self):
+        """Play the next track: forward through history after going back, then the queue."""
+        track = self.history.next()
+        if track:
+            self._play_track(track, record=False)
+        else:
+            next_item = self.queue.next()
+            if next_item:
+                # Play next item from queue
+                self._play_track(next_item)
+        self._update_play_mode()  # A shuffle that ran out has stopped
+    
+    def _play_track(self, track, record=True):
+        """
+        Play a Track and show it in the status box.
+        
+        Tracks from history already carry their file path or page URL, so
+        replaying them goes straight to the player without a library or
+        search lookup.
+        
+        Args:
+            track: Track to play
+            record: Add it to the playback history (False when replaying history)
+        """
+        self.player.play(track.location)
+        self.now_playing = track
+        if record:
+            self.history.record(track)
+        self.player_box.set_playing(track=track.location, state=self.player.state, queue_count=self.queue.get_count())
 
     def player_play(self, target):
-        """Start playing a file or URL."""
-        self.player.play(target)
-        self.player_box.set_playing(track=target, state=self.player.state, queue_count=self.queue.get_count())
+        """Start playing a Track, or a file or URL (titled from its location)."""
+        self._play_track(self._as_track(target))
 
     def player_pause(self):
         """Pause playback."""
@@ -95,12 +193,17 @@ class App:
 
     def player_resume_or_play(self, target):
         """Resume if paused, otherwise start playing."""
-        if self.player.current == target and self.player.state == "paused":
+        track = self._as_track(target)
+        if self.player.current == track.location and self.player.state == "paused":
             self.player.resume()
         else:
-            self.player.play(target)
+            self._play_track(track)
         self.player_box.set_playing(track=self.player.current, state=self.player.state, queue_count=self.queue.get_count())
     
+    def _as_track(self, target):
+        """Track for a play request (screens pass titled Tracks so history shows real titles)."""
+        return target if isinstance(target, Track) else Track.for_location(target)
+    
     def player_stop(self):
         """Stop playback."""
         self.player.stop()
@@ -118,19 +221,56 @@ class App:
             self.queue.add_youtube(path_or_url, title)
         elif item_type == "stream":
             self.queue.add_stream(path_or_url, title)
+        self.player_box.set_queue_count(self.queue.get_count())
+    
+    def queue_add_track(self, track):
+        """Add a Track to the queue."""
+        self.queue.add_track(track)
+        self.player_box.set_queue_count(self.queue.get_count())
+    
+    def queue_add_tracks(self, tracks):
+        """Add many Tracks to the queue with one write and one status update.
+        
+        Returns:
+            Number of tracks added
+        """
+        added = self.queue.add_tracks(tracks)
+        self.player_box.set_queue_count(self.queue.get_count())
+        return added
     
     def queue_play_next(self):
-        """Skip to next item in queue."""
-        next_item = self.queue.next()
-        if next_item:
-            target = next_item.get('path') or next_item.get('url')
-            self.player.play(target)
-            self.player_box.set_playing(track=target, state=self.player.state, queue_count=self.queue.get_count())
+        """Skip to next item in queue (or forward again through history)."""
+        self._advance()
+    
+    def queue_play_previous(self):
+        """Go back to the previously played track."""
+        previous = self.history.previous()
+        if previous:
+            self._play_track(previous, record=False)
+    
+    def queue_toggle_shuffle(self):
+        """Start shuffling the whole library (after queued items), or stop."""
+        if self.queue.shuffle:
+            self.queue.stop_shuffle()
+        else:
+            self.queue.start_shuffle()
+            if self.player.state != "playing":
+                self.queue_play_next()
+        self._update_play_mode()
+    
+    def queue_cycle_repeat(self):
+        """Switch repeat off -> all -> one."""
+        modes = REPEAT_MODES
+        self.queue.set_repeat(modes[(modes.index(self.queue.repeat) + 1) % len(modes)])
+        self._update_play_mode()
 
     def quit(self):
         """Quit the application. Clean up player if needed."""
         self.running = False
         show_cursor()  # Restore cursor visibility
+        self.stop_watcher()
+        if self.refresher:
+            self.refresher.stop()
         self.player.quit()  # Terminate MPV process
         print("\nExiting txplay...")
 
@@ -148,7 +288,8 @@ class App:
                     key = get_key()
                     
                     # Global quit rule: q or ESC = instant exit from anywhere
-                    if key == "q" or key == "ESC":
+                    # (except while a screen is taking typed text)
+                    if (key == "q" or key == "ESC") and not self.current_screen.captures_text:
                         self.quit()
                         break
                     
@@ -157,6 +298,7 @@ class App:
                     if next_screen is None:
                         break
                     self.current_screen = next_screen
+                    self.memory_budget.check()
                 except Exception as e:
                     # Show error to user
                     show_cursor()
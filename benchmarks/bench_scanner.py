@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Scanner benchmark on synthetic directory trees.
+
+Generates a reproducible tree under a temp dir, runs Scanner.scan variants
+over it and prints results as JSON so runs can be compared across commits:
+
+    python3 benchmarks/bench_scanner.py --depth 4 --fanout 5 > before.json
+
+Reported per variant: files/sec, filesystem call counts, peak Python memory
+(tracemalloc), cache write time and cache size. Every run starts without a
+cache, manifest or library database, so repeats and variants are comparable. Call counts cover os.stat/os.lstat/
+os.scandir/os.listdir made from Python; DirEntry.is_dir()/stat() are not
+counted because they are not Python-level calls.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+# Run from anywhere: make the txplay package root importable
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import core.scanner as scanner_module  # noqa: E402
+import core.library_db as library_db  # noqa: E402
+from core.scanner import Scanner, find_cache_file, manifest_path  # noqa: E402
+from core.snapshot import snapshot_path  # noqa: E402
+from core.config import DEFAULT_CONFIG, get_prune_rules  # noqa: E402
+
+AUDIO_EXTS = ['.mp3', '.flac', '.m4a', '.ogg', '.opus']
+OTHER_EXTS = ['.txt', '.jpg', '.py', '.json', '.log']
+PRUNABLE_NAMES = ['node_modules', '.git', '.cache']
+
+
+def generate_tree(root, depth, fanout, files_per_dir, audio_ratio,
+                  symlink_loops, unreadable_dirs, prunable_dirs, seed):
+    """
+    Create a synthetic directory tree.
+
+    Args:
+        root: Directory to create the tree in
+        depth: Levels of subdirectories
+        fanout: Subdirectories per directory
+        files_per_dir: Files per directory
+        audio_ratio: Fraction of files with an audio extension (0-1)
+        symlink_loops: Number of symlinks pointing back up the tree
+        unreadable_dirs: Number of directories made unreadable (chmod 000)
+        prunable_dirs: Number of node_modules/.git/.cache dirs (with audio inside)
+        seed: Random seed for reproducible trees
+
+    Returns:
+        Dict describing what was generated
+    """
+    rng = random.Random(seed)
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                path = os.path.join(parent, f"dir{d}_{i}")
+                os.mkdir(path)
+                next_level.append(path)
+        dirs.extend(next_level)
+        level = next_level
+
+    audio_files = 0
+    total_files = 0
+    for path in dirs:
+        for i in range(files_per_dir):
+            is_audio = rng.random() < audio_ratio
+            ext = rng.choice(AUDIO_EXTS if is_audio else OTHER_EXTS)
+            with open(os.path.join(path, f"Track {i}{ext}"), 'wb') as f:
+                f.write(b'\0' * rng.randint(0, 4096))
+            audio_files += is_audio
+            total_files += 1
+
+    # Prunable junk directories, each hiding some audio-looking files
+    for i in range(prunable_dirs):
+        junk = os.path.join(rng.choice(dirs), PRUNABLE_NAMES[i % len(PRUNABLE_NAMES)])
+        os.makedirs(junk, exist_ok=True)
+        for j in range(files_per_dir):
+            open(os.path.join(junk, f"fixture{j}.mp3"), 'wb').close()
+            total_files += 1
+
+    # Symlinks back to an ancestor create loops the scanner must not follow forever
+    for i in range(symlink_loops):
+        target = rng.choice(dirs)
+        link = os.path.join(rng.choice([d for d in dirs if d.startswith(target)]), f"loop{i}")
+        if not os.path.exists(link):
+            os.symlink(target, link)
+
+    unreadable = rng.sample(dirs[1:], min(unreadable_dirs, len(dirs) - 1))
+    for path in unreadable:
+        os.chmod(path, 0)
+
+    return {
+        'dirs': len(dirs),
+        'files': total_files,
+        'audio_files': audio_files,
+        'unreadable_dirs': unreadable,
+    }
+
+
+class CallCounter:
+    """Count filesystem calls by wrapping os functions during a scan."""
+
+    NAMES = ('stat', 'lstat', 'scandir', 'listdir')
+
+    def __init__(self):
+        self.counts = {name: 0 for name in self.NAMES}
+        self._originals = {}
+
+    def __enter__(self):
+        for name in self.NAMES:
+            original = getattr(os, name)
+            self._originals[name] = original
+            setattr(os, name, self._wrap(name, original))
+        return self
+
+    def __exit__(self, *exc):
+        for name, original in self._originals.items():
+            setattr(os, name, original)
+
+    def _wrap(self, name, original):
+        def counted(*args, **kwargs):
+            self.counts[name] += 1
+            return original(*args, **kwargs)
+        return counted
+
+
+VARIANTS = {
+    # name -> (Scanner kwargs, checkpoint interval)
+    'plain': ({'cache_format': 'compact'}, float('inf')),
+    'pruned': ({'cache_format': 'compact', 'prune_rules': get_prune_rules(DEFAULT_CONFIG)}, float('inf')),
+    'checkpoint_every_dir': ({'cache_format': 'compact'}, 0),
+    'json_cache': ({'cache_format': 'json'}, float('inf')),
+}
+
+
+def reset_outputs(work_dir, cache_file):
+    """Remove everything a previous scan left, so every run starts cold.
+
+    That is the cache in both formats, its manifest and the library database
+    (which would otherwise only sync the difference).
+    """
+    for path in (cache_file, snapshot_path(cache_file), manifest_path(cache_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+    db_file = os.path.join(work_dir, "library.db")
+    if library_db._db is not None:
+        library_db._db.close()
+    for path in (db_file, db_file + "-wal", db_file + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    library_db._db = library_db.LibraryDB(db_file)
+
+
+def run_variant(tree_root, work_dir, kwargs, checkpoint_interval):
+    """Run one scan and collect measurements."""
+    cache_file = os.path.join(work_dir, "cache.json")
+    reset_outputs(work_dir, cache_file)
+
+    scanner_module.CHECKPOINT_INTERVAL = checkpoint_interval
+    scanner = Scanner(**kwargs)
+
+    # Time the cache write on its own
+    write_times = []
+    save_cache = scanner._save_cache
+
+    def timed_save(*args, **kw):
+        start = time.perf_counter()
+        save_cache(*args, **kw)
+        write_times.append(time.perf_counter() - start)
+    scanner._save_cache = timed_save
+
+    tracemalloc.start()
+    with CallCounter() as counter:
+        start = time.perf_counter()
+        files = scanner.scan(tree_root, cache_file)
+        elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    written = find_cache_file(cache_file)  # cache.snap unless the variant writes JSON
+
+    return {
+        'files_found': len(files),
+        'seconds': elapsed,
+        'files_per_sec': len(files) / elapsed if elapsed else 0,
+        'fs_calls': counter.counts,
+        'peak_memory_bytes': peak,
+        'cache_write_seconds': sum(write_times),
+        'cache_size_bytes': os.path.getsize(written) if written else 0,
+        'dirs_scanned': scanner.stats['dirs_scanned'],
+        'dirs_skipped': scanner.stats['dirs_skipped'],
+    }
+
+
+def summarize(runs):
+    """Take the median of each numeric measurement across repeated runs."""
+    result = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            result[key] = {k: statistics.median(r[key][k] for r in runs) for k in value}
+        else:
+            result[key] = statistics.median(r[key] for r in runs)
+    return result
+
+
+def git_commit():
+    """Current commit hash, or None outside a git checkout."""
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Scanner.scan on a synthetic tree")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=6)
+    parser.add_argument("--files", type=int, default=20, help="files per directory")
+    parser.add_argument("--audio-ratio", type=float, default=0.5)
+    parser.add_argument("--symlink-loops", type=int, default=5)
+    parser.add_argument("--unreadable", type=int, default=3)
+    parser.add_argument("--prunable", type=int, default=10, help="node_modules/.git/.cache dirs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--variants", default=",".join(VARIANTS),
+                        help="comma-separated: " + ", ".join(VARIANTS))
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="txplay_bench_")
+    tree_root = os.path.join(work_dir, "tree")
+    os.mkdir(tree_root)
+
+    # Keep checkpoints and the library database out of the real data dir
+    # (run_variant gives every run a fresh database under work_dir)
+    scanner_module.SCAN_CHECKPOINT = os.path.join(work_dir, "checkpoint.json")
+    library_db._db = None
+
+    tree = None
+    try:
+        tree = generate_tree(tree_root, args.depth, args.fanout, args.files, args.audio_ratio,
+                             args.symlink_loops, args.unreadable, args.prunable, args.seed)
+
+        results = {}
+        for name in args.variants.split(","):
+            kwargs, interval = VARIANTS[name]
+            runs = [run_variant(tree_root, work_dir, kwargs, interval) for _ in range(args.repeat)]
+            results[name] = summarize(runs)
+
+        report = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            # root ignores directory permissions, so unreadable dirs are still read
+            'running_as_root': hasattr(os, "geteuid") and os.geteuid() == 0,
+            'params': vars(args),
+            'tree': {k: v for k, v in tree.items() if k != 'unreadable_dirs'},
+            'results': results,
+        }
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    finally:
+        if library_db._db is not None:
+            library_db._db.close()
+            library_db._db = None
+        # Restore permissions so the temp tree can be removed
+        for path in (tree or {}).get('unreadable_dirs', []):
+            os.chmod(path, 0o755)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
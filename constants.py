@@ -20,13 +20,30 @@ HOME_PATH = os.path.expanduser("~")
 PHONE_MUSIC_PATH = "/sdcard/Music"
 PHONE_DOWNLOAD_PATH = "/sdcard/Download"
 
+# Android shared storage is reachable under several names. Paths under these
+# prefixes are the same files as under SHARED_STORAGE_PATH.
+SHARED_STORAGE_PATH = "/storage/emulated/0"
+STORAGE_ALIASES = (
+    "/sdcard",
+    "/mnt/sdcard",
+    "/storage/self/primary",
+    os.path.join(HOME_PATH, "storage", "shared"),
+)
+
 # Cache files
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 PHONE_CACHE = os.path.join(DATA_DIR, "phone_music_cache.json")
 TERMUX_CACHE = os.path.join(DATA_DIR, "termux_music_cache.json")
 CUSTOM_CACHE = os.path.join(DATA_DIR, "custom_music_cache.json")
+LIBRARY_CACHE = os.path.join(DATA_DIR, "library_music_cache.json")
 CONFIG_FILE = os.path.join(DATA_DIR, "config.json")
 STREAMS_FILE = os.path.join(DATA_DIR, "streams.json")
+METADATA_CACHE = os.path.join(DATA_DIR, "metadata_cache.json")
+DEDUP_CACHE = os.path.join(DATA_DIR, "dedup_cache.json")
+SCAN_CHECKPOINT = os.path.join(DATA_DIR, "scan_checkpoint.json")
+LIBRARY_DB = os.path.join(DATA_DIR, "library.db")
+LIBRARY_INDEX = os.path.join(DATA_DIR, "library.idx")
+YOUTUBE_RESULTS_CACHE = os.path.join(DATA_DIR, "youtube_results.json")
 
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
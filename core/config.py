@@ -2,12 +2,36 @@
 
 import json
 import os
-from constants import CONFIG_FILE, HOME_PATH
+from constants import (
+    CONFIG_FILE, HOME_PATH, PHONE_MUSIC_PATH, PHONE_DOWNLOAD_PATH,
+    PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE
+)
 
 
 DEFAULT_CONFIG = {
-    "scan_mode": "termux",  # phone, termux, or custom
+    "scan_mode": "termux",  # phone, termux, custom, or library
     "custom_scan_path": HOME_PATH,
+    # Library folders scanned together in "library" mode. Each root is a dict:
+    # {"path": ..., "exclude_phone_storage": bool, "ignore_globs": [...]}
+    "library_roots": [],
+    "watch_library": False,  # Live library updates via inotify/polling
+    "hide_duplicates": False,  # Hide extra copies of identical files
+    # Scan pruning - matched against directory names and full paths
+    "ignore_globs": [
+        "node_modules", ".git", ".svn", ".cache", "__pycache__", ".npm",
+        ".cargo", ".rustup", ".gradle", "site-packages", ".venv", "venv",
+        "*/Android/data", "*/Android/obb",
+    ],
+    "honor_nomedia": True,  # Skip folders containing a .nomedia file
+    "min_file_size": 0,  # Skip audio files smaller than this (bytes)
+    "max_scan_depth": 0,  # Max folder depth below a scan root (0 = unlimited)
+    "cache_format": "compact",  # Scan cache format: "compact" (directory table) or "json"
+    "compress_cache": True,  # zlib-compress compact caches
+    "trace_memory": False,  # Start tracemalloc at launch for the memory report (slower)
+    "memory_budget_mb": 0,  # Drop optional caches above this RSS (0 = no budget)
+    "offset_index": False,  # Page Local Music from an mmap'ed index file instead of loading the library
+    "auto_refresh": True,  # Refresh a stale library in the background at startup
+    "refresh_max_age_hours": 24,  # Library cache older than this is stale
 }
 
 
@@ -35,3 +59,42 @@ def save_config(config):
             json.dump(config, f, indent=2)
     except IOError:
         pass  # Fail silently if can't write
+
+
+def get_scan_target(config=None):
+    """Get what the configured scan mode scans.
+    
+    Args:
+        config: Config dict (loaded from file if None)
+        
+    Returns:
+        Tuple of (paths, cache_file, exclude_phone_storage). In library mode
+        paths are root dicts carrying their own exclude rules.
+    """
+    if config is None:
+        config = load_config()
+    
+    mode = config.get('scan_mode', 'termux')
+    if mode == 'phone':
+        return [PHONE_MUSIC_PATH, PHONE_DOWNLOAD_PATH], PHONE_CACHE, False
+    if mode == 'custom':
+        return [config.get('custom_scan_path', HOME_PATH)], CUSTOM_CACHE, False
+    if mode == 'library':
+        return list(config.get('library_roots', [])), LIBRARY_CACHE, False
+    return [HOME_PATH], TERMUX_CACHE, True
+
+
+def get_prune_rules(config=None):
+    """Get the scan pruning rules for Scanner.
+    
+    Args:
+        config: Config dict (loaded from file if None)
+        
+    Returns:
+        Dict with ignore_globs, honor_nomedia, min_file_size and max_scan_depth
+    """
+    if config is None:
+        config = load_config()
+    
+    keys = ('ignore_globs', 'honor_nomedia', 'min_file_size', 'max_scan_depth')
+    return {key: config.get(key, DEFAULT_CONFIG[key]) for key in keys}
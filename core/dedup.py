@@ -0,0 +1,158 @@
+"""Duplicate detection - finds identical copies of the same file.
+
+Files are grouped by size first (free, we stat them anyway). Only files that
+share a size get a quick hash of their head and tail chunks, and only files
+that still collide after that get a full content hash. Hashes are cached by
+(size, mtime), so a rescan of an unchanged library hashes nothing.
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from constants import DEDUP_CACHE
+
+
+CHUNK_SIZE = 64 * 1024  # Bytes hashed from each end for the quick hash
+
+
+class DuplicateFinder:
+    """Find and remember duplicate copies across the library."""
+
+    def __init__(self, cache_file=DEDUP_CACHE):
+        """
+        Initialize and load cached results.
+
+        Args:
+            cache_file: Path to dedup cache JSON file
+        """
+        self.cache_file = cache_file
+        self.entries = {}  # path -> [size, mtime, quick_hash, full_hash]
+        self.duplicates = {}  # extra copy -> copy that is kept
+        self.load()
+
+    def find(self, paths, workers=4):
+        """
+        Run the dedup pass over the library and save the results.
+
+        Args:
+            paths: All audio file paths in the library
+            workers: Number of hashing threads
+
+        Returns:
+            Dict mapping each extra copy to the copy that is kept
+        """
+        # Group by size, reusing cached hashes for unchanged files
+        entries = {}
+        by_size = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            entry = self.entries.get(path)
+            if not entry or entry[0] != st.st_size or entry[1] != st.st_mtime:
+                entry = [st.st_size, st.st_mtime, None, None]
+            entries[path] = entry
+            by_size.setdefault(st.st_size, []).append(path)
+        self.entries = entries  # Drops files no longer in the library
+
+        # Quick hash (head + tail) only where sizes collide
+        candidates = [p for group in by_size.values() if len(group) > 1 for p in group]
+        self._fill_hashes(candidates, 2, self._quick_hash, workers)
+        by_quick = self._group(candidates, lambda p: entries[p][2] and (entries[p][0], entries[p][2]))
+
+        # Full hash only where quick hashes collide and didn't cover the whole file
+        candidates = [p for group in by_quick.values() if len(group) > 1
+                      for p in group if entries[p][0] > 2 * CHUNK_SIZE]
+        self._fill_hashes(candidates, 3, self._full_hash, workers)
+
+        # Final groups: quick hash is the full content for small files
+        self.duplicates = {}
+        for group in by_quick.values():
+            if len(group) < 2:
+                continue
+            by_full = self._group(group, self._content_key)
+            for copies in by_full.values():
+                if len(copies) < 2:
+                    continue
+                # Keep the copy with the shortest path (usually the "real" one)
+                keep = min(copies, key=lambda p: (len(p), p))
+                for path in copies:
+                    if path != keep:
+                        self.duplicates[path] = keep
+
+        self.save()
+        return self.duplicates
+
+    def _fill_hashes(self, paths, slot, hash_func, workers):
+        """Compute missing hashes for paths into entry[slot] using a thread pool."""
+        todo = [p for p in paths if self.entries[p][slot] is None]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, digest in zip(todo, pool.map(hash_func, todo)):
+                self.entries[path][slot] = digest
+
+    def _group(self, paths, key_func):
+        """Group paths by key, skipping paths whose key is empty (hash failed)."""
+        groups = {}
+        for path in paths:
+            key = key_func(path)
+            if not key:
+                continue
+            groups.setdefault(key, []).append(path)
+        return groups
+
+    def _content_key(self, path):
+        """Get the hash that covers a file's whole content (None if unknown)."""
+        size, _, quick_hash, full_hash = self.entries[path]
+        return quick_hash if size <= 2 * CHUNK_SIZE else full_hash
+
+    def _quick_hash(self, path):
+        """Hash the first and last CHUNK_SIZE bytes of a file."""
+        try:
+            with open(path, 'rb') as f:
+                h = hashlib.blake2b(f.read(CHUNK_SIZE), digest_size=16)
+                size = os.fstat(f.fileno()).st_size
+                if size > CHUNK_SIZE:
+                    f.seek(max(CHUNK_SIZE, size - CHUNK_SIZE))
+                    h.update(f.read(CHUNK_SIZE))
+                return h.hexdigest()
+        except OSError:
+            return None
+
+    def _full_hash(self, path):
+        """Hash the whole file."""
+        try:
+            with open(path, 'rb') as f:
+                h = hashlib.blake2b(digest_size=16)
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(chunk)
+                return h.hexdigest()
+        except OSError:
+            return None
+
+    def load(self):
+        """Load cached hashes and results from JSON file."""
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                self.entries = data.get('entries', {})
+                self.duplicates = data.get('duplicates', {})
+        except (json.JSONDecodeError, IOError):
+            self.entries = {}
+            self.duplicates = {}
+
+    def save(self):
+        """Save hashes and results atomically."""
+        tmp_file = self.cache_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self.entries, 'duplicates': self.duplicates},
+                          f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except IOError:
+            pass  # Fail silently if can't write
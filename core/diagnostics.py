@@ -0,0 +1,138 @@
+"""Memory diagnostics - RSS, allocation sites by subsystem and the low-memory budget.
+
+Allocation sites come from tracemalloc, which only sees memory allocated
+after it starts and slows Python down a little, so it is started at
+launch only when "trace_memory" is on (or on demand from the report).
+RSS is read from /proc, which works on Linux and Android/Termux.
+
+With "memory_budget_mb" set, MemoryBudget asks the app to drop optional
+in-memory structures (search indexes, group indexes, the full tag cache)
+whenever RSS goes over the budget. They are rebuilt on demand.
+"""
+
+import os
+import time
+import tracemalloc
+
+
+# Subsystem -> path fragments of the files whose allocations it owns (first match wins)
+SUBSYSTEMS = [
+    ("library", ("core/library.py", "core/library_db.py", "core/scanner.py", "core/snapshot.py",
+                 "core/offset_index.py", "core/watcher.py", "core/dedup.py", "sqlite3")),
+    ("search", ("core/search.py", "core/groups.py")),
+    ("metadata", ("core/metadata.py", "core/tags.py")),
+    ("queue", ("core/queue.py", "core/track.py")),
+    ("streams", ("core/streams.py", "core/youtube_cache.py")),
+    ("ytmusicapi", ("ytmusicapi", "requests", "urllib3")),
+    ("ui", ("ui/",)),
+]
+
+DROP_INTERVAL = 30  # Seconds between drops, so caches aren't thrown away on every key
+
+
+def rss_bytes(pid="self"):
+    """Resident set size of a process in bytes (None if unavailable)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def subsystem_of(filename):
+    """Subsystem an allocation in a source file belongs to."""
+    filename = filename.replace(os.sep, "/")
+    for name, fragments in SUBSYSTEMS:
+        if any(fragment in filename for fragment in fragments):
+            return name
+    return "other"
+
+
+def start_tracing(frames=1):
+    """Start tracemalloc if it isn't running."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    """Stop tracemalloc and free its traces."""
+    tracemalloc.stop()
+
+
+def allocation_report(top=10):
+    """
+    Summarize traced memory.
+
+    Returns:
+        Dict with traced (current bytes), peak, subsystems (list of
+        (name, bytes), largest first) and sites (list of (file:line, bytes,
+        count)), or None if tracemalloc isn't running
+    """
+    if not tracemalloc.is_tracing():
+        return None
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    by_file = snapshot.statistics('filename')
+    subsystems = {}
+    for stat in by_file:
+        name = subsystem_of(stat.traceback[0].filename)
+        subsystems[name] = subsystems.get(name, 0) + stat.size
+
+    sites = []
+    for stat in snapshot.statistics('lineno')[:top]:
+        frame = stat.traceback[0]
+        sites.append((f"{_short_path(frame.filename)}:{frame.lineno}", stat.size, stat.count))
+
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced': current,
+        'peak': peak,
+        'subsystems': sorted(subsystems.items(), key=lambda item: item[1], reverse=True),
+        'sites': sites,
+    }
+
+
+def _short_path(filename):
+    """Path relative to the app (or the last two parts for libraries)."""
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if filename.startswith(app_dir + os.sep):
+        return os.path.relpath(filename, app_dir)
+    return os.path.join(*filename.split(os.sep)[-2:]) if os.sep in filename else filename
+
+
+class MemoryBudget:
+    """Drops optional caches when RSS goes over a budget."""
+
+    def __init__(self, budget_mb, on_over_budget):
+        """
+        Args:
+            budget_mb: RSS budget in MB (0 = no budget)
+            on_over_budget: Called to drop optional structures
+        """
+        self.budget = budget_mb * 1024 * 1024
+        self.on_over_budget = on_over_budget
+        self.drops = 0
+        self._last_drop = 0
+
+    def check(self):
+        """Drop optional caches if over budget (at most once per DROP_INTERVAL).
+
+        Returns:
+            True if caches were dropped
+        """
+        if not self.budget or time.monotonic() - self._last_drop < DROP_INTERVAL:
+            return False
+        rss = rss_bytes()
+        if rss is None or rss <= self.budget:
+            return False
+        self._last_drop = time.monotonic()
+        self.drops += 1
+        self.on_over_budget()
+        return True
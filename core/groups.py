@@ -0,0 +1,85 @@
+"""Group indexes - the library grouped by folder, artist or album.
+
+A GroupIndex is built once per library snapshot and then patched with the
+tracks a scan added, removed or re-tagged, so browsing groups never walks
+the whole library again. Each group keeps its songs in library (name)
+order, so opening a group costs only the size of that group.
+"""
+
+import os
+from bisect import bisect_left, insort
+from core.scanner import natural_key, sort_key
+
+
+GROUP_VIEWS = ["folder", "artist", "album"]
+UNKNOWN = {"artist": "Unknown Artist", "album": "Unknown Album"}
+
+
+def _song_order(path):
+    """Position of a song within a group - the library's (sort_key, path) order."""
+    return (sort_key(path), path)
+
+
+class GroupIndex:
+    """Songs grouped by one view (folder, artist or album)."""
+
+    def __init__(self, view, songs, metadata):
+        """
+        Build the index.
+
+        Args:
+            view: One of GROUP_VIEWS
+            songs: Library songs in name order
+            metadata: MetadataCache with the tags of those songs
+        """
+        self.view = view
+        self.groups = {}  # group name -> songs in name order
+        self._names = None  # Sorted group names, built on first use
+        for path in songs:
+            self.groups.setdefault(self.group_of(path, metadata), []).append(path)
+
+    def group_of(self, path, metadata):
+        """Name of the group a song belongs to."""
+        if self.view == "folder":
+            return os.path.dirname(path)
+        return str(metadata.get(path).get(self.view) or UNKNOWN[self.view])
+
+    def names(self):
+        """Group names in natural order, untagged songs last."""
+        if self._names is None:
+            unknown = UNKNOWN.get(self.view)
+            self._names = sorted(self.groups, key=lambda name: (name == unknown, natural_key(name), name))
+        return self._names
+
+    def members(self, name):
+        """Songs of a group in name order (shared list - do not modify)."""
+        return self.groups.get(name, [])
+
+    def update(self, added, removed, old_metadata, new_metadata):
+        """
+        Patch the index after a library change.
+
+        Args:
+            added: Songs new to the library (or re-tagged)
+            removed: Songs gone from the library (or re-tagged)
+            old_metadata: Tags the index was built with (for removed songs)
+            new_metadata: Current tags (for added songs)
+        """
+        for path in removed:
+            name = self.group_of(path, old_metadata)
+            members = self.groups.get(name)
+            if not members:
+                continue
+            i = bisect_left(members, _song_order(path), key=_song_order)
+            if i < len(members) and members[i] == path:
+                del members[i]
+            if not members:
+                del self.groups[name]
+                self._names = None
+
+        for path in added:
+            name = self.group_of(path, new_metadata)
+            if name not in self.groups:
+                self.groups[name] = []
+                self._names = None
+            insort(self.groups[name], path, key=_song_order)
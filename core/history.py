@@ -0,0 +1,144 @@
+"""Playback history - a bounded ring buffer of recently played tracks.
+
+Slots are a fixed-size list with a start index, so recording a track,
+stepping back and stepping forward are all O(1) whatever the size. A
+cursor marks the track playing now; going back moves the cursor, and
+"next" moves it forward again before anything new comes off the queue.
+Playing something new after going back drops the entries after the
+cursor, like a browser's history.
+
+History is saved as one JSON track per line (Track.to_dict layout),
+appended as tracks are played. Once the file holds twice the capacity it
+is rewritten with just the live entries. Loading keeps the last
+`capacity` lines, skipping a half-written last one.
+"""
+
+import json
+import os
+import threading
+from constants import DATA_DIR
+from core.track import Track
+
+
+HISTORY_FILE = os.path.join(DATA_DIR, "history.jsonl")
+HISTORY_SIZE = 200  # Tracks remembered
+
+
+class PlaybackHistory:
+    """Recently played tracks with a cursor for previous/next."""
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._start = 0  # Slot of the oldest entry
+        self._count = 0
+        self.cursor = -1  # Entry playing now (0 = oldest), -1 when empty
+        self._lines = 0  # Lines in the history file
+        self._lock = threading.Lock()  # Track end is handled on the player's monitor thread
+        self.load()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        """Entry i, 0 = oldest."""
+        if not 0 <= i < self._count:
+            raise IndexError("history index out of range")
+        return self._slots[(self._start + i) % self.capacity]
+
+    def current(self):
+        """Track at the cursor (playing now, or last played), or None."""
+        return self[self.cursor] if self._count else None
+
+    def record(self, track):
+        """Add a newly played track at the cursor, dropping any entries after it."""
+        with self._lock:
+            truncated = self.cursor < self._count - 1
+            if truncated:
+                self._count = self.cursor + 1
+            if self._count == self.capacity:
+                # Full - the new entry takes the oldest one's slot
+                self._slots[self._start] = track
+                self._start = (self._start + 1) % self.capacity
+            else:
+                self._slots[(self._start + self._count) % self.capacity] = track
+                self._count += 1
+            self.cursor = self._count - 1
+
+            if truncated or self._lines >= 2 * self.capacity:
+                self._rewrite()
+            else:
+                self._append(track)
+
+    def previous(self):
+        """
+        Step back one entry.
+
+        Returns:
+            Track to play again, or None at the oldest entry
+        """
+        with self._lock:
+            if self.cursor <= 0:
+                return None
+            self.cursor -= 1
+            return self[self.cursor]
+
+    def next(self):
+        """
+        Step forward one entry (only after stepping back).
+
+        Returns:
+            Track to play again, or None at the newest entry (play from the queue)
+        """
+        with self._lock:
+            if self.cursor >= self._count - 1:
+                return None
+            self.cursor += 1
+            return self[self.cursor]
+
+    def entries(self):
+        """All entries, oldest first."""
+        return [self[i] for i in range(self._count)]
+
+    def load(self):
+        """Load the last `capacity` tracks from the history file."""
+        try:
+            with open(HISTORY_FILE, 'r') as f:
+                lines = f.readlines()
+        except IOError:
+            return
+
+        self._lines = len(lines)
+        for line in lines[-self.capacity:]:
+            try:
+                track = Track.from_dict(json.loads(line))
+            except (json.JSONDecodeError, AttributeError):
+                continue  # Torn last line
+            if track:
+                self._slots[self._count] = track
+                self._count += 1
+        self._start = 0
+        self.cursor = self._count - 1
+        if lines and not lines[-1].endswith("\n"):
+            self._rewrite()  # Don't append after a torn line
+
+    def _append(self, track):
+        """Append one entry to the history file. Caller must hold _lock."""
+        try:
+            with open(HISTORY_FILE, 'a') as f:
+                f.write(json.dumps(track.to_dict(), separators=(',', ':')) + "\n")
+            self._lines += 1
+        except IOError:
+            pass  # Fail silently
+
+    def _rewrite(self):
+        """Replace the history file with the live entries. Caller must hold _lock."""
+        tmp_file = HISTORY_FILE + ".tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                for track in self.entries():
+                    f.write(json.dumps(track.to_dict(), separators=(',', ':')) + "\n")
+            os.replace(tmp_file, HISTORY_FILE)
+            self._lines = self._count
+        except (IOError, OSError):
+            pass  # Fail silently
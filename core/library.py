@@ -0,0 +1,293 @@
+"""Library service - one shared, sorted snapshot of the local library.
+
+Owned by App. Screens ask it for songs instead of loading the library
+themselves, so opening Local Music repeatedly costs nothing until the
+library actually changes. The snapshot is rebuilt when a scan cache (or
+the duplicate results) changes on disk, or when invalidate() is called
+after a scan, watcher batch or background refresh. The player's monitor
+thread reads it too (shuffle-all draws from songs()), so the snapshot and
+every view and index built from it are read and rebuilt under one lock.
+
+With the offset_index setting on, the name-ordered snapshot is also
+written to an mmap'ed index file (core.offset_index). A later start whose
+scan caches are unchanged pages straight from that file instead of
+loading the library, and tags are looked up per visible song until
+something needs all of them.
+"""
+
+import os
+import sqlite3
+import threading
+from constants import PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE, DEDUP_CACHE, LIBRARY_INDEX
+from core.config import load_config
+from core.scanner import load_library, find_cache_file, sort_key
+from core.metadata import MetadataCache
+from core.library_db import get_library_db
+from core.offset_index import OffsetIndex, OffsetIndexError, write_offset_index
+from core.dedup import DuplicateFinder
+from core.search import SearchIndex, PrefixIndex
+from core.groups import GroupIndex
+from core.track import Track
+
+
+class LibraryService:
+    """Shared library snapshot with change-based invalidation."""
+
+    SORT_MODES = ["name", "artist", "album", "duration"]
+
+    def __init__(self):
+        self.generation = 0  # Bumped every time the snapshot is rebuilt
+        self._metadata = None  # MetadataCache of the snapshot, loaded on first use
+        self._songs = None  # Unique songs in name order (a list or an OffsetIndex)
+        self._views = {}  # (sort mode, hide duplicates) -> sorted song list
+        self._search_indexes = {}  # hide duplicates -> SearchIndex over the name-ordered view
+        self._prefix_indexes = {}  # hide duplicates -> PrefixIndex over the name-ordered view
+        self._groups = {}  # view -> GroupIndex, kept across snapshots
+        self._signature = None
+        self._invalidated = False
+        self.low_memory = False  # Look up tags per song instead of loading them all
+        self._lock = threading.RLock()  # UI thread and the player's monitor thread (shuffle-all)
+
+    def invalidate(self):
+        """Mark the snapshot stale. Safe to call from background threads."""
+        self._invalidated = True
+
+    def refresh(self):
+        """Rebuild the snapshot if the library changed.
+
+        Returns:
+            Current generation (compare with a saved one to detect changes)
+        """
+        with self._lock:
+            signature = self._cache_signature()
+            if self._songs is None or self._invalidated or signature != self._signature:
+                self._invalidated = False
+                self._signature = signature
+                old_songs, old_metadata = self._songs, self._metadata
+                self._songs = self._load(signature)
+                self._metadata = None
+                self._update_groups(old_songs, old_metadata)
+                self._views = {}
+                self._search_indexes = {}
+                self._prefix_indexes = {}
+                self.generation += 1
+            return self.generation
+
+    @property
+    def metadata(self):
+        """MetadataCache with the tags of every song (loaded on first use)."""
+        with self._lock:
+            if self._metadata is None:
+                self._metadata = MetadataCache()
+            return self._metadata
+
+    def tags(self, path):
+        """
+        Get the cached tags of one song.
+
+        Reads just that song from the database while the snapshot is an
+        offset index (or in low-memory mode) and nothing has needed every
+        tag yet.
+        """
+        with self._lock:
+            if self._metadata is None and (self.low_memory or isinstance(self._songs, OffsetIndex)):
+                try:
+                    return get_library_db().tags(path)
+                except sqlite3.Error:
+                    return {}
+            return self.metadata.get(path)
+
+    def drop_optional(self):
+        """Free what can be rebuilt on demand: search, jump and group indexes,
+        tag-sorted views and the full tag cache. Switches to low-memory mode."""
+        with self._lock:
+            self._search_indexes = {}
+            self._prefix_indexes = {}
+            self._groups = {}
+            self._views = {key: view for key, view in self._views.items() if key == ("name", False)}
+            self._metadata = None
+            self.low_memory = True
+
+    def track(self, path):
+        """
+        Get a Track for a song, titled "Artist - Title" when it is tagged.
+
+        Untagged songs get their filename as title, derived on first use.
+        """
+        tags = self.tags(path)
+        title = None
+        if tags.get('title'):
+            title = f"{tags['artist']} - {tags['title']}" if tags.get('artist') else tags['title']
+        return Track.local(path, title)
+
+    def _load(self, signature):
+        """Load the name-ordered library, through the offset index if enabled."""
+        if not load_config().get('offset_index'):
+            return load_library()
+
+        try:
+            index = OffsetIndex(LIBRARY_INDEX)
+            if index.signature == list(signature):
+                return index
+            index.close()
+        except OffsetIndexError:
+            pass  # Missing or unreadable - rebuild it below
+
+        songs = load_library()
+        try:
+            write_offset_index(LIBRARY_INDEX, songs, list(signature))
+        except OSError:
+            pass  # The in-memory list still works
+        return songs
+
+    def songs(self, sort_mode="name", hide_duplicates=False):
+        """
+        Get the library as a sorted list.
+
+        The list is shared between callers and must not be modified.
+
+        Args:
+            sort_mode: One of SORT_MODES
+            hide_duplicates: Leave out extra copies found by DuplicateFinder
+
+        Returns:
+            List of audio file paths (an OffsetIndex for the name order
+            when the offset index is in use)
+        """
+        with self._lock:
+            self.refresh()
+            key = (sort_mode, hide_duplicates)
+            if key not in self._views:
+                songs = self._songs
+                if hide_duplicates:
+                    duplicates = DuplicateFinder().duplicates
+                    songs = [path for path in songs if path not in duplicates]
+                self._views[key] = self._sort(songs, sort_mode)
+            return self._views[key]
+
+    def groups(self, view):
+        """
+        Get the library grouped by a view.
+
+        Built on first use, then patched with each library change instead
+        of being rebuilt.
+
+        Args:
+            view: One of core.groups.GROUP_VIEWS
+
+        Returns:
+            GroupIndex
+        """
+        with self._lock:
+            self.refresh()
+            if view not in self._groups:
+                self._groups[view] = GroupIndex(view, self._songs, self.metadata)
+            return self._groups[view]
+
+    def group_songs(self, view, name, hide_duplicates=False):
+        """
+        Get the songs of one group, ready to show.
+
+        Folders keep name order, artists are ordered by album and track,
+        albums by track.
+
+        Returns:
+            List of audio file paths (may be shared - do not modify)
+        """
+        with self._lock:
+            songs = self.groups(view).members(name)
+            if hide_duplicates:
+                duplicates = DuplicateFinder().duplicates
+                songs = [path for path in songs if path not in duplicates]
+            if view == "folder":
+                return songs
+            return self._sort(songs, view)
+
+    def _update_groups(self, old_songs, old_metadata):
+        """Patch built group indexes with the songs added, removed or re-tagged."""
+        if not self._groups:
+            return
+        if old_songs is None:
+            self._groups = {}
+            return
+
+        old = set(old_songs)
+        new = set(self._songs)
+        added = [path for path in self._songs if path not in old]
+        removed = [path for path in old_songs if path not in new]
+        # Re-tagged songs may move between artist/album groups
+        retagged = [path for path in self._songs
+                    if path in old and old_metadata.get(path) != self.metadata.get(path)]
+        if len(added) + len(removed) + len(retagged) > max(1000, len(self._songs) // 10):
+            # A big change (first scan, new root) - regrouping is cheaper than patching
+            self._groups = {view: GroupIndex(view, self._songs, self.metadata) for view in self._groups}
+            return
+        for index in self._groups.values():
+            index.update(added + retagged, removed + retagged, old_metadata, self.metadata)
+
+    def search_index(self, hide_duplicates=False):
+        """
+        Get a search index over the library, built once per snapshot.
+
+        Entries are the songs in name order; each is searchable by its
+        filename (without extension) and its title, artist and album tags.
+
+        Returns:
+            SearchIndex whose items are audio file paths
+        """
+        with self._lock:
+            self.refresh()
+            if hide_duplicates not in self._search_indexes:
+                songs = self.songs("name", hide_duplicates)
+                self._search_indexes[hide_duplicates] = SearchIndex(songs, self._search_text)
+            return self._search_indexes[hide_duplicates]
+
+    def prefix_index(self, hide_duplicates=False):
+        """
+        Get the jump-to-prefix index of songs(hide_duplicates=...) in name
+        order, built once per snapshot.
+
+        Returns:
+            PrefixIndex
+        """
+        with self._lock:
+            self.refresh()
+            if hide_duplicates not in self._prefix_indexes:
+                self._prefix_indexes[hide_duplicates] = PrefixIndex(self.songs("name", hide_duplicates))
+            return self._prefix_indexes[hide_duplicates]
+
+    def _search_text(self, path):
+        """Filename and tags of a song as one string."""
+        tags = self.metadata.get(path)
+        parts = [os.path.splitext(os.path.basename(path))[0]]
+        parts.extend(str(tags[field]) for field in ('title', 'artist', 'album') if tags.get(field))
+        return ' '.join(parts)
+
+    def _sort(self, songs, sort_mode):
+        """Sort name-ordered songs by a sort mode using cached tags."""
+        if sort_mode == "name":
+            return songs
+
+        def tag_key(path):
+            tags = self.metadata.get(path)
+            name = sort_key(path)
+            if sort_mode == "artist":
+                # Untagged songs go last
+                return (tags.get('artist', '\uffff').lower(), tags.get('album', '').lower(),
+                        tags.get('track', 0), name)
+            if sort_mode == "album":
+                return (tags.get('album', '\uffff').lower(), tags.get('track', 0), name)
+            return (tags.get('duration', float('inf')), name)
+
+        return sorted(songs, key=tag_key)
+
+    def _cache_signature(self):
+        """mtimes of every scan cache and the duplicate results (None if missing)."""
+        signature = []
+        for path in [find_cache_file(cache_file) for cache_file in
+                     [PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE]] + [DEDUP_CACHE]:
+            try:
+                signature.append(os.stat(path).st_mtime_ns if path else None)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
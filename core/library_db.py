@@ -0,0 +1,360 @@
+"""SQLite library store - tracks, scan roots and tags in one indexed database.
+
+Scans and the library watcher write here incrementally (upserts and
+deletes of what changed), and the library is read back in sorted order
+with indexed queries instead of parsing every scan cache. The scanner still writes a
+cache file per scan mode (compact snapshot or JSON); those are imported
+once when the database is first created.
+
+Each track belongs to a source, named after the scan cache it came from
+("phone_music_cache", "termux_music_cache", ...), so clearing or
+rescanning one scan mode only touches its own rows.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from constants import (
+    LIBRARY_DB, PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE, METADATA_CACHE
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    path TEXT NOT NULL,
+    UNIQUE (source, path)
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    root_id INTEGER REFERENCES roots(id),
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    canon TEXT NOT NULL,
+    dev INTEGER,
+    ino INTEGER,
+    hidden INTEGER NOT NULL DEFAULT 0,  -- 1 for aliases of a file listed under another path
+    UNIQUE (source, path)
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    track INTEGER,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_sort ON tracks (hidden, sort_key, path);
+CREATE INDEX IF NOT EXISTS tracks_path ON tracks (path);
+CREATE INDEX IF NOT EXISTS tracks_dir ON tracks (dir);
+CREATE INDEX IF NOT EXISTS tracks_file_id ON tracks (dev, ino);
+CREATE INDEX IF NOT EXISTS tracks_canon ON tracks (canon);
+CREATE INDEX IF NOT EXISTS metadata_artist ON metadata (artist COLLATE NOCASE);
+"""
+
+# A track is shown unless another row is the same file (same inode, or the
+# same canonical storage path) under a shorter path, or is the same path
+# scanned by another source. Mirrors load_library. Evaluated when tracks are
+# written and stored in tracks.hidden, so reads are plain index scans.
+UNIQUE_TRACKS = """
+NOT EXISTS (
+    SELECT 1 FROM tracks o
+    WHERE o.dev = t.dev AND o.ino = t.ino
+      AND (length(o.path) < length(t.path)
+           OR (length(o.path) = length(t.path) AND o.path < t.path)
+           OR (o.path = t.path AND o.id < t.id))
+) AND NOT EXISTS (
+    SELECT 1 FROM tracks o
+    WHERE o.canon = t.canon
+      AND (length(o.path) < length(t.path)
+           OR (length(o.path) = length(t.path) AND o.path < t.path)
+           OR (o.path = t.path AND o.id < t.id))
+)
+"""
+
+TAG_COLUMNS = ('title', 'artist', 'album', 'track', 'duration')
+SORT_KEY_VERSION = '2'  # Bump when core.scanner.sort_key changes (1 = lowercase filename)
+
+
+def source_name(cache_file):
+    """Name a source after its scan cache file (e.g. "termux_music_cache")."""
+    return os.path.splitext(os.path.basename(cache_file))[0]
+
+
+LIBRARY_SOURCE = source_name(LIBRARY_CACHE)  # Multi-root source, whose roots can be removed
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_library_db():
+    """Get the shared LibraryDB, creating it (and migrating JSON caches) on first use."""
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = LibraryDB()
+        return _db
+
+
+class LibraryDB:
+    """SQLite store for the local library."""
+
+    HIDDEN_RECHECK_LIMIT = 1000  # More changed tracks than this: recheck all aliases at once
+
+    def __init__(self, db_file=LIBRARY_DB):
+        """
+        Open (and create if needed) the database.
+
+        Args:
+            db_file: Path to the SQLite database file
+        """
+        self.db_file = db_file
+        self._lock = threading.RLock()  # One connection shared by scan, watcher and UI threads
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.migrate_json()
+        self._update_sort_keys()
+
+    def close(self):
+        """Close the connection."""
+        with self._lock:
+            self.conn.close()
+
+    # ---- writing tracks ----
+
+    def sync_source(self, source, roots, files, ids, file_roots, sort_keys=None):
+        """
+        Make a source's tracks match a finished scan, writing only what changed.
+
+        Args:
+            source: Source name (see source_name)
+            roots: Root paths of the scan, in root-index order
+            files: All audio file paths now in the source
+            ids: Dict of path -> (st_dev, st_ino)
+            file_roots: Dict of path -> root index
+            sort_keys: Dict of path -> sort_key already computed by the scan
+        """
+        sort_keys = sort_keys or {}
+        if source == LIBRARY_SOURCE:
+            # Files outside every library root belong to a removed root
+            files = [path for path in files if file_roots.get(path) is not None]
+        with self._lock, self.conn:
+            root_ids = self._root_ids(source, roots)
+            existing = {}
+            canons = {}
+            for path, dev, ino, root_id, canon in self.conn.execute(
+                    "SELECT path, dev, ino, root_id, canon FROM tracks WHERE source = ?", (source,)):
+                existing[path] = (dev, ino, root_id)
+                canons[path] = canon
+
+            current = set(files)
+            gone = [path for path in existing if path not in current]
+            self.conn.executemany("DELETE FROM tracks WHERE source = ? AND path = ?",
+                                  [(source, path) for path in gone])
+
+            rows = []
+            for path in files:
+                file_id = ids.get(path) or (None, None)
+                root_idx = file_roots.get(path)
+                root_id = root_ids[root_idx] if root_idx is not None and root_idx < len(root_ids) else None
+                if existing.get(path) != (file_id[0], file_id[1], root_id):
+                    rows.append(self._track_row(path, source, root_id, file_id, sort_keys.get(path)))
+            self._upsert_tracks(rows)
+
+            keys = {(canons[path], *existing[path][:2]) for path in gone}
+            keys.update((row[6], row[7], row[8]) for row in rows)
+            self._refresh_hidden(keys if len(keys) < self.HIDDEN_RECHECK_LIMIT else None)
+
+            # Roots no longer scanned by this source
+            self.conn.execute(
+                f"DELETE FROM roots WHERE source = ? AND id NOT IN ({','.join('?' * len(root_ids))})",
+                (source, *root_ids))
+
+    def apply_changes(self, source, added, removed, ids, file_roots, roots):
+        """
+        Apply watcher changes to a source.
+
+        Args:
+            source: Source name (see source_name)
+            added: Audio file paths to add
+            removed: Paths to remove (a directory removes everything under it)
+            ids: Dict of path -> (st_dev, st_ino) for added files
+            file_roots: Dict of path -> root index for added files
+            roots: Root paths of the source, in root-index order
+        """
+        with self._lock, self.conn:
+            # Aliases of changed files may need to be shown or hidden afterwards
+            keys = set()
+            for path in removed:
+                prefix = path.rstrip(os.sep) + os.sep
+                # Range on the (source, path) index instead of LIKE (paths may contain % or _)
+                where = "source = ? AND (path = ? OR (path >= ? AND path < ?))"
+                params = (source, path, prefix, prefix + '\U0010ffff')
+                keys.update(self.conn.execute(f"SELECT canon, dev, ino FROM tracks WHERE {where}", params))
+                self.conn.execute(f"DELETE FROM tracks WHERE {where}", params)
+
+            root_ids = self._root_ids(source, roots)
+            rows = []
+            for path in added:
+                root_idx = file_roots.get(path)
+                root_id = root_ids[root_idx] if root_idx is not None and root_idx < len(root_ids) else None
+                rows.append(self._track_row(path, source, root_id, ids.get(path) or (None, None)))
+            self._upsert_tracks(rows)
+            keys.update((row[6], row[7], row[8]) for row in rows)
+            self._refresh_hidden(keys)
+
+    def clear_source(self, source):
+        """Remove every track and root of a source."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM tracks WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM roots WHERE source = ?", (source,))
+            self._refresh_hidden()
+
+    def _root_ids(self, source, roots):
+        """Get root row ids for a source's roots, adding new ones."""
+        self.conn.executemany("INSERT OR IGNORE INTO roots (source, path) VALUES (?, ?)",
+                              [(source, root) for root in roots])
+        by_path = dict(self.conn.execute("SELECT path, id FROM roots WHERE source = ?", (source,)))
+        return [by_path[root] for root in roots]
+
+    def _refresh_hidden(self, keys=None):
+        """
+        Recompute tracks.hidden.
+
+        Args:
+            keys: (canon, dev, ino) of changed tracks - only their aliases are
+                rechecked. None rechecks every track.
+        """
+        query = f"SELECT t.id, NOT ({UNIQUE_TRACKS}), t.hidden FROM tracks t"
+        if keys is None:
+            rows = self.conn.execute(query).fetchall()
+        else:
+            ids = set()
+            for canon, dev, ino in keys:
+                ids.update(row[0] for row in self.conn.execute(
+                    "SELECT id FROM tracks WHERE canon = ? OR (dev = ? AND ino = ?)", (canon, dev, ino)))
+            rows = [self.conn.execute(query + " WHERE t.id = ?", (track_id,)).fetchone() for track_id in ids]
+        self.conn.executemany("UPDATE tracks SET hidden = ? WHERE id = ?",
+                              [(hide, track_id) for track_id, hide, hidden in rows if hide != hidden])
+
+    def _track_row(self, path, source, root_id, file_id, key=None):
+        """Build a tracks row for an upsert."""
+        from core.scanner import canonical_path, sort_key
+        return (path, source, root_id, os.path.dirname(path), os.path.basename(path),
+                key or sort_key(path), canonical_path(path), file_id[0], file_id[1])
+
+    def _upsert_tracks(self, rows):
+        """Insert tracks, updating ones whose path is already present."""
+        self.conn.executemany("""
+            INSERT INTO tracks (path, source, root_id, dir, name, sort_key, canon, dev, ino)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, path) DO UPDATE SET
+                root_id = excluded.root_id,
+                dev = excluded.dev, ino = excluded.ino
+        """, rows)
+
+    # ---- reading tracks ----
+
+    def all_paths(self):
+        """All unique tracks in filename order."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT path FROM tracks WHERE hidden = 0 ORDER BY sort_key, path")]
+
+    # ---- metadata ----
+
+    def metadata_entries(self):
+        """
+        Load every cached tag entry.
+
+        Returns:
+            Dict of path -> [size, mtime, tags] (the MetadataCache layout)
+        """
+        entries = {}
+        with self._lock:
+            for row in self.conn.execute(
+                    "SELECT path, size, mtime, title, artist, album, track, duration FROM metadata"):
+                tags = {key: value for key, value in zip(TAG_COLUMNS, row[3:]) if value is not None}
+                entries[row[0]] = [row[1], row[2], tags]
+        return entries
+
+    def tags(self, path):
+        """Cached tags of one path (empty dict if unknown)."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT title, artist, album, track, duration FROM metadata WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return {}
+        return {key: value for key, value in zip(TAG_COLUMNS, row) if value is not None}
+
+    def upsert_metadata(self, entries):
+        """
+        Store tag entries.
+
+        Args:
+            entries: Dict of path -> [size, mtime, tags]
+        """
+        rows = [(path, size, mtime, *(tags.get(key) for key in TAG_COLUMNS))
+                for path, (size, mtime, tags) in entries.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metadata (path, size, mtime, title, artist, album, track, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # ---- migration ----
+
+    def migrate_json(self):
+        """Import the JSON scan caches and tag cache once, when the database is new."""
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM info WHERE key = 'json_migrated'").fetchone():
+                return
+
+        from core.scanner import Scanner
+        scanner = Scanner(cache_format='json', compress_cache=False)
+        for cache_file in [PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE]:
+            files, ids, roots, file_roots = scanner._read_cache_data(cache_file)
+            if files:
+                self.sync_source(source_name(cache_file), roots, files, ids, file_roots)
+
+        entries = self._read_json(METADATA_CACHE).get('entries', {})
+        if entries:
+            self.upsert_metadata(entries)
+
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('json_migrated', '1')")
+
+    def _update_sort_keys(self):
+        """Recompute stored sort keys if they were made by an older sort_key."""
+        from core.scanner import sort_key
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value FROM info WHERE key = 'sort_key_version'").fetchone()
+            if row and row[0] == SORT_KEY_VERSION:
+                return
+            self.conn.executemany("UPDATE tracks SET sort_key = ? WHERE id = ?",
+                                  [(sort_key(path), track_id) for track_id, path in
+                                   self.conn.execute("SELECT id, path FROM tracks").fetchall()])
+            self.conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('sort_key_version', ?)",
+                              (SORT_KEY_VERSION,))
+
+    def _read_json(self, path):
+        """Load a JSON file, or an empty dict if it is missing or broken."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
@@ -0,0 +1,97 @@
+"""Metadata stage - reads tags for scanned files and caches them.
+
+Tags are cached by (path, size, mtime) so unchanged files are never
+re-parsed. They are stored in the metadata table of the library database
+and checkpointed while the pool runs, so an interrupted run picks up where
+it left off.
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from core.library_db import get_library_db
+from core.tags import read_tags
+
+
+class MetadataCache:
+    """Tag cache for local audio files."""
+    
+    def __init__(self, db=None):
+        """
+        Initialize and load the cache.
+        
+        Args:
+            db: LibraryDB to store tags in (the shared one if None)
+        """
+        self.db = db or get_library_db()
+        self.entries = {}  # path -> [size, mtime, tags]
+        self._dirty = {}  # Entries parsed since the last save
+        self.load()
+    
+    def get(self, path):
+        """Get cached tags for a path (empty dict if unknown)."""
+        entry = self.entries.get(path)
+        return entry[2] if entry else {}
+    
+    def update(self, paths, progress_callback=None, workers=4, checkpoint_every=250):
+        """
+        Read tags for new or changed files using a worker pool.
+        
+        Args:
+            paths: Audio file paths (usually the result of Scanner.scan)
+            progress_callback: Function to call with progress updates (path, count)
+            workers: Number of worker threads
+            checkpoint_every: Save the cache after this many parsed files
+            
+        Returns:
+            Number of files that were (re)parsed
+        """
+        parsed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, entry in pool.map(self._read_if_changed, paths):
+                if entry is None:
+                    continue  # Unchanged or unreadable
+                
+                self.entries[path] = entry
+                self._dirty[path] = entry
+                parsed += 1
+                if progress_callback:
+                    progress_callback(path, parsed)
+                if parsed % checkpoint_every == 0:
+                    self.save()
+        
+        if parsed:
+            self.save()
+        return parsed
+    
+    def _read_if_changed(self, path):
+        """Worker: stat the file and parse tags if the cache is stale.
+        
+        Returns:
+            Tuple of (path, [size, mtime, tags]) or (path, None) if unchanged
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return path, None
+        
+        entry = self.entries.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return path, None
+        
+        return path, [st.st_size, st.st_mtime, read_tags(path)]
+    
+    def load(self):
+        """Load cached tags from the database."""
+        try:
+            self.entries = self.db.metadata_entries()
+        except sqlite3.Error:
+            self.entries = {}
+    
+    def save(self):
+        """Write entries parsed since the last save (one transaction)."""
+        try:
+            self.db.upsert_metadata(self._dirty)
+            self._dirty = {}
+        except sqlite3.Error:
+            pass  # Fail silently if can't write
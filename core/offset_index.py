@@ -0,0 +1,137 @@
+"""On-disk offset index - the sorted library as a memory-mapped, read-only file.
+
+Opening the index costs the same for 100 songs or 100k: the file is
+mmap'ed and only the rows actually looked at (the visible page) are
+decoded. Layout:
+
+    header: magic b"TXOIDX", version u8, pad u8, count u32, signature length u32
+    signature: UTF-8 JSON - the library cache signature the index was built from
+    offsets: (count + 1) u64 - row i is blob[offsets[i]:offsets[i + 1]]
+    blob: UTF-8 paths back to back, in (sort_key, path) order
+
+Integers are little-endian. The signature lets a reader tell whether the
+index still matches the scan caches without touching the rows.
+"""
+
+import os
+import json
+import mmap
+import struct
+from bisect import bisect_left
+from core.scanner import sort_key
+
+
+MAGIC = b"TXOIDX"
+VERSION = 1
+HEADER = struct.Struct('<6sBBII')  # magic, version, pad, count, signature length
+OFFSET = struct.Struct('<Q')
+ROW = struct.Struct('<QQ')  # Two neighbouring offsets = one row's start and end
+
+
+class OffsetIndexError(Exception):
+    """Raised when an index file is missing, truncated or not an index."""
+
+
+def write_offset_index(path, songs, signature=None):
+    """
+    Write an index file atomically.
+
+    Args:
+        path: Index file to write
+        songs: Audio file paths in (sort_key, path) order
+        signature: JSON-serializable stamp of what the index was built from
+    """
+    meta = json.dumps(signature).encode('utf-8')
+    rows = [song.encode('utf-8', 'surrogateescape') for song in songs]
+    offsets = [0]
+    for row in rows:
+        offsets.append(offsets[-1] + len(row))
+
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(rows), len(meta)))
+        f.write(meta)
+        f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+        f.write(b''.join(rows))
+    os.replace(tmp_file, path)
+
+
+class OffsetIndex:
+    """Read-only sequence of library paths backed by an mmap'ed index file.
+
+    Supports len(), indexing, slicing, iteration, `in` and index() - enough
+    to stand in for the song list in Paginator and LibraryService.
+    Membership and index() binary-search the sort order.
+    """
+
+    def __init__(self, path):
+        """
+        Map an index file.
+
+        Raises:
+            OffsetIndexError: If the file is unreadable or not an index
+        """
+        try:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise OffsetIndexError(str(e))
+
+        if len(self._map) < HEADER.size:
+            raise OffsetIndexError("truncated index")
+        magic, version, _, count, meta_len = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise OffsetIndexError("not a txplay index")
+        self._count = count
+        self._offsets = HEADER.size + meta_len
+        self._blob = self._offsets + (count + 1) * OFFSET.size
+        if len(self._map) < self._blob:
+            raise OffsetIndexError("truncated index")
+        try:
+            self.signature = json.loads(self._map[HEADER.size:self._offsets].decode('utf-8'))
+        except ValueError as e:
+            raise OffsetIndexError(str(e))
+        (blob_len,) = OFFSET.unpack_from(self._map, self._offsets + count * OFFSET.size)
+        if len(self._map) < self._blob + blob_len:
+            raise OffsetIndexError("truncated index")
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def _row(self, i):
+        """Decode row i (no bounds check)."""
+        start, end = ROW.unpack_from(self._map, self._offsets + i * OFFSET.size)
+        return self._map[self._blob + start:self._blob + end].decode('utf-8', 'surrogateescape')
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._row(i) for i in range(*key.indices(self._count))]
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("index out of range")
+        return self._row(key)
+
+    def __iter__(self):
+        return (self._row(i) for i in range(self._count))
+
+    def index(self, value):
+        """Position of a path (binary search), or ValueError if absent."""
+        if not isinstance(value, str):
+            raise ValueError(f"{value!r} is not in the index")
+        target = (sort_key(value), value)
+        i = bisect_left(self, target, key=lambda path: (sort_key(path), path))
+        if i < self._count and self._row(i) == value:
+            return i
+        raise ValueError(f"{value!r} is not in the index")
+
+    def __contains__(self, value):
+        try:
+            self.index(value)
+            return True
+        except ValueError:
+            return False
@@ -1,18 +1,58 @@
-"""Universal queue manager for local files and online streams."""
+"""Universal queue manager for local files and online streams.
+
+The queue is a deque persisted in two parts:
+
+    queue.json     snapshot: {"generation": n, "items": [...]}
+    queue.journal  operations since the snapshot, one JSON list per line:
+                   ["gen", n] header, then ["add", item], ["pop"],
+                   ["remove", index], ["clear"] or ["mode", mode]
+
+Each change appends one line instead of rewriting the whole queue (a bulk
+add appends all its lines in one write). Once the
+journal holds more operations than the queue has items it is compacted in a
+background thread: the journal is moved to queue.journal.old, new operations
+start a fresh journal for the next generation, and the snapshot is written
+(to a temp file, then renamed) before the old journal is deleted. Loading
+replays the snapshot and any journal of the same or a later generation, so a
+crash at any point loses at most a half-written last line.
+
+Shuffle and repeat are part of the same state ("mode"). Shuffle-all does not
+queue the library: once the queued items run out, next() draws the next song
+of a lazy permutation over shuffle_source() (see core.shuffle), and only the
+permutation's seed and position are saved.
+"""
 
 import json
 import os
+import threading
+from collections import deque
 from constants import DATA_DIR
+from core.track import Track, LOCAL, YOUTUBE, STREAM
+from core.shuffle import Shuffle
 
 
 QUEUE_FILE = os.path.join(DATA_DIR, "queue.json")
+QUEUE_JOURNAL = os.path.join(DATA_DIR, "queue.journal")
+QUEUE_JOURNAL_OLD = QUEUE_JOURNAL + ".old"  # Journal being folded into the snapshot
+
+COMPACT_MIN_OPS = 256  # Journals shorter than this are never compacted
+
+REPEAT_MODES = ["off", "all", "one"]
 
 
 class QueueManager:
     """Manages playback queue for both local files and online streams."""
     
     def __init__(self):
-        self.items = []
+        self.items = deque()  # Track records
+        self._lock = threading.RLock()  # The player's monitor thread pops at track end
+        self._generation = 0  # Snapshot generation the current journal continues
+        self._journal = None  # Journal file, open for appending
+        self._journal_ops = 0  # Operations in the current journal
+        self._compactor = None  # Background compaction thread
+        self.shuffle = None  # Shuffle over shuffle_source() once the queued items run out
+        self.shuffle_source = None  # Function giving the song paths to shuffle (set by the app)
+        self.repeat = "off"  # One of REPEAT_MODES
         self.load()
     
     def add(self, item_type, path_or_url, title, metadata=None):
@@ -21,34 +61,46 @@ class QueueManager:
         Args:
             item_type: "local", "youtube", or "stream"
             path_or_url: File path or URL
-            title: Display title
+            title: Display title (None = derive from the path/URL when shown)
             metadata: Optional metadata dict
         """
-        item = {
-            "type": item_type,
-            "path" if item_type == "local" else "url": path_or_url,
-            "title": title
-        }
-        
-        if metadata:
-            item["metadata"] = metadata
+        self.add_track(Track(item_type, path_or_url, title, metadata))
+    
+    def add_track(self, track):
+        """Add a Track to the queue."""
+        with self._lock:
+            self.items.append(track)
+            self._log("add", track.to_dict())
+    
+    def add_tracks(self, tracks):
+        """
+        Add many Tracks in order (a folder, an album, search results) with one journal write.
         
-        self.items.append(item)
-        self.save()
+        Args:
+            tracks: Iterable of Tracks
+            
+        Returns:
+            Number of tracks added
+        """
+        tracks = list(tracks)
+        if not tracks:
+            return 0
+        with self._lock:
+            self.items.extend(tracks)
+            self._log_many([("add", track.to_dict()) for track in tracks])
+        return len(tracks)
     
     def add_local(self, path, title=None):
         """Add local file to queue."""
-        if title is None:
-            title = os.path.basename(path)
-        self.add("local", path, title)
+        self.add(LOCAL, path, title)
     
     def add_youtube(self, url, title, metadata=None):
         """Add YouTube stream to queue."""
-        self.add("youtube", url, title, metadata)
+        self.add(YOUTUBE, url, title, metadata)
     
     def add_stream(self, url, title):
         """Add generic stream to queue."""
-        self.add("stream", url, title)
+        self.add(STREAM, url, title)
     
     def next(self):
         """Get and remove next item from queue (FIFO).
@@ -56,41 +108,100 @@ class QueueManager:
         Song is removed as soon as this is called (when it starts playing).
         
         Returns:
-            Next queue item dict or None if queue is empty
+            Next Track or None if queue is empty
         """
-        if not self.items:
-            return None
-        
-        # Pop first item (FIFO - first in, first out)
-        item = self.items.pop(0)
-        self.save()
-        return item
+        with self._lock:
+            if not self.items:
+                return self._next_shuffled()
+            
+            # Pop first item (FIFO - first in, first out)
+            item = self.items.popleft()
+            if self.repeat == "all":
+                # Played items go round to the back
+                self.items.append(item)
+                self._log_many([("pop",), ("add", item.to_dict())])
+            else:
+                self._log("pop")
+            return item
     
     def peek_next(self):
         """Peek at next item without removing it.
         
         Returns:
-            Next queue item dict or None
+            Next Track or None
         """
         if not self.items:
-            return None
+            songs = self._shuffle_songs()
+            if songs is None:
+                return None
+            index = self.shuffle.peek(self.repeat != "off")
+            return None if index is None else Track.local(songs[index])
         
         return self.items[0]
     
+    def start_shuffle(self, seed=None):
+        """Shuffle the whole shuffle_source() after the queued items (a new order each time)."""
+        songs = self.shuffle_source() if self.shuffle_source else None
+        with self._lock:
+            self.shuffle = Shuffle(len(songs) if songs else 0, seed)
+            self._log("mode", self._mode())
+    
+    def stop_shuffle(self):
+        """Stop drawing from the shuffle (queued items are kept)."""
+        with self._lock:
+            self.shuffle = None
+            self._log("mode", self._mode())
+    
+    def set_repeat(self, mode):
+        """Set the repeat mode (one of REPEAT_MODES)."""
+        with self._lock:
+            self.repeat = mode
+            self._log("mode", self._mode())
+    
+    def _shuffle_songs(self):
+        """Songs the shuffle draws from, resized to follow the library, or None if not shuffling."""
+        if self.shuffle is None or self.shuffle_source is None:
+            return None
+        songs = self.shuffle_source()
+        self.shuffle.resize(len(songs))
+        return songs
+    
+    def _next_shuffled(self):
+        """Draw the next shuffled song. Caller must hold _lock."""
+        songs = self._shuffle_songs()
+        if songs is None:
+            return None
+        index = self.shuffle.next(self.repeat != "off")
+        if index is None:
+            self.shuffle = None  # Every song played once
+        self._log("mode", self._mode())
+        return None if index is None else Track.local(songs[index])
+    
+    def _mode(self):
+        """Shuffle and repeat state as saved in the journal and snapshot."""
+        return {'shuffle': self.shuffle.to_dict() if self.shuffle else None, 'repeat': self.repeat}
+    
+    def _set_mode(self, mode):
+        """Restore saved shuffle and repeat state."""
+        self.shuffle = Shuffle.from_dict(mode['shuffle']) if mode.get('shuffle') else None
+        self.repeat = mode.get('repeat', "off")
+    
     def remove(self, index):
         """Remove item at index from queue."""
-        if 0 <= index < len(self.items):
-            self.items.pop(index)
-            self.save()
+        with self._lock:
+            if 0 <= index < len(self.items):
+                del self.items[index]
+                self._log("remove", index)
     
     def clear(self):
-        """Clear entire queue."""
-        self.items = []
-        self.save()
+        """Clear entire queue (shuffle and repeat stay as they are)."""
+        with self._lock:
+            self.items.clear()
+            self._log("clear")
     
     def get_all(self):
         """Get all items in queue."""
-        return self.items.copy()
+        return list(self.items)
     
     def get_count(self):
         """Get number of items in queue."""
@@ -104,21 +215,162 @@ class QueueManager:
         return self.peek_next()
     
     def save(self):
-        """Save queue to JSON file."""
-        try:
-            with open(QUEUE_FILE, 'w') as f:
-                json.dump({'items': self.items}, f, indent=2)
-        except IOError:
-            pass  # Fail silently
+        """Write the whole queue as a snapshot now and start an empty journal."""
+        with self._lock:
+            if self._compactor is not None:
+                self._compactor.join()  # It deletes queue.journal.old when done
+            if os.path.exists(QUEUE_JOURNAL_OLD):
+                # Left by a crash or a failed compaction - fold it into a snapshot
+                # (which also covers the current journal) before rotating over it
+                self._compact(list(self.items), self._generation + 1, self._mode())
+                if os.path.exists(QUEUE_JOURNAL_OLD):
+                    return  # Both journals are kept - load replays them on the old snapshot
+            self._compact(*self._rotate())
     
     def load(self):
-        """Load queue from JSON file."""
-        if not os.path.exists(QUEUE_FILE):
-            return
-        
+        """Load the snapshot and replay the journals written after it."""
+        generation = 0
         try:
             with open(QUEUE_FILE, 'r') as f:
                 data = json.load(f)
-                self.items = data.get('items', [])
+            tracks = (Track.from_dict(item) for item in data.get('items', []))
+            self.items = deque(track for track in tracks if track)
+            self._set_mode(data.get('mode', {}))
+            generation = data.get('generation', 0)
         except (json.JSONDecodeError, IOError):
-            pass  # Start with empty queue
+            pass  # No snapshot yet (or unreadable) - the journals may still hold the queue
+        
+        self._generation = generation
+        clean = True
+        for path in (QUEUE_JOURNAL_OLD, QUEUE_JOURNAL):
+            replayed = self._replay(path, generation)
+            if replayed is None:
+                # An outdated journal must not be appended to
+                clean = clean and not os.path.exists(path)
+                continue
+            journal_generation, ops, complete = replayed
+            self._generation = journal_generation
+            self._journal_ops = ops
+            clean = clean and complete and path == QUEUE_JOURNAL
+        
+        if not clean:
+            # Left over from a crash: a torn last line or an unfinished compaction
+            self.save()
+    
+    def _replay(self, path, generation):
+        """
+        Apply a journal's operations to the loaded items.
+        
+        Args:
+            path: Journal file
+            generation: Generation of the loaded snapshot (older journals are
+                already part of it)
+        
+        Returns:
+            Tuple of (journal generation, operations applied, True if every
+            line was read), or None if the journal is missing or outdated
+        """
+        try:
+            f = open(path, 'r')
+        except IOError:
+            return None
+        
+        with f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+            if not isinstance(header, list) or header[:1] != ["gen"] or header[1] < generation:
+                return None
+            
+            items = self.items
+            ops = 0
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    return header[1], ops, False  # Torn write - everything before it is intact
+                name = op[0]
+                if name == "add":
+                    track = Track.from_dict(op[1])
+                    if track:
+                        items.append(track)
+                elif name == "pop":
+                    if items:
+                        items.popleft()
+                elif name == "remove":
+                    if 0 <= op[1] < len(items):
+                        del items[op[1]]
+                elif name == "clear":
+                    items.clear()
+                elif name == "mode":
+                    self._set_mode(op[1])
+                ops += 1
+        return header[1], ops, True
+    
+    def _log(self, *op):
+        """Append an operation to the journal. Caller must hold _lock."""
+        self._log_many([op])
+    
+    def _log_many(self, ops):
+        """Append operations to the journal in one write. Caller must hold _lock."""
+        try:
+            if self._journal is None:
+                self._open_journal()
+            self._journal.write(''.join(json.dumps(op, separators=(',', ':')) + "\n" for op in ops))
+            self._journal.flush()
+        except IOError:
+            return  # Fail silently
+        
+        self._journal_ops += len(ops)
+        if self._journal_ops > max(COMPACT_MIN_OPS, len(self.items)) and self._can_compact():
+            self._compactor = threading.Thread(target=self._compact, args=self._rotate(), daemon=True)
+            self._compactor.start()
+    
+    def _open_journal(self, truncate=False):
+        """Open the journal for appending, starting it with a header if it is new."""
+        self._journal = open(QUEUE_JOURNAL, 'w' if truncate else 'a')
+        if self._journal.tell() == 0:
+            self._journal.write(json.dumps(["gen", self._generation]) + "\n")
+            self._journal.flush()
+    
+    def _can_compact(self):
+        """Check that no compaction is running or left unfinished."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return False
+        return not os.path.exists(QUEUE_JOURNAL_OLD)  # A failed one - its journal must stay
+    
+    def _rotate(self):
+        """
+        Start a new journal generation. Caller must hold _lock.
+        
+        Returns:
+            Tuple of (items to snapshot, their generation, mode) for _compact
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(QUEUE_JOURNAL):
+            os.replace(QUEUE_JOURNAL, QUEUE_JOURNAL_OLD)
+        self._generation += 1
+        self._journal_ops = 0
+        try:
+            self._open_journal(truncate=True)
+        except IOError:
+            self._journal = None
+        return list(self.items), self._generation, self._mode()
+    
+    def _compact(self, tracks, generation, mode):
+        """Write a snapshot of tracks as a generation, then drop the journal it replaces."""
+        tmp_file = QUEUE_FILE + ".tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({'generation': generation, 'mode': mode, 'items': [track.to_dict() for track in tracks]},
+                          f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, QUEUE_FILE)
+            if os.path.exists(QUEUE_JOURNAL_OLD):
+                os.remove(QUEUE_JOURNAL_OLD)
+        except (IOError, OSError):
+            pass  # Both journals are kept - load replays them on the old snapshot
@@ -0,0 +1,135 @@
+"""Startup library refresh - catches up in the background when the cache is stale.
+
+Only folders modified since the cache was written are listed again (see
+LibraryWatcher.catch_up), and the differences go through
+Scanner.apply_changes, so a stale 50k-song library costs a folder walk
+rather than a full scan.
+"""
+
+import os
+import time
+import threading
+from core.config import load_config, get_scan_target, get_prune_rules
+from core.scanner import find_cache_file
+from core.watcher import LibraryWatcher
+from core.metadata import MetadataCache
+
+
+def _lower_thread_priority():
+    """Make the calling thread as nice as possible (Linux sets niceness per thread)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass  # Not supported here - the refresh still yields between folders
+
+
+def is_cache_stale(config=None):
+    """
+    Check if the configured scan mode's cache is out of date.
+    
+    The cache is stale if it is older than refresh_max_age_hours, or if any
+    scan root or one of its immediate subfolders changed after it was written.
+    Folder mtimes only change when entries are added or removed directly in
+    them, so this is a cheap check rather than a full walk.
+    
+    Args:
+        config: Config dict (loaded from file if None)
+        
+    Returns:
+        Tuple of (stale, reason)
+    """
+    if config is None:
+        config = load_config()
+    paths, cache_file, _ = get_scan_target(config)
+    
+    try:
+        cache_mtime = os.path.getmtime(find_cache_file(cache_file) or cache_file)
+    except OSError:
+        return False, "never scanned"  # First scan is up to the user
+    
+    max_age = config.get('refresh_max_age_hours', 24) * 3600
+    if time.time() - cache_mtime > max_age:
+        return True, "cache expired"
+    
+    for root in paths:
+        if isinstance(root, dict):
+            root = root['path']  # Library mode roots carry their own rules
+        try:
+            if os.stat(root).st_mtime > cache_mtime:
+                return True, f"{root} changed"
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir() and entry.stat().st_mtime > cache_mtime:
+                        return True, f"{entry.path} changed"
+        except OSError:
+            continue
+    
+    return False, "up to date"
+
+
+class _Stopped(Exception):
+    """Raised inside the folder walk to abandon a refresh."""
+
+
+class BackgroundRefresh:
+    """Low-priority background catch-up of the configured library."""
+    
+    def __init__(self, on_complete=None, delay=3.0):
+        """
+        Initialize refresh.
+        
+        Args:
+            on_complete: Function called with the added files after a refresh
+            delay: Seconds to wait before checking, so startup isn't slowed
+        """
+        self.on_complete = on_complete
+        self.delay = delay
+        self.state = "idle"  # idle, checking, refreshing, done
+        self.reason = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Check staleness and refresh in a background thread."""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Abandon the refresh (the cache is only written at the end)."""
+        self._stop.set()
+    
+    def _run(self):
+        """Wait, check, and refresh if stale."""
+        _lower_thread_priority()
+        if self._stop.wait(self.delay):
+            return
+        
+        self.state = "checking"
+        config = load_config()
+        stale, self.reason = is_cache_stale(config)
+        if not stale:
+            self.state = "done"
+            return
+        
+        self.state = "refreshing"
+        paths, cache_file, exclude_phone_storage = get_scan_target(config)
+        watcher = LibraryWatcher(paths, cache_file, exclude_phone_storage, get_prune_rules(config))
+        try:
+            since = os.path.getmtime(find_cache_file(cache_file) or cache_file)
+            added = watcher.catch_up(since, on_folder=self._yield)
+        except _Stopped:
+            return
+        except OSError:
+            self.state = "done"  # The cache was cleared meanwhile
+            return
+        MetadataCache().update(added, workers=1)
+        
+        self.state = "done"
+        if self.on_complete and not self._stop.is_set():
+            self.on_complete(added)
+    
+    def _yield(self, path):
+        """Per-folder callback: give the UI thread the GIL now and then."""
+        if self._stop.is_set():
+            raise _Stopped()
+        time.sleep(0)
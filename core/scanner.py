@@ -1,32 +1,303 @@
 """Music file scanner with smart caching."""
 
 import os
+import re
 import json
-from constants import AUDIO_EXTENSIONS
+import time
+import heapq
+import fnmatch
+import sqlite3
+import threading
+from core.config import load_config
+from core.snapshot import snapshot_path, write_snapshot, read_snapshot, SnapshotError
+from constants import (
+    AUDIO_EXTENSIONS, PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE,
+    SHARED_STORAGE_PATH, STORAGE_ALIASES, SCAN_CHECKPOINT
+)
+
+
+# Cache files can be written from the library watcher thread as well as
+# from a foreground scan, so all cache writes go through this lock.
+_cache_lock = threading.Lock()
+
+# Seconds between scan checkpoints (progress saved in case the app is killed)
+CHECKPOINT_INTERVAL = 10
+
+
+def find_cache_file(cache_file):
+    """Get the file a cache is stored in (snapshot or JSON), or None if it doesn't exist."""
+    for path in (snapshot_path(cache_file), cache_file):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# Scans remembered in a cache manifest's history
+MANIFEST_HISTORY = 10
+
+
+def manifest_path(cache_file):
+    """Get the sidecar file holding a cache's count and scan stats."""
+    return os.path.splitext(cache_file)[0] + ".manifest.json"
+
+
+def read_manifest(cache_file):
+    """
+    Load a cache's manifest without reading the cache itself.
+    
+    Returns:
+        Dict with count, bytes, roots, format, last_scan, scan_seconds,
+        files_per_sec and history (newest first), or None if there is no
+        manifest or it was written for a different cache file than the one
+        now on disk
+    """
+    path = find_cache_file(cache_file)
+    if path is None:
+        return None
+    try:
+        with open(manifest_path(cache_file), 'r') as f:
+            manifest = json.load(f)
+        stamp = os.stat(path)
+    except (json.JSONDecodeError, IOError, OSError):
+        return None
+    # A cache rewritten without its manifest (older version, crash between writes) has a new stamp
+    if manifest.get('cache_stamp') != [os.path.basename(path), stamp.st_size, stamp.st_mtime_ns]:
+        return None
+    return manifest
+
+
+def remove_manifest(cache_file):
+    """Delete a cache's manifest (when the cache itself is cleared)."""
+    try:
+        os.remove(manifest_path(cache_file))
+    except OSError:
+        pass
+
+
+_DIGIT_RUN = re.compile(r'[0-9]+')
+
+
+def _number_key(match):
+    """Encode a digit run as its length and value, so numbers compare by value."""
+    digits = match.group().lstrip('0') or '0'
+    return f"{len(digits):02d}{digits}"
+
+
+def natural_key(text):
+    """Natural, case-insensitive sort key for any text ("2" before "10")."""
+    return _DIGIT_RUN.sub(_number_key, text.casefold())
+
+
+def sort_key(path):
+    """Natural, case-insensitive sort key for a track's filename.
+    
+    "Track 2" sorts before "Track 10". The key is a plain string, so it can
+    be stored and indexed (see core.library_db) as well as compared.
+    """
+    return natural_key(os.path.basename(path))
+
+
+def merge_sorted(lists):
+    """
+    Merge path lists that are each in sort_key order into one list.
+    
+    Lists are presorted when caches are written, so this is a linear k-way
+    merge. A list that isn't sorted (a cache from an older version) is
+    sorted first.
+    
+    Returns:
+        List of paths in (sort_key, path) order
+    """
+    keyed = []
+    for paths in lists:
+        keys = [(sort_key(p), p) for p in paths]
+        if any(a > b for a, b in zip(keys, keys[1:])):
+            keys.sort()
+        keyed.append(keys)
+    return [path for _, path in heapq.merge(*keyed)]
+
+
+def canonical_path(path):
+    """Map Android storage aliases (/sdcard, ~/storage/shared, ...) to one prefix.
+    
+    Pure string operation - used when a file has no cached (dev, inode) id.
+    """
+    for alias in STORAGE_ALIASES:
+        if path == alias or path.startswith(alias + os.sep):
+            return SHARED_STORAGE_PATH + path[len(alias):]
+    return path
+
+
+def load_checkpoint():
+    """Load the interrupted-scan checkpoint, or None if there isn't one."""
+    if not os.path.exists(SCAN_CHECKPOINT):
+        return None
+    
+    try:
+        with open(SCAN_CHECKPOINT, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return None
+
+
+def has_checkpoint(paths, cache_file):
+    """Check if an interrupted scan of these roots can be resumed."""
+    if isinstance(paths, str):
+        paths = [paths]
+    checkpoint = load_checkpoint()
+    return bool(checkpoint) and checkpoint.get('roots') == list(paths) \
+        and checkpoint.get('cache_file') == cache_file
+
+
+def clear_checkpoint():
+    """Delete the scan checkpoint."""
+    try:
+        os.remove(SCAN_CHECKPOINT)
+    except OSError:
+        pass
+
+
+def load_library():
+    """
+    Load all unique songs from the library database.
+    
+    Returns:
+        List of unique audio file paths, sorted alphabetically by filename
+    """
+    try:
+        from core.library_db import get_library_db
+        return get_library_db().all_paths()
+    except sqlite3.Error:
+        # Database unusable (e.g. storage full) - the JSON snapshots still work
+        return _load_library_json()
+
+
+def _load_library_json():
+    """
+    Load and merge songs from all cache files.
+    
+    The same physical file can be cached under several paths (storage
+    aliases, symlinks). Files are matched by the (st_dev, st_ino) id recorded
+    at scan time, falling back to the canonical storage prefix, and the
+    shortest path is kept.
+    
+    Returns:
+        List of unique audio file paths, sorted alphabetically by filename
+    """
+    scanner = Scanner()
+    caches = [scanner._read_cache(cache_file)
+              for cache_file in [PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE]]
+    
+    # First pass: the shortest path of each file (by id and by canonical path)
+    best = {}
+    ids = {}
+    for files, cache_ids in caches:
+        ids.update(cache_ids)
+        for path in files:
+            for key in (canonical_path(path), cache_ids.get(path)):
+                if key and (key not in best or (len(path), path) < (len(best[key]), best[key])):
+                    best[key] = path
+    
+    # Second pass: merge the presorted caches, keeping only those paths
+    unique_songs = []
+    last = None
+    for path in merge_sorted(files for files, _ in caches):
+        file_id = ids.get(path)
+        if path != last and best[canonical_path(path)] == path and (not file_id or best[file_id] == path):
+            unique_songs.append(path)
+        last = path
+    
+    return unique_songs
 
 
 class Scanner:
     """Recursively scan directories for audio files."""
     
-    def __init__(self, status_callback=None, exclude_phone_storage=False):
+    def __init__(self, status_callback=None, exclude_phone_storage=False, prune_rules=None,
+                 checkpoint=True, cache_format=None, compress_cache=None):
         """
         Initialize scanner.
         
         Args:
             status_callback: Function to call with progress updates (path, count)
             exclude_phone_storage: If True, skip /sdcard and /storage paths
+                (default for roots that don't set their own)
+            prune_rules: Optional dict with ignore_globs, honor_nomedia,
+                min_file_size and max_scan_depth (see core.config.get_prune_rules)
+            checkpoint: Save resumable progress while scanning (background
+                refreshes turn this off so they never clash with a user scan)
+            cache_format: "compact" (core.snapshot) or "json"; from config if None
+            compress_cache: zlib-compress compact caches; from config if None
         """
         self.status_callback = status_callback
         self.visited_paths = set()  # Track visited paths to avoid symlink loops
         self.exclude_phone_storage = exclude_phone_storage
+        self.checkpoint = checkpoint
+        
+        if cache_format is None or compress_cache is None:
+            config = load_config()
+            if cache_format is None:
+                cache_format = config.get('cache_format', 'compact')
+            if compress_cache is None:
+                compress_cache = config.get('compress_cache', True)
+        self.cache_format = cache_format
+        self.compress_cache = compress_cache
+        
+        rules = prune_rules or {}
+        self.ignore_globs = list(rules.get('ignore_globs') or [])
+        self.honor_nomedia = rules.get('honor_nomedia', False)
+        self.min_file_size = rules.get('min_file_size') or 0
+        self.max_depth = rules.get('max_scan_depth') or 0  # 0 = unlimited
+        
+        # Scan summary
+        self.stats = {
+            'dirs_scanned': 0,
+            'dirs_skipped': 0,
+            'files_skipped': 0,
+            'bytes_skipped': 0,
+        }
+        self.skipped_dirs = []  # Pruned directories (stale cache entries under them are dropped)
+        self.file_ids = {}  # path -> (st_dev, st_ino), recorded while scanning
+        self.file_roots = {}  # path -> index into self.roots of the root it was found under
+        self.sort_keys = {}  # path -> sort_key, computed once per scan for sorting and the database
+        self.file_sizes = {}  # path -> size in bytes, for the cache manifest
+        self.roots = []  # Normalized roots of the current scan (see set_roots)
+        self.frontier = []  # Directories still to scan: (path, depth, root index)
+        self.found = []  # Audio files found by the current scan
     
-    def scan(self, paths, cache_file):
+    def set_roots(self, roots):
+        """
+        Set the scan roots, each with its own exclude rules.
+        
+        Args:
+            roots: Paths, or dicts with 'path' and optional
+                'exclude_phone_storage' and 'ignore_globs' (added to the global ones)
+        """
+        self.roots = []
+        for root in roots:
+            if isinstance(root, str):
+                root = {'path': root}
+            self.roots.append({
+                'path': root['path'],
+                'exclude_phone_storage': root.get('exclude_phone_storage', self.exclude_phone_storage),
+                'ignore_globs': self.ignore_globs + list(root.get('ignore_globs') or []),
+            })
+    
+    def scan(self, paths, cache_file, resume=False):
         """
         Smart scan: merge new files with existing cache.
         
+        Progress is checkpointed to SCAN_CHECKPOINT every CHECKPOINT_INTERVAL
+        seconds so a scan killed part way through can be resumed.
+        
+        All roots are walked in one pass with a shared visited set, so
+        overlapping roots (one inside another, or symlinked) are walked once.
+        
         Args:
-            paths: List of paths to scan (or single path string)
+            paths: List of roots to scan (or single path string); see set_roots
             cache_file: Path to cache JSON file
+            resume: Continue from the checkpoint of an interrupted scan of
+                the same roots instead of starting over
             
         Returns:
             Sorted list of audio file paths
@@ -35,102 +306,469 @@ class Scanner:
         if isinstance(paths, str):
             paths = [paths]
         
+        self.set_roots(paths)
+        started = time.monotonic()
+        
         # Load existing cache
-        old_files = self._load_cache(cache_file)
+        old_files, old_ids = self._read_cache(cache_file)
+        
+        # Scan fresh (or pick up where the interrupted scan stopped)
+        if not (resume and self._restore_checkpoint(paths, cache_file)):
+            self.found = []
+            self.frontier = [(root['path'], 0, idx) for idx, root in reversed(list(enumerate(self.roots)))
+                             if os.path.isdir(root['path'])]
+        self._scan_frontier(paths, cache_file)
+        new_files = self.found
         
-        # Scan fresh
-        new_files = []
-        for path in paths:
-            if os.path.exists(path) and os.path.isdir(path):
-                new_files.extend(self._scan_directory(path))
+        # Library mode: a root removed from library_roots takes its songs with it
+        if cache_file == LIBRARY_CACHE:
+            old_files = [f for f in old_files if self._root_of(f) is not None]
+        
+        # Forget cached files under directories that are now pruned
+        if self.skipped_dirs:
+            prefixes = tuple(d.rstrip(os.sep) + os.sep for d in self.skipped_dirs)
+            old_files = [f for f in old_files if not f.startswith(prefixes)]
         
         # Merge: combine old + new, remove duplicates
         all_files = list(set(old_files + new_files))
         
-        # Remove files that no longer exist
-        existing_files = [f for f in all_files if os.path.exists(f)]
+        # Remove files that no longer exist (the stat also gives the size for the manifest)
+        existing_files = []
+        for f in all_files:
+            try:
+                self.file_sizes[f] = os.stat(f).st_size
+            except OSError:
+                continue
+            existing_files.append(f)
+        
+        # Sort by natural filename order, computing each key once
+        self.sort_keys = {f: sort_key(f) for f in existing_files}
+        existing_files.sort(key=lambda f: (self.sort_keys[f], f))
         
-        # Sort alphabetically by filename
-        existing_files.sort(key=lambda f: os.path.basename(f).lower())
+        # Identify each file so aliases can be merged at load time
+        ids = {}
+        for f in existing_files:
+            ids[f] = self.file_ids.get(f) or old_ids.get(f) or self._stat_id(f)
+            if f not in self.file_roots:
+                self.file_roots[f] = self._root_of(f)
         
-        # Save to cache
-        self._save_cache(cache_file, existing_files)
+        # Save to cache - the checkpoint is no longer needed
+        self._save_cache(cache_file, existing_files, ids)
+        self._write_manifest(cache_file, existing_files, scan_seconds=time.monotonic() - started, resumed=resume)
+        if self.checkpoint:
+            clear_checkpoint()
         
         return existing_files
     
-    def _scan_directory(self, path):
+    def _scan_frontier(self, roots, cache_file):
+        """Scan directories from the frontier stack until it is empty."""
+        last_checkpoint = time.monotonic()
+        while self.frontier:
+            path, depth, root_idx = self.frontier.pop()
+            self._scan_directory(path, depth, root_idx)
+            
+            if self.checkpoint and time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                self._save_checkpoint(roots, cache_file)
+                last_checkpoint = time.monotonic()
+    
+    def _save_checkpoint(self, roots, cache_file):
+        """Write the frontier, visited set and files found so far."""
+        checkpoint = {
+            'roots': list(roots),
+            'cache_file': cache_file,
+            'time': time.time(),
+            'frontier': self.frontier,
+            'visited': list(self.visited_paths),
+            'found': self.found,
+            'file_ids': self.file_ids,
+            'file_roots': self.file_roots,
+            'stats': self.stats,
+            'skipped_dirs': self.skipped_dirs,
+        }
+        tmp_file = SCAN_CHECKPOINT + ".tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(checkpoint, f, separators=(',', ':'))
+            os.replace(tmp_file, SCAN_CHECKPOINT)
+        except IOError:
+            pass  # Fail silently - the scan still completes normally
+    
+    def _restore_checkpoint(self, roots, cache_file):
+        """Restore scan state from a checkpoint of the same roots.
+        
+        Returns:
+            True if state was restored
+        """
+        if not has_checkpoint(roots, cache_file):
+            return False
+        checkpoint = load_checkpoint()
+        
+        # Checkpoints from before multi-root scans have (path, depth) items
+        self.frontier = [(item[0], item[1], item[2] if len(item) > 2 else 0)
+                         for item in checkpoint.get('frontier', [])]
+        self.visited_paths = set(checkpoint.get('visited', []))
+        self.found = checkpoint.get('found', [])
+        self.file_ids = {path: tuple(file_id) for path, file_id in checkpoint.get('file_ids', {}).items()}
+        self.file_roots = checkpoint.get('file_roots', {})
+        self.stats.update(checkpoint.get('stats', {}))
+        self.skipped_dirs = checkpoint.get('skipped_dirs', [])
+        return True
+    
+    def _scan_directory(self, path, depth=0, root_idx=0):
         """
-        Recursively scan a directory for audio files.
+        Scan one directory: audio files go to self.found, subdirectories
+        are pushed onto the frontier.
         
         Args:
             path: Directory path to scan
-            
-        Returns:
-            List of audio file paths
+            depth: How many levels below the scan root this directory is
+            root_idx: Index of the root (in self.roots) being walked
         """
-        music_files = []
-        
         # Avoid infinite loops with symlinks
         real_path = os.path.realpath(path)
         if real_path in self.visited_paths:
-            return music_files
+            return
         self.visited_paths.add(real_path)
         
         # Skip phone storage paths if exclude_phone_storage is enabled
-        if self.exclude_phone_storage:
-            if real_path.startswith('/sdcard') or real_path.startswith('/storage'):
-                return music_files
+        if self.is_excluded(real_path, root_idx):
+            return
         
         try:
-            items = os.listdir(path)
+            # scandir gives us file types without a stat per entry
+            with os.scandir(path) as it:
+                entries = list(it)
         except (PermissionError, OSError):
             # Skip inaccessible directories silently
-            return music_files
+            return
+        
+        # Android .nomedia marker hides the whole folder from media apps
+        if self.honor_nomedia and any(e.name == '.nomedia' for e in entries):
+            self._skip_dir(path)
+            return
+        
+        self.stats['dirs_scanned'] += 1
         
-        for item in items:
-            full_path = os.path.join(path, item)
+        # All plain files in a directory share its device
+        try:
+            dir_dev = os.stat(path).st_dev
+        except OSError:
+            dir_dev = None
+        
+        subdirs = []
+        for entry in entries:
+            full_path = entry.path
             
             # Update progress
             if self.status_callback:
-                self.status_callback(full_path, len(music_files))
+                self.status_callback(full_path, len(self.found))
             
             # Check if directory or symlink to directory
-            if os.path.isdir(full_path):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            
+            if is_dir:
+                # Prune before descending: ignore rules and depth limit
+                if self.is_ignored_dir(entry.name, full_path, root_idx) or (self.max_depth and depth >= self.max_depth):
+                    self._skip_dir(full_path)
+                    continue
+                
                 # Skip phone storage symlinks/paths during Termux scan
-                if self.exclude_phone_storage:
-                    real_subpath = os.path.realpath(full_path)
-                    if real_subpath.startswith('/sdcard') or real_subpath.startswith('/storage'):
-                        continue  # Skip this directory
+                if self.roots[root_idx]['exclude_phone_storage'] and \
+                        self.is_excluded(os.path.realpath(full_path), root_idx):
+                    continue  # Skip this directory
                 
-                # Recursively scan subdirectory
-                music_files.extend(self._scan_directory(full_path))
+                # Scan subdirectory later (depth-first, in listing order)
+                subdirs.append((full_path, depth + 1, root_idx))
             
             # Check if it's an audio file
             elif self._is_audio_file(full_path):
-                music_files.append(full_path)
+                if self.min_file_size:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    if size < self.min_file_size:
+                        # Ringtones, notification sounds, voice-note stubs
+                        self.stats['files_skipped'] += 1
+                        self.stats['bytes_skipped'] += size
+                        continue
+                self.found.append(full_path)
+                self.file_roots[full_path] = root_idx
+                
+                # d_ino comes free with the directory listing; symlinks need a stat
+                if entry.is_symlink() or dir_dev is None:
+                    self.file_ids[full_path] = self._stat_id(full_path)
+                else:
+                    self.file_ids[full_path] = (dir_dev, entry.inode())
+        
+        self.frontier.extend(reversed(subdirs))
+    
+    def _skip_dir(self, path):
+        """Record a pruned directory in the scan summary."""
+        self.stats['dirs_skipped'] += 1
+        self.skipped_dirs.append(path)
+    
+    def is_ignored_dir(self, name, path, root_idx=None):
+        """Check a directory against the ignore globs (by name or full path).
         
-        return music_files
+        Args:
+            name: Directory name
+            path: Full directory path
+            root_idx: Root being walked (uses its globs), or None for the global globs
+        """
+        globs = self.ignore_globs if root_idx is None else self.roots[root_idx]['ignore_globs']
+        for pattern in globs:
+            if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern):
+                return True
+        return False
+    
+    def is_excluded(self, real_path, root_idx=None):
+        """Check if a resolved directory path should not be scanned."""
+        exclude = self.exclude_phone_storage if root_idx is None else self.roots[root_idx]['exclude_phone_storage']
+        if exclude:
+            return real_path.startswith('/sdcard') or real_path.startswith('/storage')
+        return False
+    
+    def _root_of(self, path):
+        """Index of the deepest scan root containing path, or None."""
+        best, best_len = None, -1
+        for idx, root in enumerate(self.roots):
+            prefix = root['path'].rstrip(os.sep) + os.sep
+            if path.startswith(prefix) and len(prefix) > best_len:
+                best, best_len = idx, len(prefix)
+        return best
+    
+    def apply_changes(self, cache_file, added=(), removed=()):
+        """
+        Incrementally update a cache without rescanning.
+        
+        Args:
+            cache_file: Path to cache JSON file
+            added: Audio file paths to add
+            removed: Paths to remove (a directory removes everything under it)
+            
+        Returns:
+            Sorted list of audio file paths now in the cache
+        """
+        with _cache_lock:
+            cached, ids = self._read_cache(cache_file)
+            
+            if removed:
+                removed = set(removed)
+                prefixes = tuple(p.rstrip(os.sep) + os.sep for p in removed)
+                cached = [f for f in cached if f not in removed and not f.startswith(prefixes)]
+            
+            files = set(cached)
+            new_files = []
+            for f in added:
+                if not self._is_audio_file(f):
+                    continue
+                ids[f] = self._stat_id(f)  # A replaced file may have a new inode
+                if f not in files:
+                    files.add(f)
+                    new_files.append(f)
+            
+            # Keep root tags: existing ones from the cache, new files by prefix
+            root_paths, file_roots = self._read_cache_roots(cache_file)
+            self.set_roots(root_paths or self.roots)
+            self.file_roots = {f: file_roots[f] if f in file_roots else self._root_of(f) for f in files}
+            
+            # The cache is presorted - merge the new files in
+            result = merge_sorted([cached, sorted(new_files, key=lambda f: (sort_key(f), f))])
+            manifest = read_manifest(cache_file)  # Before the write changes the cache's stamp
+            self._write_cache(cache_file, result, ids)
+            if manifest is not None:
+                self._update_manifest(cache_file, manifest, result, new_files)
+            
+            # Only the changed rows are written to the database
+            try:
+                from core.library_db import get_library_db, source_name
+                get_library_db().apply_changes(source_name(cache_file), [f for f in added if f in files], removed or (),
+                                               ids, self.file_roots, [root['path'] for root in self.roots])
+            except sqlite3.Error:
+                pass
+        return result
     
     def _is_audio_file(self, filepath):
         """Check if file has audio extension."""
         return filepath.lower().endswith(AUDIO_EXTENSIONS)
     
+    def _stat_id(self, path):
+        """Get a file's (st_dev, st_ino) id, or None if it can't be stat'ed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino)
+    
     def _load_cache(self, cache_file):
         """Load file list from cache JSON."""
+        return self._read_cache(cache_file)[0]
+    
+    def _read_cache(self, cache_file):
+        """Load file list and file ids from a cache.
+        
+        Returns:
+            Tuple of (files list, dict of path -> (st_dev, st_ino))
+        """
+        files, ids, _, _ = self._read_cache_data(cache_file)
+        return files, ids
+    
+    def _read_cache_roots(self, cache_file):
+        """Load root paths and per-file root tags from a cache.
+        
+        Returns:
+            Tuple of (list of root paths, dict of path -> root index)
+        """
+        _, _, roots, file_roots = self._read_cache_data(cache_file)
+        return roots, file_roots
+    
+    def _read_cache_data(self, cache_file):
+        """Load a cache from its snapshot file, or from JSON if there is no snapshot.
+        
+        Returns:
+            Tuple of (files list, ids dict, root paths, dict of path -> root index)
+        """
+        snap_file = snapshot_path(cache_file)
+        if os.path.exists(snap_file):
+            try:
+                snapshot = read_snapshot(snap_file)
+                return list(snapshot.files), snapshot.id_map(), snapshot.roots, snapshot.root_map()
+            except SnapshotError:
+                pass  # Fall back to the JSON cache if there is one
+        
         if not os.path.exists(cache_file):
-            return []
+            return [], {}, [], {}
         
         try:
             with open(cache_file, 'r') as f:
                 data = json.load(f)
-                return data.get('files', [])
         except (json.JSONDecodeError, IOError):
-            return []
+            return [], {}, [], {}
+        
+        files = data.get('files', [])
+        ids = {}
+        # ids is a list parallel to files (older caches don't have it)
+        for path, file_id in zip(files, data.get('ids', [])):
+            if file_id:
+                ids[path] = tuple(file_id)
+        file_roots = {path: idx for path, idx in zip(files, data.get('file_roots', [])) if idx is not None}
+        return files, ids, data.get('roots', []), file_roots
+    
+    def _save_cache(self, cache_file, files, ids=None):
+        """Save file list to cache JSON and sync it into the library database."""
+        with _cache_lock:
+            self._write_cache(cache_file, files, ids)
+            try:
+                from core.library_db import get_library_db, source_name
+                get_library_db().sync_source(source_name(cache_file), [root['path'] for root in self.roots],
+                                             files, ids or {}, self.file_roots, self.sort_keys)
+            except sqlite3.Error:
+                pass  # The JSON snapshot was still written
     
-    def _save_cache(self, cache_file, files):
-        """Save file list to cache JSON."""
+    def _write_manifest(self, cache_file, files, scan_seconds, resumed=False):
+        """
+        Write a cache's manifest after a full scan, adding the scan to its history.
+        
+        Args:
+            cache_file: Cache the manifest describes (already written)
+            files: Files now in the cache
+            scan_seconds: Wall time of the scan
+            resumed: True if the scan continued from a checkpoint (its time
+                only covers the resumed part)
+        """
+        total_bytes = sum(self.file_sizes.get(f, 0) for f in files)
+        files_per_sec = round(len(files) / scan_seconds, 1) if scan_seconds > 0 else None
+        scan = {
+            'time': round(time.time()),
+            'count': len(files),
+            'bytes': total_bytes,
+            'seconds': round(scan_seconds, 3),
+            'files_per_sec': files_per_sec,
+            'dirs': self.stats['dirs_scanned'],
+        }
+        if resumed:
+            scan['resumed'] = True
+        
+        # The cache was just rewritten, so the old manifest's stamp can't match - its history still holds
+        old = self._read_manifest_file(cache_file) or {}
+        manifest = {
+            'count': len(files),
+            'bytes': total_bytes,
+            'roots': [root['path'] for root in self.roots],
+            'last_scan': scan['time'],
+            'scan_seconds': scan['seconds'],
+            'files_per_sec': files_per_sec,
+            'history': [scan] + old.get('history', [])[:MANIFEST_HISTORY - 1],
+        }
+        self._save_manifest(cache_file, manifest)
+    
+    def _update_manifest(self, cache_file, manifest, files, new_files):
+        """Bring a manifest up to date after apply_changes (no new history entry).
+        
+        Sizes of removed files are gone with the files, so bytes is the last
+        scan's total plus what was added since. The next full scan corrects it.
+        """
+        for f in new_files:
+            try:
+                manifest['bytes'] = manifest.get('bytes', 0) + os.stat(f).st_size
+            except OSError:
+                pass
+        manifest['count'] = len(files)
+        manifest['updated'] = round(time.time())
+        self._save_manifest(cache_file, manifest)
+    
+    def _read_manifest_file(self, cache_file):
+        """Load a manifest whatever cache file it was stamped for."""
+        try:
+            with open(manifest_path(cache_file), 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return None
+    
+    def _save_manifest(self, cache_file, manifest):
+        """Stamp a manifest with the cache file it describes and write it atomically."""
+        path = find_cache_file(cache_file)
+        if path is None:
+            return  # The cache couldn't be written
+        stamp = os.stat(path)
+        manifest['format'] = "JSON" if path == cache_file else "compact + zlib" if self.compress_cache else "compact"
+        manifest['cache_stamp'] = [os.path.basename(path), stamp.st_size, stamp.st_mtime_ns]
+        tmp_file = manifest_path(cache_file) + ".tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(manifest, f, separators=(',', ':'))
+            os.replace(tmp_file, manifest_path(cache_file))
+        except IOError:
+            pass  # Stats fall back to reading the cache
+    
+    def _write_cache(self, cache_file, files, ids=None):
+        """Write the cache in the configured format. Caller must hold _cache_lock."""
+        if self.cache_format == 'compact':
+            try:
+                write_snapshot(snapshot_path(cache_file), files, ids,
+                               [root['path'] for root in self.roots], self.file_roots, self.compress_cache)
+            except IOError:
+                return  # Fail silently if can't write
+            # Only one format on disk, so readers never see a stale copy
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+            return
+        
+        data = {'files': files, 'count': len(files)}
+        if ids is not None:
+            data['ids'] = [ids.get(f) for f in files]
+        if self.roots:
+            # Tag each file with the root it belongs to
+            data['roots'] = [root['path'] for root in self.roots]
+            data['file_roots'] = [self.file_roots.get(f) for f in files]
         try:
             with open(cache_file, 'w') as f:
-                json.dump({'files': files, 'count': len(files)}, f, indent=2)
+                json.dump(data, f, indent=2)
         except IOError:
-            pass  # Fail silently if can't write
+            return  # Fail silently if can't write
+        if os.path.exists(snapshot_path(cache_file)):
+            os.remove(snapshot_path(cache_file))
@@ -0,0 +1,383 @@
+"""Incremental fuzzy search - a trigram index over normalized text.
+
+Every entry (a library song: basename plus tags) is normalized once:
+accents stripped, casefolded, punctuation turned into spaces. The index
+keeps each distinct word with the entries that contain it, and maps
+trigrams and 1-2 letter word starts to those words. Most libraries repeat
+the same words a lot, so indexing words rather than entries keeps the
+build fast.
+
+A query word of 3+ letters matches an entry word holding all its trigrams
+in the same letter order, so "emix" finds "remixed"; a shorter one matches
+the start of an entry word. Candidates come from the longest query word only;
+the other words are checked against the candidate texts. While typing, the
+previous results are intersected with the entries of the grown word, so the
+words already matched are not checked again.
+
+Results are ranked: whole-query prefix, then every word at a word start,
+then substrings, then looser in-order matches; ties keep entry order.
+"""
+
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from core.scanner import natural_key, sort_key
+
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Casefold, strip accents and collapse punctuation into single spaces."""
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def _trigrams(word):
+    """Set of 3-letter substrings of a word."""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _is_subsequence(word, text):
+    """Check that the letters of word appear in text in order."""
+    it = iter(text)
+    return all(c in it for c in word)
+
+
+def _word_matches(word, grams, candidate):
+    """Check a 3+ letter query word against one indexed word."""
+    return all(gram in candidate for gram in grams) and _is_subsequence(word, candidate)
+
+
+class SearchIndex:
+    """Word, trigram and word-start index over a fixed list of entries."""
+
+    def __init__(self, items, text=None):
+        """
+        Build the index.
+
+        Args:
+            items: Entries to search; entry ids are positions in this list
+            text: Function giving an entry's searchable text (the entry itself if None)
+        """
+        self.items = items
+        # Leading space so ' ' + word finds a word start with one substring test
+        self.texts = [' ' + normalize(text(item) if text else item) for item in items]
+
+        postings = {}  # word -> array of entry ids (ascending)
+        for entry_id, text in enumerate(self.texts):
+            for word in text.split():
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = array('I', (entry_id,))
+                elif ids[-1] != entry_id:
+                    ids.append(entry_id)
+        self.words = list(postings)
+        self.postings = list(postings.values())
+
+        self.trigrams = {}  # trigram -> ids of words containing it
+        self.word_starts = {}  # first 1-2 letters -> ids of words starting with them
+        for word_id, word in enumerate(self.words):
+            for gram in _trigrams(word):
+                self.trigrams.setdefault(gram, []).append(word_id)
+            self.word_starts.setdefault(word[:1], []).append(word_id)
+            if len(word) > 1:
+                self.word_starts.setdefault(word[:2], []).append(word_id)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, query, within=None, within_query=""):
+        """
+        Find entries matching a normalized query.
+
+        Args:
+            query: Query already passed through normalize()
+            within: Entry ids to search in (results of a shorter form of
+                this query) instead of the whole index
+            within_query: The query within holds the results of; its
+                words are not checked again
+
+        Returns:
+            List of matching entry ids, best first
+        """
+        words = query.split()
+        if not words:
+            return list(range(len(self.texts)))
+        if within is not None:
+            done = within_query.split()
+            shared = [word for k, word in enumerate(words) if k < len(done) and word == done[k]]
+            new = [word for k, word in enumerate(words) if k >= len(done) or word != done[k]]
+            candidates = self._narrow(within, new, shared)
+        else:
+            # The longest word is usually the most selective
+            first = max(words, key=len)
+            checks = [(word, _trigrams(word)) for word in words]
+            checks.remove((first, _trigrams(first)))
+            candidates = self._entries(first)
+            if checks:
+                texts = self.texts
+                candidates = [i for i in candidates if self._matches(checks, texts[i])]
+
+        return self._rank(query, words, candidates)
+
+    def _entries(self, word):
+        """Ids of entries with a word matching a query word, ascending."""
+        if len(word) < 3:
+            word_ids = self.word_starts.get(word, ())
+        else:
+            grams = _trigrams(word)
+            lists = [self.trigrams.get(gram) for gram in grams]
+            if not all(lists):
+                return []
+            words = self.words
+            word_ids = [w for w in min(lists, key=len) if _word_matches(word, grams, words[w])]
+
+        if len(word_ids) == 1:
+            return list(self.postings[word_ids[0]])
+        entries = set()
+        for word_id in word_ids:
+            entries.update(self.postings[word_id])
+        return sorted(entries)
+
+    def _narrow(self, within, words, shared):
+        """
+        Ids in within that also match words, ascending.
+
+        The longest new word's entries are intersected with within, so the
+        words within already matched are never checked again. Never more
+        work than a fresh search, which starts from the longest word's
+        entries and checks every other word against their texts.
+
+        Args:
+            within: Results of the shorter query
+            words: Query words added or grown since it
+            shared: Query words unchanged since it (within matches them)
+        """
+        if not words:
+            return sorted(within)
+        checks = [(word, _trigrams(word)) for word in words]
+        first = max(words, key=len)
+        if len(first) < 3 and any(len(word) > len(first) for word in shared):
+            # A fresh search would start from that longer word's entries, and
+            # within is a subset of them: a word-start test per result is cheaper
+            # than the posting union of a 1-2 letter word
+            candidates = sorted(within)
+        else:
+            checks.remove((first, _trigrams(first)))
+            candidates = self._entries(first)
+            if shared:
+                allowed = set(within)
+                candidates = [i for i in candidates if i in allowed]
+            # else a grown word matches a subset of what its shorter form did
+        if checks:
+            texts = self.texts
+            candidates = [i for i in candidates if self._matches(checks, texts[i])]
+        return candidates
+
+    def _matches(self, checks, text):
+        """Check every (query word, trigrams) pair against an entry text."""
+        for word, grams in checks:
+            if not grams:
+                if ' ' + word not in text:
+                    return False
+            elif not (all(gram in text for gram in grams) and
+                      any(_word_matches(word, grams, candidate) for candidate in text.split())):
+                return False
+        return True
+
+    def _rank(self, query, words, candidates):
+        """Order candidates by tier: 0 = starts with the query, 1 = every word
+        at a word start, 2 = every word a substring, 3 = looser in-order match."""
+        texts = self.texts
+        prefix = ' ' + query
+        if all(len(word) < 3 for word in words):
+            # Short words only match word starts, so only tier 0 needs sorting out
+            first = [i for i in candidates if texts[i].startswith(prefix)]
+            if not first:
+                return candidates
+            return first + [i for i in candidates if not texts[i].startswith(prefix)]
+
+        starts = [' ' + word for word in words]
+        tiers = ([], [], [], [])
+        for entry_id in candidates:
+            text = texts[entry_id]
+            if text.startswith(prefix):
+                tiers[0].append(entry_id)
+            elif all(start in text for start in starts):
+                tiers[1].append(entry_id)
+            elif all(word in text for word in words):
+                tiers[2].append(entry_id)
+            else:
+                tiers[3].append(entry_id)
+        return tiers[0] + tiers[1] + tiers[2] + tiers[3]
+
+    def tier(self, query, entry_id):
+        """Rank tier (0-3, see _rank) of an entry that matches a normalized query."""
+        text = self.texts[entry_id]
+        words = query.split()
+        if text.startswith(' ' + query):
+            return 0
+        if all((' ' + word) in text for word in words):
+            return 1
+        if all(word in text for word in words):
+            return 2
+        return 3
+
+
+class SearchSession:
+    """Type-to-filter state: reuses earlier results as the query grows."""
+
+    def __init__(self, index):
+        self.index = index
+        self.query = ""
+        self.results = list(range(len(index)))
+        self._cache = {}  # normalized query -> results, for prefixes of the current query
+
+    def update(self, query):
+        """
+        Set the query and return the matching entry ids.
+
+        Extending the query narrows the previous results by the added or
+        grown words only (never more work than a fresh search), and
+        deleting characters returns cached results for the shorter query.
+
+        Returns:
+            List of entry ids, best first
+        """
+        self.query = query
+        normalized = normalize(query)
+        if not normalized:
+            self._cache = {}
+            self.results = list(range(len(self.index)))
+            return self.results
+
+        results = self._cache.get(normalized)
+        if results is None:
+            narrowest = self._narrowest(normalized)
+            if narrowest is None:
+                results = self.index.search(normalized)
+            else:
+                results = self.index.search(normalized, self._cache[narrowest], narrowest)
+            self._cache[normalized] = results
+        # Only prefixes of the current query can be reused
+        self._cache = {q: r for q, r in self._cache.items() if normalized.startswith(q)}
+        self.results = results
+        return results
+
+    def _narrowest(self, normalized):
+        """Longest cached query this one narrows, or None."""
+        new_words = normalized.split()
+        best = None
+        for cached in self._cache:
+            if not normalized.startswith(cached):
+                continue
+            # A 1-2 letter word matches word starts only, so growing it to
+            # 3 letters (any position in a word) can match more entries
+            cached_words = cached.split()
+            last = len(cached_words) - 1
+            if len(cached_words[last]) < 3 <= len(new_words[last]):
+                continue
+            if best is None or len(cached) > len(best):
+                best = cached
+        return best
+
+
+class UnifiedSearch:
+    """One query over several sources (library, saved streams, seen YouTube results).
+
+    Each source keeps its own SearchSession, so typing stays incremental
+    per source. Results are merged by match tier first and source second,
+    so an exact YouTube title beats a loose local match while local files
+    (which play instantly) win ties.
+    """
+
+    def __init__(self, sources, limit=200):
+        """
+        Args:
+            sources: List of (source name, SearchIndex), highest priority first
+            limit: Best matches taken from each source for merging
+        """
+        self.sessions = [(name, SearchSession(index)) for name, index in sources]
+        self.limit = limit
+        self.query = ""
+        self.counts = {name: 0 for name, _ in sources}  # Total matches per source
+
+    def update(self, query):
+        """
+        Set the query.
+
+        Returns:
+            List of (source name, item), best first
+        """
+        self.query = query
+        normalized = normalize(query)
+        merged = []
+        for rank, (name, session) in enumerate(self.sessions):
+            ids = session.update(query)
+            if not normalized:
+                self.counts[name] = 0  # Nothing typed yet - no results
+                continue
+            self.counts[name] = len(ids)
+            index = session.index
+            for position, entry_id in enumerate(ids[:self.limit]):
+                merged.append((index.tier(normalized, entry_id), rank, position, name, index.items[entry_id]))
+        merged.sort(key=lambda match: match[:3])
+        return [(name, item) for _, _, _, name, item in merged]
+
+
+class PrefixIndex:
+    """Jump-to-prefix index over songs in library name order.
+
+    The first song of every 1 and 2 letter filename prefix is recorded in
+    one pass, so short prefixes are a dict lookup. Longer ones start from
+    their 2 letter bucket and binary-search the natural sort keys.
+    """
+
+    def __init__(self, songs):
+        """
+        Build the index.
+
+        Args:
+            songs: Audio file paths in (sort_key, path) order
+        """
+        self.songs = songs
+        self.first = {}  # casefolded 1-2 letter filename prefix -> index of its first song
+        first = self.first
+        for i, path in enumerate(songs):
+            start = path.rpartition(os.sep)[2][:2].casefold()
+            if start not in first:
+                first[start] = i
+            if start[:1] not in first:
+                first[start[:1]] = i
+
+    def find(self, prefix):
+        """
+        Find the first song whose filename starts with a prefix.
+
+        Returns:
+            Index into songs, or None if no filename starts with it
+        """
+        prefix = prefix.casefold()
+        if len(prefix) <= 2:
+            return self.first.get(prefix)
+
+        lo = self.first.get(prefix[:2])
+        if lo is None:
+            return None
+        # A trailing partial number ("sky 2") keys as the smallest number it
+        # can grow into, so the bisect lands on or before the first match.
+        # Longer numbers sort later ("sky 10" comes between "sky 2" and
+        # "sky 20"), so step over names that only share the text before it.
+        i = bisect_left(self.songs, natural_key(prefix), lo, key=sort_key)
+        stem = prefix.rstrip('0123456789')
+        for i in range(i, len(self.songs)):
+            name = os.path.basename(self.songs[i]).casefold()
+            if name.startswith(prefix):
+                return i
+            if not name.startswith(stem) or stem == prefix:
+                break
+        return None
@@ -0,0 +1,131 @@
+"""Lazy shuffle - a seeded random order over [0, n) without building a list.
+
+Shuffling a 50k-song library used to mean copying it, shuffling the copy
+and queueing every song. Instead, position i of the shuffle maps to library
+index Permutation[i]: a 4-round Feistel network over the smallest even
+number of bits that covers n, which is a bijection on that power-of-two
+range, and values >= n are encrypted again ("cycle walking") until they
+land inside [0, n). The range is under 4n, so that takes a few rounds on
+average.
+
+The whole state is (n, seed, position, cycle), so it is O(1) in memory and
+persists as a tiny dict. Going back to earlier songs is left to the playback
+history (core.history), which also covers queued and picked tracks.
+"""
+
+import random
+
+
+ROUNDS = 4
+
+
+class Permutation:
+    """Pseudo-random bijection on [0, n), computed per index."""
+
+    def __init__(self, n, seed):
+        """
+        Args:
+            n: Size of the range
+            seed: Integer seed - the same seed always gives the same order
+        """
+        self.n = n
+        bits = max(2, (n - 1).bit_length())
+        bits += bits % 2
+        self._half_bits = bits // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        rng = random.Random(seed)
+        self._keys = [rng.getrandbits(32) for _ in range(ROUNDS)]
+
+    def __len__(self):
+        return self.n
+
+    def _round(self, value, key):
+        """Feistel round function: a multiply-xorshift hash of one half."""
+        h = (value * 0x9E3779B1 + key) & 0xFFFFFFFF
+        h ^= h >> 15
+        h = (h * 0x2C1B3C6D) & 0xFFFFFFFF
+        h ^= h >> 12
+        return h & self._half_mask
+
+    def _encrypt(self, value):
+        """Permute one value of the power-of-two range."""
+        left, right = value >> self._half_bits, value & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self._half_bits) | right
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.n:
+            raise IndexError("permutation index out of range")
+        value = self._encrypt(i)
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+
+class Shuffle:
+    """Position in a lazily shuffled order of n items, reshuffled each repeat cycle."""
+
+    def __init__(self, n, seed=None, position=0, cycle=0):
+        """
+        Args:
+            n: Number of items (library songs)
+            seed: Seed of the order (random if None)
+            position: Items already drawn in this cycle
+            cycle: Completed passes over all items (each pass has its own order)
+        """
+        self.n = n
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.position = min(position, n)
+        self.cycle = cycle
+        self._permutation = None
+
+    def _order(self):
+        """Permutation of the current cycle."""
+        if self._permutation is None:
+            self._permutation = Permutation(self.n, self.seed + self.cycle)
+        return self._permutation
+
+    def resize(self, n):
+        """Follow a library that grew or shrank (the rest of the cycle is reshuffled)."""
+        if n != self.n:
+            self.n = n
+            self.position = min(self.position, n)
+            self._permutation = None
+
+    def peek(self, repeat=False):
+        """Index next() would return, without moving."""
+        if self.position < self.n:
+            return self._order()[self.position]
+        if repeat and self.n:
+            return Permutation(self.n, self.seed + self.cycle + 1)[0]
+        return None
+
+    def next(self, repeat=False):
+        """
+        Draw the next index.
+
+        Args:
+            repeat: Start a new cycle (in a new order) after the last item
+
+        Returns:
+            Index into the shuffled items, or None when the shuffle is over
+        """
+        if self.position >= self.n:
+            if not repeat or not self.n:
+                return None
+            self.cycle += 1
+            self.position = 0
+            self._permutation = None
+        index = self._order()[self.position]
+        self.position += 1
+        return index
+
+    def to_dict(self):
+        """State for the queue file."""
+        return {'n': self.n, 'seed': self.seed, 'position': self.position, 'cycle': self.cycle}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Shuffle from its saved state."""
+        return cls(data['n'], data['seed'], data.get('position', 0), data.get('cycle', 0))
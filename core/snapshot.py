@@ -0,0 +1,265 @@
+"""Compact library snapshot format - a smaller, faster alternative to the JSON caches.
+
+Most library paths share a handful of directories, so instead of repeating
+every full path a snapshot stores a directory table once and, per file, its
+basename plus an index into that table. Layout:
+
+    header (uncompressed, fixed size):
+        magic b"TXSNAP", version u8, flags u8, count u32, ndirs u32, body length u32
+    body (zlib-compressed when FLAG_ZLIB is set):
+        roots, dirs, names - u32 byte length + NUL-separated UTF-8 strings
+        dir index per file - u32 array
+        root index per file - i32 array (-1 = none)
+        (st_dev, st_ino) per file - u64 pairs (NO_ID = none)
+
+Integers are little-endian. The file count is in the header, so it can be
+read without loading the body. Loading splits each string table with one
+C-level call, and full paths are only joined when a file is looked up.
+"""
+
+import os
+import sys
+import zlib
+import struct
+from array import array
+
+
+MAGIC = b"TXSNAP"
+VERSION = 1
+FLAG_ZLIB = 0x01
+HEADER = struct.Struct('<6sBBIII')  # magic, version, flags, count, ndirs, body length
+NO_ID = 2 ** 64 - 1
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or not a snapshot."""
+
+
+def snapshot_path(cache_file):
+    """Get the snapshot file used in place of a JSON cache file."""
+    return os.path.splitext(cache_file)[0] + ".snap"
+
+
+def _encode_strings(strings):
+    """Encode strings as a length-prefixed, NUL-separated UTF-8 block."""
+    data = '\0'.join(strings).encode('utf-8', 'surrogateescape')
+    return struct.pack('<I', len(data)) + data
+
+
+def _decode_strings(body, offset, count=None):
+    """Decode a block written by _encode_strings.
+
+    Args:
+        count: Number of strings, or None if unknown (an empty block is then no strings)
+
+    Returns:
+        Tuple of (list of strings, offset after the block)
+    """
+    (length,) = struct.unpack_from('<I', body, offset)
+    offset += 4
+    if count == 0 or (count is None and length == 0):
+        return [], offset + length
+    strings = body[offset:offset + length].decode('utf-8', 'surrogateescape').split('\0')
+    return strings, offset + length
+
+
+def _pack_array(typecode, values):
+    """Pack integers as a little-endian array."""
+    arr = array(typecode, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpack_array(typecode, body, offset, count):
+    """Unpack a little-endian array.
+
+    Returns:
+        Tuple of (array, offset after it)
+    """
+    arr = array(typecode)
+    end = offset + count * arr.itemsize
+    arr.frombytes(body[offset:end])
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr, end
+
+
+def encode_snapshot(files, ids=None, roots=(), file_roots=None, compress=True):
+    """
+    Encode a file list as snapshot bytes.
+
+    Args:
+        files: Audio file paths, in cache order
+        ids: Dict of path -> (st_dev, st_ino)
+        roots: Root paths of the scan
+        file_roots: Dict of path -> root index
+        compress: zlib-compress the body
+
+    Returns:
+        Snapshot bytes
+    """
+    ids = ids or {}
+    file_roots = file_roots or {}
+
+    dir_index = {}
+    names = []
+    dir_idx = []
+    id_values = []
+    for path in files:
+        directory, name = os.path.split(path)
+        dir_idx.append(dir_index.setdefault(directory, len(dir_index)))
+        names.append(name)
+        file_id = ids.get(path)
+        id_values.extend(file_id if file_id else (NO_ID, NO_ID))
+
+    body = b''.join([
+        _encode_strings(roots),
+        _encode_strings(dir_index),  # dicts keep insertion order = index order
+        _encode_strings(names),
+        _pack_array('I', dir_idx),
+        _pack_array('i', [-1 if file_roots.get(p) is None else file_roots[p] for p in files]),
+        _pack_array('Q', id_values),
+    ])
+    length = len(body)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, VERSION, flags, len(files), len(dir_index), length) + body
+
+
+def write_snapshot(path, files, ids=None, roots=(), file_roots=None, compress=True):
+    """Write a snapshot file atomically (see encode_snapshot for arguments)."""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(encode_snapshot(files, ids, roots, file_roots, compress))
+    os.replace(tmp_file, path)
+
+
+def read_header(path):
+    """
+    Read just the snapshot header.
+
+    Returns:
+        Dict with count, dirs, compressed and body_size
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+    except OSError as e:
+        raise SnapshotError(str(e))
+    return _parse_header(data)
+
+
+def _parse_header(data):
+    """Parse and validate header bytes."""
+    if len(data) < HEADER.size:
+        raise SnapshotError("truncated snapshot")
+    magic, version, flags, count, ndirs, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError("not a txplay snapshot")
+    return {'count': count, 'dirs': ndirs, 'compressed': bool(flags & FLAG_ZLIB), 'body_size': length}
+
+
+def decode_snapshot(data):
+    """
+    Decode snapshot bytes.
+
+    Returns:
+        Snapshot
+    """
+    header = _parse_header(data)
+    body = data[HEADER.size:]
+    if header['compressed']:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise SnapshotError(str(e))
+    if len(body) != header['body_size']:
+        raise SnapshotError("truncated snapshot")
+
+    count = header['count']
+    try:
+        roots, offset = _decode_strings(body, 0)
+        dirs, offset = _decode_strings(body, offset, header['dirs'])
+        names, offset = _decode_strings(body, offset, count)
+        dir_idx, offset = _unpack_array('I', body, offset, count)
+        root_idx, offset = _unpack_array('i', body, offset, count)
+        id_values, offset = _unpack_array('Q', body, offset, count * 2)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SnapshotError(str(e))
+    if len(names) != count or len(id_values) != count * 2:
+        raise SnapshotError("corrupt snapshot")
+    return Snapshot(roots, dirs, names, dir_idx, root_idx, id_values)
+
+
+def read_snapshot(path):
+    """Load a snapshot file (raises SnapshotError if unreadable)."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise SnapshotError(str(e))
+    return decode_snapshot(data)
+
+
+class Snapshot:
+    """A loaded snapshot. Full paths are built only when asked for."""
+
+    def __init__(self, roots, dirs, names, dir_idx, root_idx, id_values):
+        self.roots = roots
+        self.dirs = dirs
+        self.names = names
+        self.dir_idx = dir_idx
+        self.root_idx = root_idx
+        self.id_values = id_values
+        self.files = SnapshotPaths(self)
+        self._prefixes = None  # dirs with a trailing separator, built on first lookup
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def prefixes(self):
+        """Directory table as join-ready prefixes (plain concatenation beats os.path.join)."""
+        if self._prefixes is None:
+            self._prefixes = [d if not d or d.endswith(os.sep) else d + os.sep for d in self.dirs]
+        return self._prefixes
+
+    def path(self, i):
+        """Full path of file i."""
+        return self.prefixes[self.dir_idx[i]] + self.names[i]
+
+    def id_map(self):
+        """Dict of path -> (st_dev, st_ino) for files that have one."""
+        values = self.id_values
+        return {path: (values[2 * i], values[2 * i + 1])
+                for i, path in enumerate(self.files) if values[2 * i] != NO_ID}
+
+    def root_map(self):
+        """Dict of path -> root index for files tagged with a root."""
+        return {path: idx for path, idx in zip(self.files, self.root_idx) if idx >= 0}
+
+
+class SnapshotPaths:
+    """Sequence view of a snapshot's full paths, joined on access."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.snapshot.path(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("snapshot index out of range")
+        return self.snapshot.path(key)
+
+    def __iter__(self):
+        prefixes = self.snapshot.prefixes
+        return (prefixes[d] + name for d, name in zip(self.snapshot.dir_idx, self.snapshot.names))
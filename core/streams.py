@@ -2,6 +2,7 @@ import json
 import os
 from datetime import datetime
 from constants import STREAMS_FILE
+from core.track import Track, STREAM
 
 
 class StreamManager:
@@ -52,6 +53,10 @@ class StreamManager:
         """Get all streams"""
         return self.streams
 
+    def get_tracks(self):
+        """Get all streams as Track records (same order as get_all_streams)."""
+        return [Track(STREAM, s['url'], s['title']) for s in self.streams]
+
     def get_stream(self, stream_id):
         """Get a specific stream by ID"""
         for stream in self.streams:
@@ -0,0 +1,451 @@
+"""Pure-Python audio tag readers.
+
+Reads title, artist, album, track number and duration from ID3v2 (MP3),
+FLAC/Vorbis comments, Ogg Vorbis/Opus and MP4 (M4A/ALAC) files. Only the
+header bytes that hold tags are read - pictures and audio data are skipped
+with seeks.
+"""
+
+import os
+import struct
+
+
+# Largest tag/comment block we will read into memory (cover art is skipped)
+MAX_BLOCK_SIZE = 512 * 1024
+
+# ID3v2 frame IDs we care about (v2.3/v2.4 and v2.2)
+ID3_FRAMES = {
+    'TIT2': 'title', 'TT2': 'title',
+    'TPE1': 'artist', 'TP1': 'artist',
+    'TALB': 'album', 'TAL': 'album',
+    'TRCK': 'track', 'TRK': 'track',
+    'TLEN': 'length', 'TLE': 'length',
+}
+
+# Vorbis comment field names we care about
+VORBIS_FIELDS = {
+    'TITLE': 'title',
+    'ARTIST': 'artist',
+    'ALBUM': 'album',
+    'TRACKNUMBER': 'track',
+}
+
+# MP4 ilst atoms we care about
+MP4_ATOMS = {
+    b'\xa9nam': 'title',
+    b'\xa9ART': 'artist',
+    b'\xa9alb': 'album',
+    b'trkn': 'track',
+}
+
+# MPEG audio tables for duration estimates
+MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MPEG_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+
+def read_tags(path):
+    """Read tags from an audio file.
+
+    Args:
+        path: Audio file path
+
+    Returns:
+        Dict with any of: title, artist, album, track (int), duration (seconds).
+        Empty dict if the format is unknown or the file can't be parsed.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            f.seek(0)
+
+            if head.startswith(b'ID3'):
+                # FLAC files occasionally carry an ID3 header too
+                tags = _read_id3(f)
+                audio_start = f.tell()
+                if f.read(4) == b'fLaC':
+                    tags.update(_read_flac(f))
+                    return _clean(tags)
+                f.seek(audio_start)
+                return _clean(_read_mpeg_duration(f, tags))
+            if head.startswith(b'fLaC'):
+                f.seek(4)
+                return _clean(_read_flac(f))
+            if head.startswith(b'OggS'):
+                return _clean(_read_ogg(f))
+            if head[4:8] == b'ftyp':
+                return _clean(_read_mp4(f))
+            if head.startswith(b'RIFF') and head[8:12] == b'WAVE':
+                return _clean(_read_wav(f))
+            if path.lower().endswith('.mp3'):
+                return _clean(_read_mpeg_duration(f, {}))
+    except (OSError, struct.error, ValueError, IndexError):
+        pass
+    return {}
+
+
+def _clean(tags):
+    """Normalize parsed tags into the public result format."""
+    result = {}
+    for key in ('title', 'artist', 'album'):
+        value = tags.get(key)
+        if value:
+            result[key] = value.strip()
+
+    track = tags.get('track')
+    if isinstance(track, str):
+        # "3/12" -> 3
+        track = track.split('/')[0].strip()
+        track = int(track) if track.isdigit() else None
+    if track:
+        result['track'] = track
+
+    duration = tags.get('duration')
+    if not duration and tags.get('length'):
+        length = str(tags['length']).strip()
+        if length.isdigit():
+            duration = int(length) / 1000.0  # TLEN is milliseconds
+    if duration:
+        result['duration'] = round(float(duration), 2)
+
+    return result
+
+
+# ---- ID3v2 / MPEG ----
+
+def _synchsafe(data):
+    """Decode a 28-bit synchsafe integer."""
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_id3_text(data):
+    """Decode an ID3 text frame body (first value only)."""
+    if not data:
+        return ''
+    encoding, body = data[0], data[1:]
+    if encoding == 1:
+        text = body.decode('utf-16', 'replace')
+    elif encoding == 2:
+        text = body.decode('utf-16-be', 'replace')
+    elif encoding == 3:
+        text = body.decode('utf-8', 'replace')
+    else:
+        text = body.decode('latin-1')
+    return text.split('\x00')[0]
+
+
+def _read_id3(f):
+    """Read ID3v2 text frames. Leaves f positioned after the tag."""
+    header = f.read(10)
+    major, flags = header[3], header[5]
+    tag_size = _synchsafe(header[6:10])
+    tag_end = 10 + tag_size + (10 if flags & 0x10 else 0)  # footer
+    tags = {}
+
+    if major not in (2, 3, 4) or flags & 0x80 and major < 4:
+        # Unknown version, or whole-tag unsynchronisation (rare) - skip the tag
+        f.seek(tag_end)
+        return tags
+
+    # Skip extended header
+    if flags & 0x40 and major >= 3:
+        size_bytes = f.read(4)
+        ext_size = _synchsafe(size_bytes) if major == 4 else struct.unpack('>I', size_bytes)[0]
+        f.seek(ext_size - 4 if major == 4 else ext_size, os.SEEK_CUR)
+
+    id_len, header_len = (3, 6) if major == 2 else (4, 10)
+    while f.tell() + header_len <= tag_end:
+        frame_header = f.read(header_len)
+        frame_id = frame_header[:id_len]
+        if not frame_id.strip(b'\x00') or not frame_id.isalnum():
+            break  # Padding
+
+        if major == 2:
+            size = int.from_bytes(frame_header[3:6], 'big')
+        elif major == 4:
+            size = _synchsafe(frame_header[4:8])
+        else:
+            size = struct.unpack('>I', frame_header[4:8])[0]
+
+        key = ID3_FRAMES.get(frame_id.decode('latin-1'))
+        if key and size <= MAX_BLOCK_SIZE and key not in tags:
+            tags[key] = _decode_id3_text(f.read(size))
+        else:
+            f.seek(size, os.SEEK_CUR)  # Skip pictures and other frames
+
+    f.seek(tag_end)
+    return tags
+
+
+def _read_mpeg_duration(f, tags):
+    """Estimate MP3 duration from the first frame (Xing/VBRI or CBR)."""
+    if 'length' in tags:
+        return tags
+
+    audio_start = f.tell()
+    data = f.read(4096)
+    file_size = os.fstat(f.fileno()).st_size
+
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or (data[i + 1] & 0xE0) != 0xE0:
+            continue
+
+        b1, b2, b3 = data[i + 1], data[i + 2], data[i + 3]
+        version_bits = (b1 >> 3) & 0x03
+        layer_bits = (b1 >> 1) & 0x03
+        bitrate_idx = (b2 >> 4) & 0x0F
+        rate_idx = (b2 >> 2) & 0x03
+        if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+            continue  # Not a valid frame header
+
+        version = {3: 1, 2: 2, 0: 2.5}[version_bits]
+        layer = 4 - layer_bits
+        bitrate = MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_idx] * 1000
+        sample_rate = MPEG_SAMPLE_RATES[version][rate_idx]
+        mono = (b3 >> 6) == 3
+
+        if layer == 1:
+            samples_per_frame = 384
+        elif layer == 3 and version != 1:
+            samples_per_frame = 576
+        else:
+            samples_per_frame = 1152
+
+        # Xing/Info header holds the frame count for VBR files
+        xing_offset = i + 4 + ((17 if mono else 32) if version == 1 else (9 if mono else 17))
+        xing = data[xing_offset:xing_offset + 12]
+        if xing[:4] in (b'Xing', b'Info'):
+            xing_flags = struct.unpack('>I', xing[4:8])[0]
+            if xing_flags & 0x1:
+                frames = struct.unpack('>I', xing[8:12])[0]
+                tags['duration'] = frames * samples_per_frame / sample_rate
+                return tags
+
+        vbri = data[i + 36:i + 36 + 18]
+        if vbri[:4] == b'VBRI':
+            frames = struct.unpack('>I', vbri[14:18])[0]
+            tags['duration'] = frames * samples_per_frame / sample_rate
+            return tags
+
+        # Constant bitrate: size / bitrate
+        tags['duration'] = (file_size - audio_start - i) * 8 / bitrate
+        return tags
+
+    return tags
+
+
+# ---- FLAC / Vorbis comment ----
+
+def _parse_vorbis_comment(data):
+    """Parse a Vorbis comment block. Tolerates truncated data."""
+    tags = {}
+    try:
+        vendor_len = struct.unpack_from('<I', data, 0)[0]
+        pos = 4 + vendor_len
+        count = struct.unpack_from('<I', data, pos)[0]
+        pos += 4
+        for _ in range(count):
+            length = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+            entry = data[pos:pos + length]
+            pos += length
+            if len(entry) < length:
+                break  # Truncated (usually embedded cover art)
+
+            key, _, value = entry.partition(b'=')
+            field = VORBIS_FIELDS.get(key.decode('ascii', 'replace').upper())
+            if field and field not in tags:
+                tags[field] = value.decode('utf-8', 'replace')
+    except struct.error:
+        pass
+    return tags
+
+
+def _read_flac(f):
+    """Read STREAMINFO and VORBIS_COMMENT blocks. f is after 'fLaC'."""
+    tags = {}
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        is_last = header[0] & 0x80
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+
+        if block_type == 0:  # STREAMINFO
+            info = f.read(length)
+            sample_rate = (info[10] << 12) | (info[11] << 4) | (info[12] >> 4)
+            total_samples = ((info[13] & 0x0F) << 32) | struct.unpack('>I', info[14:18])[0]
+            if sample_rate:
+                tags['duration'] = total_samples / sample_rate
+        elif block_type == 4:  # VORBIS_COMMENT
+            tags.update(_parse_vorbis_comment(f.read(min(length, MAX_BLOCK_SIZE))))
+            break  # Everything we need comes before this or is in it
+        else:
+            f.seek(length, os.SEEK_CUR)  # Skip pictures, seek tables, padding
+
+        if is_last:
+            break
+    return tags
+
+
+# ---- Ogg Vorbis / Opus ----
+
+def _read_ogg_packets(f, count):
+    """Read the first `count` packets from an Ogg stream."""
+    packets = []
+    current = b''
+    while len(packets) < count:
+        header = f.read(27)
+        if len(header) < 27 or header[:4] != b'OggS':
+            break
+        segments = f.read(header[26])
+        for lacing in segments:
+            if len(current) < MAX_BLOCK_SIZE:
+                current += f.read(lacing)
+            else:
+                f.seek(lacing, os.SEEK_CUR)
+            if lacing < 255:
+                packets.append(current)
+                current = b''
+                if len(packets) == count:
+                    break
+    if current and len(packets) < count:
+        packets.append(current)  # Truncated packet - parse what we have
+    return packets
+
+
+def _read_last_granule(f):
+    """Get the granule position of the last Ogg page."""
+    size = os.fstat(f.fileno()).st_size
+    f.seek(max(0, size - 65536))
+    tail = f.read()
+    idx = tail.rfind(b'OggS')
+    if idx < 0 or idx + 14 > len(tail):
+        return None
+    return struct.unpack_from('<q', tail, idx + 6)[0]
+
+
+def _read_ogg(f):
+    """Read Vorbis or Opus identification and comment headers."""
+    packets = _read_ogg_packets(f, 2)
+    if len(packets) < 2:
+        return {}
+    ident, comment = packets
+    tags = {}
+
+    if ident.startswith(b'\x01vorbis') and comment.startswith(b'\x03vorbis'):
+        tags = _parse_vorbis_comment(comment[7:])
+        sample_rate = struct.unpack_from('<I', ident, 12)[0]
+        granule = _read_last_granule(f)
+        if granule and sample_rate:
+            tags['duration'] = granule / sample_rate
+    elif ident.startswith(b'OpusHead') and comment.startswith(b'OpusTags'):
+        tags = _parse_vorbis_comment(comment[8:])
+        pre_skip = struct.unpack_from('<H', ident, 10)[0]
+        granule = _read_last_granule(f)
+        if granule:
+            tags['duration'] = max(0, granule - pre_skip) / 48000.0  # Opus always 48kHz
+    return tags
+
+
+# ---- MP4 ----
+
+def _iter_atoms(f, end):
+    """Yield (type, data_start, atom_end) for atoms until `end`."""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, atom_type = struct.unpack('>I4s', f.read(8))
+        header_len = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_len = 16
+        elif size == 0:
+            size = end - start
+        if size < header_len:
+            break
+        yield atom_type, start + header_len, start + size
+        f.seek(start + size)
+
+
+def _read_mp4(f):
+    """Read mvhd duration and ilst tags, seeking past mdat and sample tables."""
+    tags = {}
+    file_size = os.fstat(f.fileno()).st_size
+
+    for atom, data_start, atom_end in _iter_atoms(f, file_size):
+        if atom != b'moov':
+            continue
+        for child, child_start, child_end in _iter_atoms(f, atom_end):
+            if child == b'mvhd':
+                version = f.read(1)[0]
+                f.seek(3, os.SEEK_CUR)
+                if version == 1:
+                    f.seek(16, os.SEEK_CUR)
+                    timescale, duration = struct.unpack('>IQ', f.read(12))
+                else:
+                    f.seek(8, os.SEEK_CUR)
+                    timescale, duration = struct.unpack('>II', f.read(8))
+                if timescale:
+                    tags['duration'] = duration / timescale
+            elif child == b'udta':
+                tags.update(_read_mp4_udta(f, child_end))
+        break
+    return tags
+
+
+def _read_mp4_udta(f, end):
+    """Find moov.udta.meta.ilst and read its items."""
+    tags = {}
+    for atom, _, meta_end in _iter_atoms(f, end):
+        if atom != b'meta':
+            continue
+        f.seek(4, os.SEEK_CUR)  # meta is a full box (version + flags)
+        for child, _, ilst_end in _iter_atoms(f, meta_end):
+            if child != b'ilst':
+                continue
+            for item, _, item_end in _iter_atoms(f, ilst_end):
+                key = MP4_ATOMS.get(item)
+                if not key or item_end - f.tell() > MAX_BLOCK_SIZE:
+                    continue
+                for data_atom, _, data_end in _iter_atoms(f, item_end):
+                    if data_atom != b'data':
+                        continue
+                    value = f.read(data_end - f.tell())[8:]  # Skip type + locale
+                    if key == 'track':
+                        if len(value) >= 4:
+                            tags[key] = struct.unpack('>H', value[2:4])[0]
+                    else:
+                        tags[key] = value.decode('utf-8', 'replace')
+                    break
+    return tags
+
+
+# ---- WAV ----
+
+def _read_wav(f):
+    """Read duration from the fmt and data chunks."""
+    f.seek(12)
+    byte_rate = 0
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(size)
+            byte_rate = struct.unpack_from('<I', fmt, 8)[0]
+            f.seek(size % 2, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if byte_rate:
+                return {'duration': size / byte_rate}
+            break
+        else:
+            f.seek(size + size % 2, os.SEEK_CUR)
+    return {}
@@ -74,7 +74,8 @@ class Paginator:
         Initialize paginator.
         
         Args:
-            items: List of items to paginate
+            items: List of items to paginate (any sequence - only the
+                visible page is sliced out of it)
             page_size: Items per page (default: 20)
         """
         self.items = items
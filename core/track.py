@@ -0,0 +1,96 @@
+"""Track records - one compact type for library songs, queue items and streams.
+
+A Track is a fixed set of slots instead of a dict: a kind ("local",
+"youtube" or "stream", interned so every record shares the same three
+strings), a location (file path or URL), an optional title and optional
+extra metadata. The display title is only derived from the location the
+first time it is asked for.
+
+Queue files keep the old dict layout ("path" for local files, "url"
+otherwise), so to_dict()/from_dict() convert at the storage boundary.
+"""
+
+import os
+import sys
+
+
+LOCAL = sys.intern("local")
+YOUTUBE = sys.intern("youtube")
+STREAM = sys.intern("stream")
+KINDS = (LOCAL, YOUTUBE, STREAM)
+
+
+class Track:
+    """A playable item: a local file or an online stream."""
+
+    __slots__ = ('kind', 'location', '_title', 'metadata')
+
+    def __init__(self, kind, location, title=None, metadata=None):
+        """
+        Args:
+            kind: LOCAL, YOUTUBE or STREAM
+            location: File path (local) or URL
+            title: Display title (derived from the location if None)
+            metadata: Optional dict of extra info (e.g. YouTube result fields)
+        """
+        self.kind = sys.intern(kind)
+        self.location = location
+        self._title = title
+        self.metadata = metadata
+
+    @classmethod
+    def local(cls, path, title=None):
+        """Track for a local audio file."""
+        return cls(LOCAL, path, title)
+
+    @classmethod
+    def for_location(cls, location):
+        """Track for a path or URL whose kind isn't known (a URL is a stream, YouTube if it says so)."""
+        if "://" not in location:
+            return cls(LOCAL, location)
+        if "youtube.com/" in location or "youtu.be/" in location:
+            return cls(YOUTUBE, location)
+        return cls(STREAM, location)
+    
+    @property
+    def title(self):
+        """Display title - the filename of a local file or the URL, unless set."""
+        if self._title is None:
+            self._title = self._derived_title()
+        return self._title
+
+    def _derived_title(self):
+        """Title implied by the location."""
+        return os.path.basename(self.location) if self.kind is LOCAL else self.location
+
+    def to_dict(self):
+        """Queue file layout of this track."""
+        item = {
+            "type": self.kind,
+            "path" if self.kind is LOCAL else "url": self.location,
+            "title": self._title if self._title is not None else self._derived_title(),
+        }
+        if self.metadata:
+            item["metadata"] = self.metadata
+        return item
+
+    @classmethod
+    def from_dict(cls, item):
+        """Track from the queue file layout (None if it has no location)."""
+        location = item.get('path') or item.get('url')
+        if not location:
+            return None
+        kind = item.get('type') or (LOCAL if item.get('path') else STREAM)
+        track = cls(kind, location, item.get('title'), item.get('metadata'))
+        if track._title == track._derived_title():
+            track._title = None  # Derived again when shown instead of stored per item
+        return track
+
+    def __eq__(self, other):
+        return isinstance(other, Track) and self.kind == other.kind and self.location == other.location
+
+    def __hash__(self):
+        return hash((self.kind, self.location))
+
+    def __repr__(self):
+        return f"Track({self.kind!r}, {self.location!r})"
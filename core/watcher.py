@@ -0,0 +1,517 @@
+"""Live library watcher - keeps a scan cache up to date without rescanning.
+
+Uses Linux inotify through ctypes when available. Falls back to periodic
+incremental rescans (only directories whose mtime changed are re-listed)
+when inotify is missing or the watch limit is hit.
+"""
+
+import os
+import ctypes
+import ctypes.util
+import errno
+import select
+import struct
+import threading
+import time
+from core.scanner import Scanner
+
+
+# inotify event masks (from <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class WatchLimitError(Exception):
+    """Raised when inotify cannot watch every directory."""
+
+
+def _load_libc():
+    """Load libc with inotify symbols, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class LibraryWatcher:
+    """Watch scanned roots and apply audio file changes to a cache."""
+
+    def __init__(self, paths, cache_file, exclude_phone_storage=False, prune_rules=None,
+                 on_change=None, debounce=2.0, poll_interval=300):
+        """
+        Initialize watcher.
+
+        Args:
+            paths: List of roots to watch (paths or root dicts, see Scanner.set_roots)
+            cache_file: Scan cache to update
+            exclude_phone_storage: If True, skip /sdcard and /storage paths
+            prune_rules: Scan pruning rules (see core.config.get_prune_rules)
+            on_change: Function called after a batch of changes is applied
+            debounce: Seconds of quiet before a burst of events is applied
+            poll_interval: Seconds between rescans in fallback mode
+        """
+        self.on_change = on_change
+        self.cache_file = cache_file
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.scanner = Scanner(exclude_phone_storage=exclude_phone_storage, prune_rules=prune_rules)
+        self.scanner.set_roots([paths] if isinstance(paths, str) else paths)
+        self.paths = [root['path'] for root in self.scanner.roots]
+        self.mode = None  # "inotify" or "polling" once started
+
+        self._running = False
+        self._thread = None
+        self._wake_fds = None  # (read end, write end) of the pipe stop() wakes the thread with
+        self._wake_lock = threading.Lock()
+        self._fd = None
+        self._libc = None
+        self._watches = {}  # wd -> (directory path, root index)
+        self._pending_added = set()
+        self._pending_removed = set()
+        self._last_event = 0
+        self._visited = set()  # Real paths of directories already walked
+        self._dir_state = {}  # polling: dir -> (mtime, audio files, subdirs, root index)
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self._running:
+            return
+        self._running = True
+        self._wake_fds = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching. The thread releases inotify resources as it exits."""
+        self._running = False
+        with self._wake_lock:
+            if self._wake_fds is not None:
+                try:
+                    os.write(self._wake_fds[1], b"\0")
+                except OSError:
+                    pass
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def _close_wake_pipe(self):
+        """Close the pipe stop() writes to."""
+        with self._wake_lock:
+            if self._wake_fds is not None:
+                for fd in self._wake_fds:
+                    os.close(fd)
+                self._wake_fds = None
+
+    def _wait(self, fds, timeout):
+        """
+        Wait for fds to become readable, or for stop().
+
+        Returns:
+            Readable fds from fds (empty on timeout or stop)
+        """
+        wake = self._wake_fds[0]
+        ready, _, _ = select.select(list(fds) + [wake], [], [], timeout)
+        return [fd for fd in ready if fd != wake]
+
+    def catch_up(self, since, on_folder=None):
+        """
+        Bring the cache up to date once, without watching.
+
+        Like a polling pass, only folders modified after `since` are listed
+        again; the others keep the files the cache has for them. Folders the
+        cache has no files for, and the subfolders of a modified folder, are
+        listed again too: a folder moved in with mv, cp -a or rsync -a keeps
+        its old mtime. The cache is written even if nothing changed, so it
+        counts as fresh again.
+
+        Args:
+            since: Time the cache was written
+            on_folder: Function called with each folder walked (may raise to stop)
+
+        Returns:
+            List of audio files added
+        """
+        cached = set(self.scanner._load_cache(self.cache_file))
+        by_dir = {}
+        for path in cached:
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+
+        current = set()
+        modified = set()  # Folders whose entries changed since the cache was written
+        self._visited = set()
+        for root_idx, root in enumerate(self.paths):
+            if not os.path.isdir(root):
+                continue
+            for dirpath, filenames, _ in self._walk(root, root_idx):
+                if on_folder:
+                    on_folder(dirpath)
+                try:
+                    if os.stat(dirpath).st_mtime > since:
+                        modified.add(dirpath)
+                except OSError:
+                    continue
+                if dirpath in modified or dirpath not in by_dir or os.path.dirname(dirpath) in modified:
+                    current.update(os.path.join(dirpath, f) for f in filenames
+                                   if self.scanner._is_audio_file(f))
+                else:
+                    current.update(by_dir.get(dirpath, ()))
+
+        self._add_pending(current - cached, cached - current)
+        return self._flush()
+
+    def _run(self):
+        """Pick a backend and run it until stopped."""
+        try:
+            self._init_inotify()
+            self.mode = "inotify"
+            self._inotify_loop()
+        except (OSError, WatchLimitError):
+            self._close_inotify()
+            if self._running:  # Not just stopped part way
+                self.mode = "polling"
+                self._poll_loop()
+        finally:
+            self._close_inotify()
+            self._close_wake_pipe()
+
+    # ---- inotify backend ----
+
+    def _init_inotify(self):
+        """Create the inotify instance and watch every directory."""
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify not available")
+
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+
+        self._visited = set()
+        current = []
+        for root_idx, root in enumerate(self.paths):
+            if os.path.isdir(root):
+                current.extend(self._watch_tree(root, root_idx))
+
+        # Changes made while the app was closed - the walk above already listed every folder
+        if self._running:
+            self._reconcile(current)
+
+    def _close_inotify(self):
+        """Close the inotify file descriptor."""
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+        self._watches = {}
+
+    def _watch_tree(self, root, root_idx):
+        """Add watches for root and all its subdirectories.
+
+        Returns:
+            List of audio files found while walking (for new directories)
+        """
+        found = []
+        for dirpath, filenames, _ in self._walk(root, root_idx):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise WatchLimitError("inotify watch limit reached")
+                continue  # Unreadable directory - skip it
+            self._watches[wd] = (dirpath, root_idx)
+            found.extend(os.path.join(dirpath, f) for f in filenames
+                         if self.scanner._is_audio_file(f))
+        return found
+
+    def _inotify_loop(self):
+        """Read events and flush them after a quiet period."""
+        while self._running:
+            timeout = self.debounce if self._has_pending() else None
+            ready = self._wait([self._fd], timeout)
+            if not self._running:
+                break
+
+            if ready:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                self._handle_events(data)
+
+            if self._has_pending() and time.monotonic() - self._last_event >= self.debounce:
+                self._flush()
+
+    def _handle_events(self, data):
+        """Parse raw inotify events into pending adds/removes."""
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Kernel dropped events - fall back to a full rescan of the roots
+                raise WatchLimitError("inotify event queue overflow")
+
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # A watched folder itself went away (a root, or a move reported before its parent's event)
+                self._last_event = time.monotonic()
+                self._drop_tree(watch[0])
+                continue
+            if not name:
+                continue
+            directory, root_idx = watch
+            path = os.path.join(directory, os.fsdecode(name))
+            self._last_event = time.monotonic()
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # New folder (e.g. an album being copied) - watch and pick up its files
+                    self._add_pending(self._watch_tree(path, root_idx), ())
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._drop_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                if self.scanner._is_audio_file(path):
+                    self._add_pending((path,), ())
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                if self.scanner._is_audio_file(path):
+                    self._add_pending((), (path,))
+
+    def _drop_tree(self, path):
+        """Stop watching a removed or moved-away folder and drop its files from the cache."""
+        self._unwatch_tree(path)
+        self._forget_visited(path)
+        self._add_pending((), (path,))
+
+    def _unwatch_tree(self, path):
+        """Remove the watches on path and every folder below it."""
+        prefix = path.rstrip(os.sep) + os.sep
+        for wd in [wd for wd, (d, _) in self._watches.items() if d == path or d.startswith(prefix)]:
+            del self._watches[wd]
+            # A folder that was deleted has lost its watch already - EINVAL is fine
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    # ---- polling fallback ----
+
+    def _poll_loop(self):
+        """Periodically re-list only directories whose mtime changed."""
+        self._dir_state = {}
+        self._visited = set()
+        for root_idx, root in enumerate(self.paths):
+            if os.path.isdir(root):
+                self._snapshot_tree(root, root_idx)
+
+        if not self._running:
+            return
+
+        # The cache may be older than our first snapshot - sync it once
+        current = []
+        for _, files, _, _ in self._dir_state.values():
+            current.extend(files)
+        self._reconcile(current)
+
+        while self._running:
+            self._wait([], self.poll_interval)
+            if self._running:
+                self._poll_once()
+
+    def _snapshot_tree(self, root, root_idx):
+        """Record mtime, audio files and subdirs for every directory under root.
+
+        Returns:
+            List of audio files found
+        """
+        found = []
+        for dirpath, filenames, subdirs in self._walk(root, root_idx):
+            files = {os.path.join(dirpath, f) for f in filenames
+                     if self.scanner._is_audio_file(f)}
+            try:
+                mtime = os.stat(dirpath).st_mtime
+            except OSError:
+                continue
+            self._dir_state[dirpath] = (mtime, files, subdirs, root_idx)
+            found.extend(files)
+        return found
+
+    def _reconcile(self, files):
+        """Make the cache match the audio files found by the initial walk (one incremental diff)."""
+        current = set(files)
+        if self.scanner.min_file_size:
+            current = {f for f in current if self._keep_file(f)}
+        cached = set(self.scanner._load_cache(self.cache_file))
+        self._add_pending(current - cached, cached - current)
+        if self._has_pending():
+            self._flush()
+
+    def _poll_once(self):
+        """Check every known directory and apply differences."""
+        added, removed = [], []
+
+        for dirpath in list(self._dir_state):
+            state = self._dir_state.get(dirpath)
+            if state is None:
+                continue  # Dropped as part of a removed parent
+            old_mtime, old_files, old_subdirs, root_idx = state
+
+            try:
+                mtime = os.stat(dirpath).st_mtime
+            except OSError:
+                # Directory is gone - drop it and everything below it
+                removed.append(dirpath)
+                self._forget_tree(dirpath)
+                continue
+
+            if mtime == old_mtime:
+                continue
+
+            try:
+                names = os.listdir(dirpath)
+            except OSError:
+                continue
+            files, subdirs = set(), set()
+            for name in names:
+                full_path = os.path.join(dirpath, name)
+                if os.path.isdir(full_path):
+                    subdirs.add(full_path)
+                elif self.scanner._is_audio_file(name):
+                    files.add(full_path)
+            self._dir_state[dirpath] = (mtime, files, subdirs, root_idx)
+
+            added.extend(files - old_files)
+            removed.extend(old_files - files)
+            for sub in subdirs - old_subdirs:
+                added.extend(self._snapshot_tree(sub, root_idx))
+            for sub in old_subdirs - subdirs:
+                removed.append(sub)
+                self._forget_tree(sub)
+
+        if added or removed:
+            self._add_pending(added, removed)
+            self._flush()
+
+    def _forget_tree(self, path):
+        """Drop polling state for path and its subdirectories."""
+        prefix = path.rstrip(os.sep) + os.sep
+        for d in [d for d in self._dir_state if d == path or d.startswith(prefix)]:
+            del self._dir_state[d]
+        self._forget_visited(path)
+
+    def _forget_visited(self, path):
+        """Allow a removed directory to be walked again if it reappears."""
+        prefix = path.rstrip(os.sep) + os.sep
+        self._visited = {d for d in self._visited if d != path and not d.startswith(prefix)}
+
+    # ---- shared helpers ----
+
+    def _walk(self, root, root_idx):
+        """Yield (dirpath, filenames, subdirs) for root and subdirectories.
+
+        Follows symlinks like Scanner does, but visits each real directory once
+        (across all roots, so overlapping roots are only watched once).
+        Folders deeper than max_scan_depth below their scan root are left
+        out, as the Scanner leaves them out.
+        """
+        visited = self._visited
+        max_depth = self.scanner.max_depth
+        stack = [(root, self._depth(root, root_idx))]
+        while stack:
+            dirpath, depth = stack.pop()
+            if max_depth and depth > max_depth:
+                continue
+            real_path = os.path.realpath(dirpath)
+            if real_path in visited or self.scanner.is_excluded(real_path, root_idx):
+                continue
+            if self.scanner.is_ignored_dir(os.path.basename(dirpath), dirpath, root_idx):
+                continue
+            visited.add(real_path)
+
+            try:
+                names = os.listdir(dirpath)
+            except OSError:
+                continue
+            if self.scanner.honor_nomedia and '.nomedia' in names:
+                continue
+
+            filenames = []
+            subdirs = set()
+            for name in names:
+                full_path = os.path.join(dirpath, name)
+                if os.path.isdir(full_path):
+                    subdirs.add(full_path)
+                else:
+                    filenames.append(name)
+            stack.extend((subdir, depth + 1) for subdir in subdirs)
+            yield dirpath, filenames, subdirs
+
+    def _depth(self, path, root_idx):
+        """How many levels below its scan root a folder is."""
+        rel = os.path.relpath(path, self.paths[root_idx])
+        return 0 if rel == os.curdir else rel.count(os.sep) + 1
+
+    def _keep_file(self, path):
+        """Check that an added file passes min_file_size, like the Scanner."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return not self.scanner.min_file_size or st.st_size >= self.scanner.min_file_size
+
+    def _has_pending(self):
+        """Check if changes are waiting to be flushed."""
+        return bool(self._pending_added or self._pending_removed)
+
+    def _add_pending(self, added, removed):
+        """Queue changes. A later event for the same path wins."""
+        for path in removed:
+            self._pending_added.discard(path)
+            self._pending_removed.add(path)
+        for path in added:
+            self._pending_removed.discard(path)
+            self._pending_added.add(path)
+
+    def _flush(self):
+        """Apply pending changes to the cache in one write.
+
+        Returns:
+            List of audio files added
+        """
+        added, removed = self._pending_added, self._pending_removed
+        self._pending_added, self._pending_removed = set(), set()
+
+        # Only files that still exist (and aren't too small to be songs) count as additions
+        added = [f for f in added if os.path.isfile(f) and self._keep_file(f)]
+        self.scanner.apply_changes(self.cache_file, added, removed)
+
+        if self.on_change:
+            self.on_change()
+        return added
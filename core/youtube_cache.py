@@ -0,0 +1,70 @@
+"""Seen YouTube results - songs returned by earlier YouTube Music searches.
+
+Kept so the global search can find them again offline, without a network
+round trip. Only what is needed to show and play a result is stored, newest
+first, up to MAX_RESULTS.
+"""
+
+import json
+import os
+from constants import YOUTUBE_RESULTS_CACHE
+
+
+MAX_RESULTS = 1000
+
+
+def youtube_url(result):
+    """YouTube URL of a search result (None if it has no video id)."""
+    video_id = result.get('videoId')
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return None
+
+
+def youtube_title(result):
+    """"Title - Artists" of a search result."""
+    artists = ", ".join([a['name'] for a in result.get('artists', [])])
+    return f"{result.get('title', 'Unknown')} - {artists}"
+
+
+class YouTubeResultCache:
+    """Bounded, persisted list of YouTube Music search results."""
+
+    def __init__(self):
+        self.results = []  # Newest first
+        self.load()
+
+    def load(self):
+        """Load seen results from disk."""
+        try:
+            with open(YOUTUBE_RESULTS_CACHE, 'r', encoding='utf-8') as f:
+                self.results = json.load(f).get('results', [])
+        except (IOError, json.JSONDecodeError):
+            self.results = []
+
+    def save(self):
+        """Write seen results to disk."""
+        tmp_file = YOUTUBE_RESULTS_CACHE + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'results': self.results}, f, separators=(',', ':'), ensure_ascii=False)
+            os.replace(tmp_file, YOUTUBE_RESULTS_CACHE)
+        except IOError:
+            pass  # Fail silently - this is only a cache
+
+    def add(self, results):
+        """Remember results (most recent first) and save."""
+        seen = []
+        for result in results:
+            if not result.get('videoId'):
+                continue
+            seen.append({
+                'videoId': result['videoId'],
+                'title': result.get('title', 'Unknown'),
+                'artists': [{'name': a['name']} for a in result.get('artists') or [] if a.get('name')],
+            })
+        if not seen:
+            return
+        ids = {result['videoId'] for result in seen}
+        self.results = (seen + [r for r in self.results if r['videoId'] not in ids])[:MAX_RESULTS]
+        self.save()
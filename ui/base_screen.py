@@ -3,6 +3,9 @@
 class Screen:
     """Base screen. render() prints content. handle_input() returns next screen or self."""
     
+    # True while the screen takes typed text, so q and ESC reach handle_input
+    captures_text = False
+    
     def __init__(self, app):
         self.app = app
 
@@ -9,9 +9,10 @@ from constants import AUDIO_EXTENSIONS
 class FolderBrowserScreen(Screen):
     """Browse and select a folder for custom music scanning."""
     
-    def __init__(self, app, start_path=None):
+    def __init__(self, app, start_path=None, add_root=False):
         super().__init__(app)
         self.current_path = start_path or os.path.expanduser("~")
+        self.add_root = add_root  # Picking a library folder instead of the custom scan path
         self.items = []  # Combined folders and files
         self.idx = 0
         self._load_items()
@@ -54,7 +55,7 @@ class FolderBrowserScreen(Screen):
         clear_screen()
         self.app.player_box.render()
         print()
-        print(" Custom Folder Browser")
+        print(" Add Library Folder" if self.add_root else " Custom Folder Browser")
         print("-" * 50)
         print(f" Current: {self.current_path}")
         print("-" * 50)
@@ -72,7 +73,8 @@ class FolderBrowserScreen(Screen):
                 else:
                     print(f" {prefix} {item['name']}{suffix}")
         
-        print("\n[→] Open folder   [Enter] Select this path and scan")
+        action = "Add this folder" if self.add_root else "Select this path and scan"
+        print(f"\n[→] Open folder   [Enter] {action}")
         print("[←/b] Go up to parent directory")
         print("[↑/↓] Navigate")
     
@@ -121,7 +123,10 @@ class FolderBrowserScreen(Screen):
                 self._load_items()
                 return self
             else:
-                # Can't go up anymore - return to Scan Options
+                # Can't go up anymore - return to where we came from
+                if self.add_root:
+                    from .library_roots import LibraryRootsScreen
+                    return LibraryRootsScreen(self.app)
                 from .scan_options import ScanOptionsScreen
                 return ScanOptionsScreen(self.app)
         
@@ -133,27 +138,23 @@ class FolderBrowserScreen(Screen):
         if self.current_path == "/":
             return self  # Don't allow selecting root
         
-        # Save custom path to config
         from core.config import load_config, save_config
         config = load_config()
-        config['scan_mode'] = 'custom'
-        config['custom_scan_path'] = self.current_path
-        save_config(config)
-        
-        # Start scanning
-        from core.scanner import Scanner
-        from constants import CUSTOM_CACHE
         
-        def progress_callback(path, count):
-            # Update status box during scan
-            self.app.player_box.set_scanning(path, count)
+        if self.add_root:
+            # Add to the library folders (once) and go back to the list
+            roots = config.get('library_roots', [])
+            if not any(root['path'] == self.current_path for root in roots):
+                roots.append({'path': self.current_path, 'exclude_phone_storage': False, 'ignore_globs': []})
+                config['library_roots'] = roots
+                save_config(config)
+            from .library_roots import LibraryRootsScreen
+            return LibraryRootsScreen(self.app)
         
-        scanner = Scanner(status_callback=progress_callback)
-        files = scanner.scan(self.current_path, CUSTOM_CACHE)
-        
-        # Update status to idle with song count
-        self.app.player_box.set_idle(len(files))
+        # Save custom path to config
+        config['custom_scan_path'] = self.current_path
+        save_config(config)
         
-        # Return to scan options
+        # Scan from Scan Options so it can offer to resume an interrupted scan
         from .scan_options import ScanOptionsScreen
-        return ScanOptionsScreen(self.app)
+        return ScanOptionsScreen(self.app).start_scan('custom')
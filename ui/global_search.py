@@ -0,0 +1,208 @@
+"""Global search screen - one search over local music, saved streams and YouTube."""
+
+from core.search import SearchIndex, UnifiedSearch
+from core.streams import StreamManager
+from core.youtube_cache import YouTubeResultCache, youtube_url, youtube_title
+from core.track import Track, YOUTUBE
+from core.terminal_utils import clear_screen, Paginator, get_terminal_size, truncate_filename
+from .base_screen import Screen
+
+try:
+    from ytmusicapi import YTMusic
+    YTMUSIC_AVAILABLE = True
+except ImportError:
+    YTMUSIC_AVAILABLE = False
+
+
+SOURCE_LABELS = {"local": "Local", "stream": "Stream", "youtube": "YouTube"}
+
+
+class GlobalSearchScreen(Screen):
+    """Type to search everything at once. YouTube Music is only queried on request."""
+    
+    def __init__(self, app):
+        super().__init__(app)
+        self.library = app.library
+        self.youtube_cache = YouTubeResultCache()
+        self.search = self._build_search()
+        self.paginator = Paginator([])
+        self.typing = True  # Start with the cursor in the query
+        self.message = None
+    
+    @property
+    def captures_text(self):
+        """Typed q goes into the query instead of quitting."""
+        return self.typing
+    
+    def _build_search(self):
+        """Index the three sources (the library index is shared and already built)."""
+        streams = StreamManager().get_tracks()
+        return UnifiedSearch([
+            ("local", self.library.search_index()),
+            ("stream", SearchIndex(streams, lambda track: track.title)),
+            ("youtube", SearchIndex(self.youtube_cache.results, youtube_title)),
+        ])
+    
+    def _update(self, query):
+        """Re-run the query, best match selected."""
+        self.paginator = Paginator(self.search.update(query))
+    
+    def _search_youtube(self):
+        """Ask YouTube Music for more results and merge them in."""
+        query = self.search.query.strip()
+        if not query:
+            return
+        if not YTMUSIC_AVAILABLE:
+            self.message = "ytmusicapi not installed. Install with: pip install ytmusicapi"
+            return
+        
+        clear_screen()
+        self.app.player_box.render()
+        print("\n Searching YouTube Music...")
+        try:
+            results = YTMusic().search(query, filter="songs", limit=10)
+        except Exception as e:
+            self.message = f"Search error: {e}"
+            return
+        
+        self.youtube_cache.add(results)
+        self.search = self._build_search()
+        self._update(query)
+        # Online results that don't match the query text still belong to it
+        shown = {item.get('videoId') for source, item in self.paginator.items if source == "youtube"}
+        extra = [("youtube", r) for r in self.youtube_cache.results[:len(results)] if r['videoId'] not in shown]
+        if extra:
+            self.paginator = Paginator(self.paginator.items + extra)
+    
+    def _title(self, match):
+        """Display title of a result."""
+        source, item = match
+        if source == "local":
+            return self.library.track(item).title
+        if source == "stream":
+            return item.title
+        return youtube_title(item)
+    
+    def _label(self, match):
+        """Row text: source tag and title."""
+        return f"[{SOURCE_LABELS[match[0]]}] {self._title(match)}"
+    
+    def _track(self, match):
+        """Queue record of a result (None for a YouTube result without a video id)."""
+        source, item = match
+        if source == "local":
+            return self.library.track(item)
+        if source == "stream":
+            return item
+        url = youtube_url(item)
+        return Track(YOUTUBE, url, youtube_title(item)) if url else None
+    
+    def render(self):
+        """Draw the search screen."""
+        clear_screen()
+        self.app.player_box.render()
+        print()
+        cursor = "_" if self.typing else ""
+        print(f" Search: {self.search.query}{cursor}")
+        counts = self.search.counts
+        print(f" Local {counts['local']}   Streams {counts['stream']}   YouTube (seen) {counts['youtube']}")
+        print("-" * 50)
+        
+        if self.message:
+            print(f"\n {self.message}")
+        elif not self.paginator.items:
+            print("\n Type to search local music, saved streams and past YouTube results.")
+        else:
+            _, term_width = get_terminal_size()
+            for i, match in enumerate(self.paginator.visible_items):
+                label = truncate_filename(self._label(match), term_width - 5)
+                if i == self.paginator.local_idx:
+                    # Inverted colors for selected item
+                    print(f"\033[7m {label}\033[0m")
+                else:
+                    print(f" {label}")
+            print()
+            print(f" {self.paginator.get_page_info()}")
+        
+        if self.typing:
+            print("\nType to search   [↑/↓] Move   [Enter] Done   [Backspace] Delete")
+            return
+        print("\n[Enter/→] Play   [Space] Play/Pause   [a] Add to Queue   [y] Search YouTube Music")
+        print("[A] Add All to Queue   [/] Edit Search   [n] Next in Queue   [s] Stop   [←/b] Back   [q] Quit")
+    
+    def handle_input(self, key):
+        """Handle keypresses."""
+        self.message = None
+        
+        if key == "UP":
+            self.paginator.move_up()
+            return self
+        
+        if key == "DOWN":
+            self.paginator.move_down()
+            return self
+        
+        if self.typing:
+            query = self.search.query
+            if key == "ENTER" or key == "ESC":
+                self.typing = False
+            elif key in ("\x7f", "\x08"):  # Backspace
+                self._update(query[:-1])
+            elif key == "SPACE":
+                self._update(query + " ")
+            elif len(key) == 1 and key.isprintable():
+                self._update(query + key)
+            return self
+        
+        if key == "/":
+            self.typing = True
+            return self
+        
+        if key == "y":
+            self._search_youtube()
+            return self
+        
+        if key == "b" or key == "LEFT":
+            from .home import HomeScreen
+            return HomeScreen(self.app)
+        
+        if key == "q":
+            self.app.quit()
+            return None
+        
+        if key == "n":
+            self.app.queue_play_next()
+            return self
+        
+        if key == "s":
+            self.app.player_stop()
+            return self
+        
+        if key == "A":
+            added = self.app.queue_add_tracks(filter(None, map(self._track, self.paginator.items)))
+            self.message = f"Added {added} results to the queue."
+            return self
+        
+        selected = self.paginator.get_selected()
+        if not selected:
+            return self
+        track = self._track(selected)
+        if not track:
+            return self
+        
+        if key == "ENTER" or key == "RIGHT":
+            self.app.player_play(track)
+            return self
+        
+        if key == "SPACE":
+            if self.app.player.state == "playing":
+                self.app.player_pause()
+            else:
+                self.app.player_resume_or_play(track)
+            return self
+        
+        if key == "a":
+            self.app.queue_add_track(track)
+            return self
+        
+        return self
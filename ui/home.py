@@ -4,9 +4,9 @@ from core.terminal_utils import clear_screen
 from .base_screen import Screen
 
 class HomeScreen(Screen):
-    """Main menu with options: YouTube Music, Local Music, Saved Streams, Add Stream, Scan Options, Settings."""
+    """Main menu with options: Search, YouTube Music, Local Music, Saved Streams, Add Stream, Scan Options, Settings."""
     
-    OPTIONS = ["YouTube Music", "Local Music", "Saved Streams", "Add Stream", "Scan Options", "Settings"]
+    OPTIONS = ["Search", "YouTube Music", "Local Music", "Saved Streams", "Add Stream", "Scan Options", "Settings"]
 
     def __init__(self, app):
         super().__init__(app)
@@ -27,7 +27,7 @@ class HomeScreen(Screen):
             else:
                 print(f" {opt}")
         
-        print("\n[q] Quit")
+        print("\n[/] Search   [q] Quit")
 
     def handle_input(self, key):
         """Handle keypresses."""
@@ -39,6 +39,10 @@ class HomeScreen(Screen):
             self.idx = min(len(self.OPTIONS) - 1, self.idx + 1)
             return self
         
+        if key == "/":
+            from .global_search import GlobalSearchScreen
+            return GlobalSearchScreen(self.app)
+        
         if key == "ENTER" or key == "RIGHT":
             # Import here to avoid circular imports
             from .ytmusic_search import YTMusicSearchScreen
@@ -47,8 +51,11 @@ class HomeScreen(Screen):
             from .add_stream import AddStreamScreen
             from .scan_options import ScanOptionsScreen
             from .settings import SettingsScreen
+            from .global_search import GlobalSearchScreen
             
             sel = self.OPTIONS[self.idx]
+            if sel == "Search":
+                return GlobalSearchScreen(self.app)
             if sel == "YouTube Music":
                 return YTMusicSearchScreen(self.app)
             if sel == "Local Music":
@@ -0,0 +1,88 @@
+"""Library folders screen - manage the roots scanned together in library mode."""
+
+from core.terminal_utils import clear_screen
+from core.config import load_config, save_config
+from .base_screen import Screen
+
+
+class LibraryRootsScreen(Screen):
+    """List, add and remove library folders, and scan them all in one pass."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.idx = 0
+        self.roots = load_config().get('library_roots', [])
+
+    def render(self):
+        """Draw the library folders screen."""
+        clear_screen()
+        self.app.player_box.render()
+        print()
+        print(" Library Folders")
+        print("-" * 50)
+
+        if not self.roots:
+            print("\n (No folders yet - press + to add one)")
+        else:
+            for i, root in enumerate(self.roots):
+                line = root['path']
+                if root.get('exclude_phone_storage'):
+                    line += "  [no phone storage]"
+                if root.get('ignore_globs'):
+                    line += f"  [ignores: {', '.join(root['ignore_globs'])}]"
+
+                if i == self.idx:
+                    # Inverted colors for selected item
+                    print(f"\033[7m {line}\033[0m")
+                else:
+                    print(f" {line}")
+
+        print("\n[Enter] Scan all folders   [+] Add folder   [d] Remove")
+        print("[x] Toggle phone storage exclusion   [←/b] Back   [q] Quit")
+
+    def handle_input(self, key):
+        """Handle keypresses."""
+        if key == "UP":
+            self.idx = max(0, self.idx - 1)
+            return self
+
+        if key == "DOWN":
+            self.idx = max(0, min(len(self.roots) - 1, self.idx + 1))
+            return self
+
+        if key == "+" or key == "a":
+            from .folder_browser import FolderBrowserScreen
+            return FolderBrowserScreen(self.app, add_root=True)
+
+        if key == "d" and self.roots:
+            del self.roots[self.idx]
+            self.idx = max(0, min(self.idx, len(self.roots) - 1))
+            self._save()
+            return self
+
+        if key == "x" and self.roots:
+            root = self.roots[self.idx]
+            root['exclude_phone_storage'] = not root.get('exclude_phone_storage')
+            self._save()
+            return self
+
+        if key == "ENTER" and self.roots:
+            # Scan from Scan Options so it can offer to resume an interrupted scan
+            from .scan_options import ScanOptionsScreen
+            return ScanOptionsScreen(self.app).start_scan('library')
+
+        if key == "b" or key == "LEFT":
+            from .scan_options import ScanOptionsScreen
+            return ScanOptionsScreen(self.app)
+
+        if key == "q":
+            self.app.quit()
+            return None
+
+        return self
+
+    def _save(self):
+        """Write the roots back to config."""
+        config = load_config()
+        config['library_roots'] = self.roots
+        save_config(config)
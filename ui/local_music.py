@@ -1,49 +1,199 @@
 """Local music screen - shows and plays local audio files."""
 
-import os
 from .base_screen import Screen
 from core.config import load_config
-from core.scanner import Scanner
+from core.search import SearchSession
+from core.groups import GROUP_VIEWS
 from core.terminal_utils import clear_screen, Paginator, get_terminal_size, truncate_filename
-from constants import PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE
 
 
 class LocalMusicScreen(Screen):
     """Shows list of local music files. Navigate and play them."""
-
+    
     def __init__(self, app):
         super().__init__(app)
-        songs = self._load_songs()
+        self.library = app.library
+        self.sort_mode = "name"
+        self.view = "songs"  # "songs" or one of GROUP_VIEWS
+        self.group = None  # Name of the open group in a group view
+        self.group_idx = 0  # Position in the group list to return to
+        self.hide_duplicates = load_config().get('hide_duplicates', False)
+        self.paginator = Paginator(self._load_songs())
+        self.library_generation = self.library.generation
+        self.search = None  # SearchSession while a search filter is active
+        self.typing = False  # True while keys go into the search query
+        self.jump = None  # Filename prefix being typed in jump mode
+    
+    @property
+    def captures_text(self):
+        """Typed q goes into the search query or jump prefix instead of quitting."""
+        return self.typing or self.jump is not None
+    
+    def _refresh_if_changed(self):
+        """Reload songs if a scan, the watcher or a background refresh changed the library."""
+        if self.library.refresh() == self.library_generation:
+            return
+        self.library_generation = self.library.generation
+        if self.search:
+            # Re-run the query against the new snapshot
+            self.search = SearchSession(self.library.search_index(self.hide_duplicates))
+            self._update_search(self.search.query)
+        else:
+            self._set_songs(self._load_songs())
+    
+    def _set_songs(self, songs):
+        """Replace the list, keeping the same item selected if present."""
+        selected = self.paginator.get_selected()
         self.paginator = Paginator(songs)
+        if selected in songs:
+            self.paginator.current_idx = songs.index(selected)
     
     def _load_songs(self):
-        """Load and merge songs from all cache files, sorted alphabetically."""
-        scanner = Scanner()
-        all_songs = []
-        
-        # Load from all cache files
-        for cache_file in [PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE]:
-            files = scanner._load_cache(cache_file)
-            if files:
-                all_songs.extend(files)
-        
-        # Remove duplicates (same file path)
-        unique_songs = list(set(all_songs))
-        
-        # Sort alphabetically by filename
-        unique_songs.sort(key=lambda path: os.path.basename(path).lower())
+        """Get what the current view lists: songs, group names or an open group's songs."""
+        if self.view == "songs":
+            return self.library.songs(self.sort_mode, self.hide_duplicates)
+        if self.group is None:
+            return self.library.groups(self.view).names()
+        return self.library.group_songs(self.view, self.group, self.hide_duplicates)
+    
+    def _showing_groups(self):
+        """True when the list holds group names rather than songs."""
+        return self.view != "songs" and self.group is None and not self.search
+    
+    def _cycle_view(self):
+        """Switch songs -> folders -> artists -> albums -> songs."""
+        views = ["songs"] + GROUP_VIEWS
+        self.view = views[(views.index(self.view) + 1) % len(views)]
+        self.group = None
+        self.search = None
+        self.typing = False
+        self.paginator = Paginator(self._load_songs())
+    
+    def _open_group(self):
+        """Show the songs of the selected group."""
+        self.group_idx = self.paginator.current_idx
+        self.group = self.paginator.get_selected()
+        self.paginator = Paginator(self._load_songs())
+    
+    def _close_group(self):
+        """Go back from a group's songs to the group list."""
+        self.group = None
+        self.paginator = Paginator(self._load_songs())
+        self.paginator.current_idx = min(self.group_idx, max(0, self.paginator.total_items - 1))
+    
+    def _enqueue(self, songs):
+        """Add songs to the queue in order, in one bulk add."""
+        self.app.queue_add_tracks(self.library.track(path) for path in songs)
+    
+    def _start_search(self):
+        """Enter type-to-filter mode (keeping the current query if any)."""
+        if self.search is None:
+            # Search covers the whole library, whatever the view
+            self.view = "songs"
+            self.group = None
+            self.search = SearchSession(self.library.search_index(self.hide_duplicates))
+        self.typing = True
+    
+    def _update_search(self, query):
+        """Filter the list by a new query, best match selected."""
+        index = self.search.index
+        self.paginator = Paginator([index.items[i] for i in self.search.update(query)])
+    
+    def _end_search(self):
+        """Drop the search filter and show the whole library again."""
+        self.search = None
+        self.typing = False
+        self._set_songs(self._load_songs())
+    
+    def _handle_search_key(self, key):
+        """Handle a keypress while typing a search query."""
+        query = self.search.query
+        if key == "ENTER":
+            self.typing = False  # Keep the filter, keys control the list again
+        elif key == "ESC":
+            self._end_search()
+        elif key in ("\x7f", "\x08"):  # Backspace
+            if query:
+                self._update_search(query[:-1])
+            else:
+                self._end_search()
+        elif key == "UP":
+            self.paginator.move_up()
+        elif key == "DOWN":
+            self.paginator.move_down()
+        elif key == "SPACE":
+            self._update_search(query + " ")
+        elif len(key) == 1 and key.isprintable():
+            self._update_search(query + key)
+        return self
+    
+    def _start_jump(self):
+        """Enter jump mode over the name-sorted song list."""
+        self.search = None
+        self.view = "songs"
+        self.group = None
+        self.sort_mode = "name"
+        self._set_songs(self._load_songs())
+        self.jump = ""
+    
+    def _handle_jump_key(self, key):
+        """Handle a keypress while typing a jump prefix."""
+        if key == "ENTER" or key == "ESC":
+            self.jump = None
+            return self
+        if key == "UP":
+            self.paginator.move_up()
+            return self
+        if key == "DOWN":
+            self.paginator.move_down()
+            return self
+        if key in ("\x7f", "\x08"):  # Backspace
+            self.jump = self.jump[:-1]
+        elif key == "SPACE":
+            self.jump += " "
+        elif len(key) == 1 and key.isprintable():
+            self.jump += key
+        else:
+            return self
         
-        return unique_songs
+        if self.jump:
+            idx = self.library.prefix_index(self.hide_duplicates).find(self.jump)
+            if idx is not None:
+                self.paginator.current_idx = idx
+        return self
+    
+    def _display_name(self, path):
+        """Get "Artist - Title" from tags, or the filename if untagged."""
+        return self.library.track(path).title
+    
+    def _label(self, item):
+        """Text of a list row: a song, or a group name with its size."""
+        if self._showing_groups():
+            return f"{item}  ({len(self.library.groups(self.view).members(item))})"
+        return self._display_name(item)
 
     def render(self):
         """Draw the music list."""
+        self._refresh_if_changed()
         clear_screen()
         self.app.player_box.render()
         print()
-        print(" Local Music")
+        if self.jump is not None:
+            print(f" Jump to: {self.jump}_")
+        elif self.search:
+            cursor = "_" if self.typing else ""
+            print(f" Search: {self.search.query}{cursor}  ({len(self.paginator.items)} matches)")
+        elif self._showing_groups():
+            print(f" Local Music by {self.view} ({self.paginator.total_items} groups)")
+        elif self.group is not None:
+            print(f" {self.group}  ({self.paginator.total_items} songs)")
+        else:
+            print(f" Local Music (sorted by {self.sort_mode})")
         print("-" * 50)
         
-        if not self.paginator.items:
+        if not self.paginator.items and self.search:
+            print("\n No matches.")
+        elif not self.paginator.items:
             print("\n No music files found.")
             print(" Try scanning in Scan Options.")
         else:
@@ -52,9 +202,9 @@ class LocalMusicScreen(Screen):
             max_filename_len = term_width - 5  # Leave margin for padding and borders
             
             # Show visible items on current page
-            for i, song_path in enumerate(self.paginator.visible_items):
+            for i, item in enumerate(self.paginator.visible_items):
                 is_selected = (i == self.paginator.local_idx)
-                filename = os.path.basename(song_path)
+                filename = self._label(item)
                 truncated = truncate_filename(filename, max_filename_len)
                 if is_selected:
                     # Inverted colors for selected item
@@ -66,12 +216,89 @@ class LocalMusicScreen(Screen):
             print()
             print(f" {self.paginator.get_page_info()}")
         
+        if self.jump is not None:
+            print("\nType the start of a filename   [↑/↓] Move   [Enter] Done")
+            return
+        if self.typing:
+            print("\nType to search   [↑/↓] Move   [Enter] Done   [Backspace] Delete   [ESC] Cancel")
+            return
+        if self._showing_groups():
+            print("\n[Enter/→] Open   [Space] Pause/Resume   [a] Add Group to Queue")
+            print("[PgUp/PgDn] Seek ±10s   [n] Next in Queue   [s] Stop   [v] View   [/] Search")
+            print("[x] Shuffle All   [r] Repeat   [p] Previous   [←/b] Back   [q] Quit")
+            return
         print("\n[Enter/→] Play   [Space] Play/Pause   [a] Add to Queue")
-        print("[PgUp/PgDn] Seek ±10s   [n] Next in Queue   [s] Stop")
-        print("[←/b] Back   [q] Quit")
+        print("[PgUp/PgDn] Seek ±10s   [n] Next in Queue   [s] Stop   [o] Sort   [v] View   [/] Search")
+        print("[x] Shuffle All   [r] Repeat   [p] Previous")
+        if self.view == "songs" and not self.search:
+            print("[j] Jump to Letter   [←/b] Back   [q] Quit")
+        elif self.search:
+            print("[A] Add All Matches to Queue   [←/b] Clear Search   [q] Quit")
+        else:
+            print("[A] Add Group to Queue   [←/b] Back to Groups   [q] Quit")
 
     def handle_input(self, key):
         """Handle keypresses."""
+        if self.typing:
+            return self._handle_search_key(key)
+        if self.jump is not None:
+            return self._handle_jump_key(key)
+        
+        if key == "/":
+            self._start_search()
+            return self
+        
+        if key == "v":
+            self._cycle_view()
+            return self
+        
+        if key == "j":
+            self._start_jump()
+            return self
+        
+        if key == "b" or key == "LEFT":
+            if self.search:
+                self._end_search()
+                return self
+            if self.group is not None:
+                self._close_group()
+                return self
+        
+        if self._showing_groups() and self.paginator.items:
+            if key == "ENTER" or key == "RIGHT":
+                self._open_group()
+                return self
+            if key == "a":
+                # Whole group in one keypress
+                self._enqueue(self.library.group_songs(self.view, self.paginator.get_selected(), self.hide_duplicates))
+                return self
+            if key == "SPACE":
+                # No song to start here, only pause/resume
+                if self.app.player.state == "playing":
+                    self.app.player_pause()
+                elif self.app.player.state == "paused":
+                    self.app.player_resume_or_play(self.app.player.current)
+                return self
+            if key == "o":
+                return self
+        
+        if key == "A" and (self.group is not None or self.search):
+            # Every song in the open group, or every search match
+            self._enqueue(self.paginator.items)
+            return self
+        
+        if key == "x":
+            self.app.queue_toggle_shuffle()
+            return self
+        
+        if key == "r":
+            self.app.queue_cycle_repeat()
+            return self
+        
+        if key == "p":
+            self.app.queue_play_previous()
+            return self
+        
         # Skip navigation if no songs
         if not self.paginator.items:
             if key == "b" or key == "LEFT":
@@ -102,7 +329,7 @@ class LocalMusicScreen(Screen):
         if key == "ENTER" or key == "RIGHT":
             selected = self.paginator.get_selected()
             if selected:
-                self.app.player_play(selected)
+                self.app.player_play(self.library.track(selected))
             return self
         
         if key == "SPACE":
@@ -112,16 +339,14 @@ class LocalMusicScreen(Screen):
             else:
                 selected = self.paginator.get_selected()
                 if selected:
-                    self.app.player_resume_or_play(selected)
+                    self.app.player_resume_or_play(self.library.track(selected))
             return self
         
         if key == "a":
             # Add to queue
             selected = self.paginator.get_selected()
             if selected:
-                import os
-                title = os.path.basename(selected)
-                self.app.queue_add("local", selected, title)
+                self.app.queue_add_track(self.library.track(selected))
                 # Could show temp message here later
             return self
         
@@ -130,6 +355,14 @@ class LocalMusicScreen(Screen):
             self.app.queue_play_next()
             return self
         
+        if key == "o":
+            # Cycle sort mode (name -> artist -> album -> duration)
+            modes = self.library.SORT_MODES
+            self.sort_mode = modes[(modes.index(self.sort_mode) + 1) % len(modes)]
+            if not self.search:  # Search results stay in match order
+                self._set_songs(self._load_songs())
+            return self
+        
         if key == "s":
             # Stop playback
             self.app.player_stop()
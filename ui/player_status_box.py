@@ -8,12 +8,13 @@ class PlayerStatusBox:
     """Shows current track, playback state, or scanning progress."""
     
     def __init__(self):
-        self.mode = "idle"  # idle, playing, scanning
+        self.mode = "idle"  # idle, playing, scanning, tagging
         self.track = None
         self.state = "stopped"  # playing / paused / stopped
         self.scan_path = None
         self.scan_count = 0
         self.queue_count = 0  # Number of items in queue
+        self.play_mode = ""  # "Shuffle", "Repeat all"... shown after the queue count
 
     def set_playing(self, track, state, queue_count=0):
         """Update playback status."""
@@ -22,12 +23,26 @@ class PlayerStatusBox:
         self.state = state
         self.queue_count = queue_count
 
+    def set_queue_count(self, queue_count):
+        """Update the queue size only (after adding to the queue)."""
+        self.queue_count = queue_count
+
+    def set_play_mode(self, play_mode):
+        """Update the shuffle/repeat text."""
+        self.play_mode = play_mode
+
     def set_scanning(self, path, count):
         """Update scanning progress."""
         self.mode = "scanning"
         self.scan_path = path
         self.scan_count = count
     
+    def set_tagging(self, path, count):
+        """Update metadata (tag reading) progress."""
+        self.mode = "tagging"
+        self.scan_path = path
+        self.scan_count = count
+    
     def set_idle(self, song_count=0, queue_count=0):
         """Set to idle state."""
         self.mode = "idle"
@@ -55,6 +70,8 @@ class PlayerStatusBox:
             state_text = f"State: {self.state}"
             if self.queue_count > 0:
                 state_text += f" | Queue: {self.queue_count}"
+            if self.play_mode:
+                state_text += f" | {self.play_mode}"
             line2 = f" {state_text} "
         elif self.mode == "scanning":
             # Show scanning progress with truncated path
@@ -62,12 +79,20 @@ class PlayerStatusBox:
             truncated = truncate_filename(scan_path, content_width - 11)  # Reserve space for "Scanning: "
             line1 = f" Scanning: {truncated} "
             line2 = f" Found: {self.scan_count} songs "
+        elif self.mode == "tagging":
+            # Show tag reading progress with truncated path
+            scan_path = self.scan_path or '...'
+            truncated = truncate_filename(scan_path, content_width - 15)  # Reserve space for "Reading tags: "
+            line1 = f" Reading tags: {truncated} "
+            line2 = f" Tagged: {self.scan_count} songs "
         else:
             # Idle state
             line1 = " Status: Ready "
             queue_text = f"Songs: {self.scan_count}"
             if self.queue_count > 0:
                 queue_text += f" | Queue: {self.queue_count}"
+            if self.play_mode:
+                queue_text += f" | {self.play_mode}"
             line2 = f" {queue_text} "
         
         # Use fixed width box
@@ -2,24 +2,53 @@
 
 from core.terminal_utils import clear_screen
 from .base_screen import Screen
-from core.scanner import Scanner
-from core.config import load_config, save_config
-from constants import (
-    PHONE_CACHE, TERMUX_CACHE,
-    PHONE_MUSIC_PATH, PHONE_DOWNLOAD_PATH, HOME_PATH
-)
+from core.scanner import Scanner, load_library, has_checkpoint, load_checkpoint
+from core.metadata import MetadataCache
+from core.dedup import DuplicateFinder
+from core.config import load_config, save_config, get_prune_rules, get_scan_target
+
+
+def run_post_scan(app, files):
+    """Run the stages that follow a scan: tag reading, then duplicate detection.
+    
+    Args:
+        app: App instance (for status box updates)
+        files: Audio files returned by Scanner.scan
+    """
+    def progress_callback(path, count):
+        app.player_box.set_tagging(path, count)
+    
+    MetadataCache().update(files, progress_callback=progress_callback)
+    
+    # Duplicates can span caches, so check the whole merged library
+    if load_config().get('hide_duplicates'):
+        DuplicateFinder().find(load_library())
+
+
+def format_scan_summary(scanner, song_count):
+    """Describe what a finished scan found and pruned."""
+    stats = scanner.stats
+    summary = f"Found {song_count} songs in {stats['dirs_scanned']} folders"
+    summary += f", skipped {stats['dirs_skipped']} folders"
+    if stats['files_skipped']:
+        size_mb = stats['bytes_skipped'] / (1024 * 1024)
+        summary += f" and {stats['files_skipped']} small files ({size_mb:.1f} MB)"
+    return summary
 
 
 class ScanOptionsScreen(Screen):
     """Configure music scanning options."""
     
-    def __init__(self, app):
+    def __init__(self, app, summary=None):
         super().__init__(app)
         self.idx = 0
+        self.summary = summary  # Result of the last scan, shown under the options
+        self.resume_mode = None  # Scan mode waiting for a resume/restart answer
         self.options = [
             "Phone Storage (Music + Downloads)",
             "Termux Home (Full ~/)",
-            "Custom Folder"
+            "Custom Folder",
+            "Library Folders (multi-root)"
         ]
         
         # Load current mode
@@ -36,7 +65,7 @@ class ScanOptionsScreen(Screen):
         
         for i, opt in enumerate(self.options):
             # Show current mode indicator
-            mode_name = ["phone", "termux", "custom"][i]
+            mode_name = ["phone", "termux", "custom", "library"][i]
             indicator = " ●" if self.current_mode == mode_name else ""
             
             if i == self.idx:
@@ -45,11 +74,25 @@ class ScanOptionsScreen(Screen):
             else:
                 print(f" {opt}{indicator}")
         
+        if self.resume_mode:
+            checkpoint = load_checkpoint() or {}
+            found = len(checkpoint.get('found', []))
+            print(f"\n An interrupted scan was found ({found} songs so far).")
+            print(" Resume it?")
+            print("\n[y/Enter] Resume   [n] Start over   [b] Cancel")
+            return
+        
+        if self.summary:
+            print(f"\n {self.summary}")
+        
         print("\n[Enter/→] Select and Rescan")
         print("[←/b] Back   [q] Quit")
 
     def handle_input(self, key):
         """Handle keypresses."""
+        if self.resume_mode:
+            return self._handle_resume_prompt(key)
+        
         if key == "UP":
             self.idx = max(0, self.idx - 1)
             return self
@@ -63,14 +106,18 @@ class ScanOptionsScreen(Screen):
             
             if selected == 0:
                 # Phone Storage scan
-                return self._scan_phone()
+                return self.start_scan('phone')
             elif selected == 1:
                 # Termux Home scan
-                return self._scan_termux()
+                return self.start_scan('termux')
             elif selected == 2:
                 # Custom Folder - open browser
                 from .folder_browser import FolderBrowserScreen
                 return FolderBrowserScreen(self.app)
+            elif selected == 3:
+                # Library Folders - manage roots, scan from there
+                from .library_roots import LibraryRootsScreen
+                return LibraryRootsScreen(self.app)
             
             return self
         
@@ -84,36 +131,63 @@ class ScanOptionsScreen(Screen):
         
         return self
     
-    def _scan_phone(self):
-        """Scan phone storage (Music + Downloads)."""
+    def _handle_resume_prompt(self, key):
+        """Handle the answer to "resume interrupted scan?"."""
+        mode = self.resume_mode
+        if key == "y" or key == "ENTER":
+            self.resume_mode = None
+            return self._run_scan(mode, resume=True)
+        if key == "n":
+            self.resume_mode = None
+            return self._run_scan(mode, resume=False)
+        if key == "b" or key == "LEFT":
+            self.resume_mode = None
+            return self
+        if key == "q":
+            self.app.quit()
+            return None
+        return self
+    
+    def start_scan(self, mode):
+        """Switch to a scan mode and scan it, asking first if a scan of it was interrupted.
+        
+        Args:
+            mode: "phone", "termux", "custom" or "library" (custom_scan_path or
+                library_roots must already be saved)
+        """
         config = load_config()
-        config['scan_mode'] = 'phone'
+        config['scan_mode'] = mode
         save_config(config)
-        self.current_mode = 'phone'
-        
-        def progress_callback(path, count):
-            self.app.player_box.set_scanning(path, count)
+        self.current_mode = mode
         
-        scanner = Scanner(status_callback=progress_callback)
-        paths = [PHONE_MUSIC_PATH, PHONE_DOWNLOAD_PATH]
-        files = scanner.scan(paths, PHONE_CACHE)
-        
-        self.app.player_box.set_idle(len(files))
-        return self
+        paths, cache_file, _ = get_scan_target(config)
+        if has_checkpoint(paths, cache_file):
+            self.resume_mode = mode
+            return self
+        return self._run_scan(mode, resume=False)
     
-    def _scan_termux(self):
-        """Scan entire Termux home directory."""
+    def _run_scan(self, mode, resume):
+        """Scan the roots of a mode, then run the post-scan stages."""
         config = load_config()
-        config['scan_mode'] = 'termux'
-        save_config(config)
-        self.current_mode = 'termux'
+        paths, cache_file, exclude_phone_storage = get_scan_target(config)
         
         def progress_callback(path, count):
             self.app.player_box.set_scanning(path, count)
         
-        # Enable phone storage exclusion for Termux scan
-        scanner = Scanner(status_callback=progress_callback, exclude_phone_storage=True)
-        files = scanner.scan(HOME_PATH, TERMUX_CACHE)
+        # Phone storage exclusion is enabled for the Termux scan
+        scanner = Scanner(status_callback=progress_callback, exclude_phone_storage=exclude_phone_storage,
+                          prune_rules=get_prune_rules(config))
+        files = scanner.scan(paths, cache_file, resume=resume)
+        self.summary = format_scan_summary(scanner, len(files))
         
+        run_post_scan(self.app, files)
+        self.app.library_changed()
+        self.app.library.refresh()  # Rebuild the snapshot (and the offset index, if on) now
         self.app.player_box.set_idle(len(files))
+        self._restart_watcher()
         return self
+    
+    def _restart_watcher(self):
+        """Point the library watcher at the newly selected scan mode."""
+        if self.app.watcher:
+            self.app.start_watcher()
@@ -1,14 +1,22 @@
 """Settings screen - manage caches and configuration."""
 
 import os
-from core.terminal_utils import clear_screen
+import sqlite3
+import tracemalloc
+from core.terminal_utils import clear_screen, get_terminal_size
+from core.config import load_config, save_config
+from core.library_db import get_library_db, source_name
+from core.scanner import find_cache_file, read_manifest, remove_manifest
+from core.diagnostics import rss_bytes, allocation_report, start_tracing, stop_tracing
 from .base_screen import Screen
-from constants import PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE
+from constants import PHONE_CACHE, TERMUX_CACHE, CUSTOM_CACHE, LIBRARY_CACHE, LIBRARY_INDEX
 
 
 class SettingsScreen(Screen):
     """Settings menu for cache management and configuration."""
     
+    MEMORY_BUDGETS = [0, 64, 96, 128, 192, 256]  # MB, 0 = off
+    
     def __init__(self, app):
         super().__init__(app)
         self.idx = 0
@@ -17,7 +25,12 @@ class SettingsScreen(Screen):
             "Clear Termux Home Cache",
             "Clear Custom Folder Cache",
             "Clear All Caches",
-            "View Cache Statistics"
+            "View Cache Statistics",
+            "Live Library Watch",
+            "Hide Duplicate Songs",
+            "Library Index File",
+            "Memory Budget",
+            "Memory Report"
         ]
 
     def render(self):
@@ -29,6 +42,19 @@ class SettingsScreen(Screen):
         print("-" * 50)
         
         for i, opt in enumerate(self.options):
+            # Show on/off state for toggles
+            if opt == "Live Library Watch":
+                opt += ": On" if self.app.watcher else ": Off"
+                if self.app.watcher and self.app.watcher.mode:
+                    opt += f" ({self.app.watcher.mode})"
+            elif opt == "Hide Duplicate Songs":
+                opt += ": On" if load_config().get('hide_duplicates') else ": Off"
+            elif opt == "Library Index File":
+                opt += ": On" if load_config().get('offset_index') else ": Off"
+            elif opt == "Memory Budget":
+                budget = load_config().get('memory_budget_mb', 0)
+                opt += f": {budget} MB" if budget else ": Off"
+            
             if i == self.idx:
                 # Inverted colors for selected item
                 print(f"\033[7m {opt}\033[0m")
@@ -60,6 +86,16 @@ class SettingsScreen(Screen):
                 self._clear_all_caches()
             elif selected == 4:
                 return CacheStatsScreen(self.app)
+            elif selected == 5:
+                self._toggle_watch()
+            elif selected == 6:
+                self._toggle_hide_duplicates()
+            elif selected == 7:
+                self._toggle_offset_index()
+            elif selected == 8:
+                self._cycle_memory_budget()
+            elif selected == 9:
+                return MemoryReportScreen(self.app)
             
             return self
         
@@ -73,11 +109,85 @@ class SettingsScreen(Screen):
         
         return self
     
+    def _toggle_watch(self):
+        """Turn live library watching on or off."""
+        config = load_config()
+        config['watch_library'] = not self.app.watcher
+        save_config(config)
+        
+        if config['watch_library']:
+            self.app.start_watcher()
+        else:
+            self.app.stop_watcher()
+    
+    def _toggle_hide_duplicates(self):
+        """Turn duplicate hiding on or off, finding duplicates when enabled."""
+        config = load_config()
+        config['hide_duplicates'] = not config.get('hide_duplicates')
+        save_config(config)
+        
+        if config['hide_duplicates']:
+            from core.dedup import DuplicateFinder
+            from core.scanner import load_library
+            
+            clear_screen()
+            self.app.player_box.render()
+            print()
+            print(" Looking for duplicate songs...")
+            duplicates = DuplicateFinder().find(load_library())
+            self.app.library_changed()
+            print(f" ✓ Found {len(duplicates)} duplicate(s). They are now hidden.")
+            self._wait_for_key()
+    
+    def _toggle_offset_index(self):
+        """Turn the mmap'ed library index on or off (removing the file when off)."""
+        config = load_config()
+        config['offset_index'] = not config.get('offset_index')
+        save_config(config)
+        
+        if not config['offset_index'] and os.path.exists(LIBRARY_INDEX):
+            try:
+                os.remove(LIBRARY_INDEX)
+            except OSError:
+                pass
+        self.app.library_changed()
+    
+    def _cycle_memory_budget(self):
+        """Step the RSS budget through MEMORY_BUDGETS (0 = off)."""
+        config = load_config()
+        budget = config.get('memory_budget_mb', 0)
+        budgets = self.MEMORY_BUDGETS
+        config['memory_budget_mb'] = budgets[(budgets.index(budget) + 1) % len(budgets)] if budget in budgets else 0
+        save_config(config)
+        self.app.set_memory_budget(config['memory_budget_mb'])
+    
+    def _wait_for_key(self):
+        """Show a prompt and wait for any key."""
+        print("\n Press any key to continue...")
+        import sys, tty, termios
+        fd = sys.stdin.fileno()
+        old = termios.tcgetattr(fd)
+        try:
+            tty.setraw(fd)
+            sys.stdin.read(1)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old)
+    
+    def _forget_source(self, cache_file):
+        """Drop a cache's manifest and its tracks from the library database."""
+        remove_manifest(cache_file)
+        try:
+            get_library_db().clear_source(source_name(cache_file))
+        except sqlite3.Error:
+            pass
+    
     def _clear_cache(self, cache_file, name):
         """Clear a specific cache file."""
-        if os.path.exists(cache_file):
+        path = find_cache_file(cache_file)
+        if path:
             try:
-                os.remove(cache_file)
+                os.remove(path)
+                self._forget_source(cache_file)
                 # Show temporary confirmation
                 clear_screen()
                 self.app.player_box.render()
@@ -100,14 +210,17 @@ class SettingsScreen(Screen):
         caches = [
             (PHONE_CACHE, "Phone Storage"),
             (TERMUX_CACHE, "Termux Home"),
-            (CUSTOM_CACHE, "Custom Folder")
+            (CUSTOM_CACHE, "Custom Folder"),
+            (LIBRARY_CACHE, "Library Folders")
         ]
         
         cleared = 0
         for cache_file, _ in caches:
-            if os.path.exists(cache_file):
+            path = find_cache_file(cache_file)
+            if path:
                 try:
-                    os.remove(cache_file)
+                    os.remove(path)
+                    self._forget_source(cache_file)
                     cleared += 1
                 except (OSError, IOError):
                     pass
@@ -131,18 +244,24 @@ class SettingsScreen(Screen):
 class CacheStatsScreen(Screen):
     """Display cache statistics."""
     
+    MAX_HISTORY_ROWS = 8  # Scans shown in the history view
+    
     def __init__(self, app):
         super().__init__(app)
         self.stats = self._load_stats()
+        self.comparison = None  # Format comparison, computed on request
+        self.show_history = False  # Scan history instead of the per-cache summary
     
     def _load_stats(self):
-        """Load cache statistics."""
+        """Load cache statistics from the cache manifests (the caches themselves only if a manifest is missing)."""
         import json
+        from core.snapshot import read_header, SnapshotError
         
         caches = [
             (PHONE_CACHE, "Phone Storage"),
             (TERMUX_CACHE, "Termux Home"),
-            (CUSTOM_CACHE, "Custom Folder")
+            (CUSTOM_CACHE, "Custom Folder"),
+            (LIBRARY_CACHE, "Library Folders")
         ]
         
         stats = []
@@ -150,25 +269,50 @@ class CacheStatsScreen(Screen):
         total_size = 0
         
         for cache_file, name in caches:
-            if os.path.exists(cache_file):
+            path = find_cache_file(cache_file)
+            manifest = read_manifest(cache_file) if path else None
+            if manifest:
+                try:
+                    cache_size = os.path.getsize(path)
+                except OSError:
+                    cache_size = 0
+                stats.append({
+                    'name': name,
+                    'files': manifest['count'],
+                    'size': cache_size,
+                    'format': manifest.get('format'),
+                    'cache_file': cache_file,
+                    'manifest': manifest
+                })
+                total_files += manifest['count']
+                total_size += cache_size
+            elif path:
                 try:
-                    # Get file count from cache
-                    with open(cache_file, 'r') as f:
-                        data = json.load(f)
-                        file_count = data.get('count', 0)
+                    # Cache from before manifests: get the count from the cache (compact snapshots have it in the header)
+                    if path == cache_file:
+                        with open(path, 'r') as f:
+                            data = json.load(f)
+                            file_count = data.get('count', 0)
+                        cache_format = "JSON"
+                    else:
+                        header = read_header(path)
+                        file_count = header['count']
+                        cache_format = "compact + zlib" if header['compressed'] else "compact"
                     
                     # Get cache file size
-                    cache_size = os.path.getsize(cache_file)
+                    cache_size = os.path.getsize(path)
                     
                     stats.append({
                         'name': name,
                         'files': file_count,
-                        'size': cache_size
+                        'size': cache_size,
+                        'format': cache_format,
+                        'cache_file': cache_file
                     })
                     
                     total_files += file_count
                     total_size += cache_size
-                except (json.JSONDecodeError, IOError, OSError):
+                except (json.JSONDecodeError, SnapshotError, IOError, OSError):
                     stats.append({
                         'name': name,
                         'files': 0,
@@ -187,6 +331,61 @@ class CacheStatsScreen(Screen):
             'total_size': total_size
         }
     
+    def _compare_formats(self):
+        """Encode the biggest cache in each format and time loading it back.
+        
+        Returns:
+            List of (format name, size in bytes, load seconds, load + all paths seconds),
+            or None if there is no cache
+        """
+        import json
+        import time
+        from core.scanner import Scanner
+        from core.snapshot import encode_snapshot, decode_snapshot
+        
+        caches = [c for c in self.stats['caches'] if c['files']]
+        if not caches:
+            return None
+        cache_file = max(caches, key=lambda c: c['files'])['cache_file']
+        files, ids, roots, file_roots = Scanner(cache_format='json', compress_cache=False)._read_cache_data(cache_file)
+        
+        # Same layout Scanner writes for the JSON format
+        json_data = json.dumps({
+            'files': files, 'count': len(files), 'ids': [ids.get(f) for f in files],
+            'roots': roots, 'file_roots': [file_roots.get(f) for f in files],
+        }, indent=2).encode('utf-8')
+        
+        def load_json(data):
+            return json.loads(data)['files']
+        
+        def load_json_paths(data):
+            return list(load_json(data))
+        
+        def load_snapshot(data):
+            return decode_snapshot(data).files
+        
+        def load_snapshot_paths(data):
+            return list(load_snapshot(data))
+        
+        def best_time(func, data):
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                func(data)
+                times.append(time.perf_counter() - start)
+            return min(times)
+        
+        results = []
+        for name, data, load, load_paths in [
+            ("JSON", json_data, load_json, load_json_paths),
+            ("compact", encode_snapshot(files, ids, roots, file_roots, compress=False),
+             load_snapshot, load_snapshot_paths),
+            ("compact + zlib", encode_snapshot(files, ids, roots, file_roots, compress=True),
+             load_snapshot, load_snapshot_paths),
+        ]:
+            results.append((name, len(data), best_time(load, data), best_time(load_paths, data)))
+        return results
+    
     def _format_size(self, size_bytes):
         """Format bytes to human-readable size."""
         if size_bytes < 1024:
@@ -205,24 +404,161 @@ class CacheStatsScreen(Screen):
         print("-" * 50)
         print()
         
-        for cache in self.stats['caches']:
-            name = cache['name']
-            files = cache['files']
-            size = self._format_size(cache['size'])
-            print(f" {name}:")
-            print(f"   Files: {files}")
-            print(f"   Cache size: {size}")
-            print()
+        if self.show_history:
+            self._render_history()
+        else:
+            for cache in self.stats['caches']:
+                self._render_cache(cache)
         
         print("-" * 50)
         total_files = self.stats['total_files']
         total_size = self._format_size(self.stats['total_size'])
         print(f" Total: {total_files} files ({total_size})")
+        
+        if self.comparison:
+            print()
+            print(f" {'Format':<16}{'Size':>10}{'Load':>10}{'+ paths':>10}")
+            for name, size, load, load_paths in self.comparison:
+                print(f" {name:<16}{self._format_size(size):>10}"
+                      f"{load * 1000:>8.1f}ms{load_paths * 1000:>8.1f}ms")
+        
         print()
-        print("[←/b] Back   [q] Quit")
+        history_label = "Cache summary" if self.show_history else "Scan history"
+        print(f"[c] Compare cache formats   [h] {history_label}   [←/b] Back   [q] Quit")
+    
+    def _render_cache(self, cache):
+        """Print one cache's summary and its last scan."""
+        print(f" {cache['name']}:")
+        print(f"   Files: {cache['files']}")
+        print(f"   Cache size: {self._format_size(cache['size'])}")
+        if cache.get('format'):
+            print(f"   Format: {cache['format']}")
+        manifest = cache.get('manifest')
+        if manifest:
+            print(f"   Audio: {self._format_size(manifest.get('bytes', 0))} in {len(manifest.get('roots', []))} root(s)")
+            print(f"   Last scan: {self._format_time(manifest['last_scan'])}, {self._format_rate(manifest['scan_seconds'], manifest.get('files_per_sec'))}")
+        print()
+    
+    def _render_history(self):
+        """Print recent scans of every cache, newest first."""
+        scans = []
+        for cache in self.stats['caches']:
+            for scan in (cache.get('manifest') or {}).get('history', []):
+                scans.append((scan['time'], cache['name'], scan))
+        if not scans:
+            print(" No scans recorded yet.")
+            print()
+            return
+        scans.sort(key=lambda item: item[0], reverse=True)
+        for _, name, scan in scans[:self.MAX_HISTORY_ROWS]:
+            resumed = " (resumed)" if scan.get('resumed') else ""
+            print(f" {self._format_time(scan['time'])}  {name}")
+            print(f"   {scan['count']} files, {self._format_size(scan.get('bytes', 0))}: "
+                  f"{self._format_rate(scan['seconds'], scan.get('files_per_sec'))}{resumed}")
+        print()
+    
+    def _format_time(self, timestamp):
+        """Format a Unix time as local date and time."""
+        import time
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+    
+    def _format_rate(self, seconds, files_per_sec):
+        """Format a scan's duration and speed."""
+        rate = f" ({files_per_sec:,.0f} files/s)" if files_per_sec else ""
+        return f"{seconds:.1f}s{rate}"
     
     def handle_input(self, key):
         """Handle keypresses."""
+        if key == "c":
+            self.comparison = self._compare_formats()
+            return self
+        
+        if key == "h":
+            self.show_history = not self.show_history
+            return self
+        
+        if key == "b" or key == "LEFT":
+            return SettingsScreen(self.app)
+        
+        if key == "q":
+            self.app.quit()
+            return None
+        
+        return self
+
+
+class MemoryReportScreen(Screen):
+    """Show RSS and where Python memory is allocated, by subsystem."""
+    
+    def __init__(self, app):
+        super().__init__(app)
+        self.message = None
+    
+    def _format_size(self, size_bytes):
+        """Format bytes as MB/KB."""
+        if size_bytes is None:
+            return "n/a"
+        if size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.0f} KB"
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+    
+    def render(self):
+        """Draw the memory report."""
+        clear_screen()
+        self.app.player_box.render()
+        print()
+        print(" Memory Report")
+        print("-" * 50)
+        
+        player = self.app.player
+        mpv_rss = None
+        if player.process and player.process.poll() is None:
+            mpv_rss = rss_bytes(player.process.pid)
+        print(f" txplay RSS: {self._format_size(rss_bytes())}   mpv RSS: {self._format_size(mpv_rss)}")
+        
+        budget = self.app.memory_budget
+        if budget.budget:
+            print(f" Budget: {self._format_size(budget.budget)} (caches dropped {budget.drops} time(s))")
+        else:
+            print(" Budget: off")
+        
+        report = allocation_report()
+        if report is None:
+            print("\n Allocation tracing is off. Press [t] to start it, or turn on")
+            print(" \"trace_memory\" in config.json to trace from launch.")
+        else:
+            print(f" Traced: {self._format_size(report['traced'])} (peak {self._format_size(report['peak'])})")
+            print()
+            print(" By subsystem:")
+            for name, size in report['subsystems']:
+                print(f"   {name:<12}{self._format_size(size):>10}")
+            print()
+            print(" Top allocation sites:")
+            _, term_width = get_terminal_size()
+            for site, size, count in report['sites']:
+                line = f"   {self._format_size(size):>9}  {count:>7} blocks  {site}"
+                print(line[:term_width - 1])
+        
+        if self.message:
+            print(f"\n {self.message}")
+        print("\n[t] Start/Stop Tracing   [d] Drop Caches Now   [r] Refresh   [←/b] Back   [q] Quit")
+    
+    def handle_input(self, key):
+        """Handle keypresses."""
+        self.message = None
+        if key == "t":
+            if tracemalloc.is_tracing():
+                stop_tracing()
+            else:
+                start_tracing()
+                self.message = "Tracing new allocations (earlier ones are not counted)."
+            return self
+        
+        if key == "d":
+            self.app.drop_caches()
+            self.message = "Dropped search/group indexes and the tag cache."
+            return self
+        
         if key == "b" or key == "LEFT":
             return SettingsScreen(self.app)
         
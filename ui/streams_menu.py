@@ -17,6 +17,7 @@ class StreamsMenuScreen(Screen):
         """Reload streams from manager."""
         self.stream_manager.load_streams()
         self.stream_data = self.stream_manager.get_all_streams()
+        self.tracks = self.stream_manager.get_tracks()
         # Create display items: "Title (source)"
         self.streams = [f"{s['title']} ({s['source']})" for s in self.stream_data]
         # Reset index if out of bounds
@@ -59,24 +60,21 @@ class StreamsMenuScreen(Screen):
             return self
         
         if key == "ENTER" or key == "RIGHT":
-            if self.stream_data:
-                stream = self.stream_data[self.idx]
-                self.app.player_play(stream['url'])
+            if self.tracks:
+                self.app.player_play(self.tracks[self.idx])
             return self
         
         if key == "SPACE":
             if self.app.player.state == "playing":
                 self.app.player_pause()
-            elif self.stream_data:
-                stream = self.stream_data[self.idx]
-                self.app.player_resume_or_play(stream['url'])
+            elif self.tracks:
+                self.app.player_resume_or_play(self.tracks[self.idx])
             return self
         
         if key == "a":
             # Add stream to queue
-            if self.stream_data:
-                stream = self.stream_data[self.idx]
-                self.app.queue_add("stream", stream['url'], stream['title'])
+            if self.tracks:
+                self.app.queue_add_track(self.tracks[self.idx])
             return self
         
         if key == "d":
@@ -1,6 +1,8 @@
 """YouTube Music search screen - search and play songs from YouTube Music."""
 
 from core.terminal_utils import clear_screen, show_cursor, hide_cursor
+from core.youtube_cache import YouTubeResultCache, youtube_url, youtube_title
+from core.track import Track, YOUTUBE
 from .base_screen import Screen
 
 try:
@@ -64,7 +66,7 @@ class YTMusicSearchScreen(Screen):
                 else:
                     print(f" {display}")
             
-            print("\n[Enter] Play   [Space] Play/Pause   [a] Add to Queue")
+            print("\n[Enter] Play   [Space] Play/Pause   [a] Add to Queue   [A] Add All")
             print("[r] New Search   [n] Next   [s] Stop   [b] Back   [q] Quit")
     
     def get_input(self, prompt):
@@ -108,6 +110,7 @@ class YTMusicSearchScreen(Screen):
             
             self.search_query = query
             self.results = search_results
+            YouTubeResultCache().add(search_results)  # Findable later from global search
             self.idx = 0
             self.waiting_for_input = False
             
@@ -120,10 +123,7 @@ class YTMusicSearchScreen(Screen):
     
     def get_youtube_url(self, result):
         """Construct YouTube URL from search result."""
-        video_id = result.get('videoId')
-        if video_id:
-            return f"https://www.youtube.com/watch?v={video_id}"
-        return None
+        return youtube_url(result)
     
     def handle_input(self, key):
         """Handle keypresses."""
@@ -161,7 +161,7 @@ class YTMusicSearchScreen(Screen):
                 result = self.results[self.idx]
                 url = self.get_youtube_url(result)
                 if url:
-                    self.app.player_play(url)
+                    self.app.player_play(Track(YOUTUBE, url, youtube_title(result)))
                 return self
             
             if key == "SPACE":
@@ -172,7 +172,7 @@ class YTMusicSearchScreen(Screen):
                     result = self.results[self.idx]
                     url = self.get_youtube_url(result)
                     if url:
-                        self.app.player_resume_or_play(url)
+                        self.app.player_resume_or_play(Track(YOUTUBE, url, youtube_title(result)))
                 return self
             
             if key == "a":
@@ -185,6 +185,16 @@ class YTMusicSearchScreen(Screen):
                     self.app.queue_add("youtube", url, title)
                 return self
             
+            if key == "A":
+                # Add every result in one go
+                tracks = []
+                for result in self.results:
+                    url = self.get_youtube_url(result)
+                    if url:
+                        tracks.append(Track(YOUTUBE, url, youtube_title(result)))
+                self.app.queue_add_tracks(tracks)
+                return self
+            
             if key == "r":
                 # New search
                 self.results = []